@@ -0,0 +1,74 @@
+"""
+Benchmark de la capa de conexión de DatabaseManager.
+Compara el esquema anterior (una conexión y un commit con fsync por operación)
+contra la conexión persistente en modo WAL, midiendo operaciones por segundo.
+
+Uso: python benchmarks/bench_conexion.py [cantidad]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("GIC_LOG", os.path.join(tempfile.gettempdir(), "gic_benchmarks.log"))
+
+from database import DatabaseManager
+from models import ClienteRegular
+
+
+def _clientes(cantidad):
+    return [ClienteRegular(f"B{i:07d}", f"Cliente {i}", f"c{i}@bench.com", "5550000" + str(i % 10))
+            for i in range(cantidad)]
+
+
+def medir_conexion_por_llamada(ruta, clientes):
+    """Reproduce el patrón original: sqlite3.connect + commit en cada operación."""
+    DatabaseManager(ruta).close()
+    inicio = time.perf_counter()
+    for c in clientes:
+        with sqlite3.connect(ruta) as conn:
+            conn.execute("INSERT INTO clientes (id, nombre, email, telefono, tipo) VALUES (?, ?, ?, ?, ?)",
+                         (c.id_cliente, c.nombre, c.email, c.telefono, "ClienteRegular"))
+            conn.commit()
+        conn.close()
+    for c in clientes:
+        with sqlite3.connect(ruta) as conn:
+            conn.execute("SELECT id, nombre, email, telefono, tipo, empresa FROM clientes WHERE id = ?",
+                         (c.id_cliente,)).fetchone()
+        conn.close()
+    return time.perf_counter() - inicio
+
+
+def medir_conexion_persistente(ruta, clientes):
+    """Misma carga usando la conexión persistente del gestor."""
+    with DatabaseManager(ruta) as db:
+        inicio = time.perf_counter()
+        for c in clientes:
+            db.guardar_cliente(c)
+        conn = db.conexion()
+        for c in clientes:
+            conn.execute("SELECT id, nombre, email, telefono, tipo, empresa FROM clientes WHERE id = ?",
+                         (c.id_cliente,)).fetchone()
+        return time.perf_counter() - inicio
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    clientes = _clientes(cantidad)
+    operaciones = cantidad * 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        antes = medir_conexion_por_llamada(os.path.join(tmp, "por_llamada.db"), clientes)
+        despues = medir_conexion_persistente(os.path.join(tmp, "persistente.db"), clientes)
+
+    print(f"Operaciones: {operaciones} ({cantidad} inserciones + {cantidad} lecturas)")
+    print(f"Conexión por llamada : {operaciones / antes:10.0f} ops/s")
+    print(f"Conexión persistente : {operaciones / despues:10.0f} ops/s")
+    print(f"Mejora               : {antes / despues:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark del modelo de clientes.
+Compara la jerarquía anterior (con __dict__ por instancia y re.match sin precompilar)
+contra la actual (__slots__ y validadores precompilados), midiendo velocidad de
+construcción y memoria por objeto, además de la hidratación desde filas de la BD.
+
+Uso: python benchmarks/bench_modelos.py [cantidad]   (por defecto 1.000.000)
+"""
+
+import gc
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("GIC_LOG", os.path.join(tempfile.gettempdir(), "gic_benchmarks.log"))
+
+from models import Cliente, ClientePremium
+
+
+class ClienteAnterior:
+    """Réplica de la clase Cliente previa a la optimización, solo para comparar."""
+
+    def __init__(self, id_cliente, nombre, email, telefono):
+        self.id_cliente = id_cliente
+        self.nombre = nombre
+        self.email = email
+        self.telefono = telefono
+
+    @property
+    def email(self):
+        return self.__email
+
+    @email.setter
+    def email(self, valor):
+        patron = r"[^@]+@[^@]+\.[^@]+"
+        if not re.match(patron, valor):
+            raise ValueError(f"Formato de email inválido: {valor}")
+        self.__email = valor
+
+    @property
+    def telefono(self):
+        return self.__telefono
+
+    @telefono.setter
+    def telefono(self, valor):
+        if not str(valor).isdigit() or len(str(valor)) < 7:
+            raise ValueError("Número de teléfono inválido.")
+        self.__telefono = valor
+
+
+class ClientePremiumAnterior(ClienteAnterior):
+    def __init__(self, id_cliente, nombre, email, telefono, descuento=15):
+        super().__init__(id_cliente, nombre, email, telefono)
+        self.descuento = descuento
+
+
+def medir(nombre, fabrica, cantidad):
+    """Construye 'cantidad' objetos midiendo el tiempo y, por separado, la memoria retenida."""
+    gc.collect()
+    inicio = time.perf_counter()
+    objetos = [fabrica(i) for i in range(cantidad)]
+    duracion = time.perf_counter() - inicio
+    del objetos
+
+    gc.collect()
+    tracemalloc.start()
+    objetos = [fabrica(i) for i in range(cantidad)]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objetos
+
+    print(f"{nombre:<28} {cantidad / duracion:>12,.0f} obj/s {memoria / cantidad:>10.1f} bytes/obj")
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # Los textos se crean una vez para medir solo el costo del objeto
+    emails = [f"cliente{i}@bench.com" for i in range(1000)]
+    fila = ("ID", "Nombre", "cliente@bench.com", "5551234", "ClientePremium", "Descuento: 20%")
+
+    print(f"Objetos por medición: {cantidad:,}")
+    medir("Premium anterior", lambda i: ClientePremiumAnterior(i, "Nombre", emails[i % 1000], "5551234"), cantidad)
+    medir("Premium con __slots__", lambda i: ClientePremium(i, "Nombre", emails[i % 1000], "5551234"), cantidad)
+    medir("desde_fila (sin validar)", lambda i: Cliente.desde_fila(fila), cantidad)
+    medir("desde_fila (validando)", lambda i: Cliente.desde_fila(fila, validar=True), cantidad)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Prueba de carga del modo servidor (servidor.py).
+Levanta 'python main.py serve' sobre una base temporal, la puebla con clientes sintéticos y
+lanza varios puestos simulados (hilos con ClienteRemoto) que mezclan lecturas y escrituras
+durante un tiempo fijo. Informa peticiones por segundo y percentiles de latencia por
+operación, y cuántas escrituras se confirmaron en promedio por commit (group commit).
+
+Uso: python benchmarks/carga_servidor.py [--puestos 16] [--duracion 10] [--escrituras 0.2]
+                                         [--base 10000] [--lectores 8]
+"""
+
+import argparse
+import os
+import random
+import re
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+os.environ.setdefault("GIC_LOG", os.path.join(tempfile.gettempdir(), "gic_benchmarks.log"))
+
+from database import DatabaseManager
+from servidor import ClienteRemoto, ErrorRemoto
+from suite import construir_cliente, generar_clientes
+from models import ClienteRegular
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servidor(remoto, proceso, espera=30.0):
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("El servidor terminó durante el arranque.")
+        try:
+            remoto._pedir("GET", "/salud")
+            return
+        except ErrorRemoto:
+            time.sleep(0.1)
+    raise RuntimeError("El servidor no respondió a tiempo.")
+
+
+def puesto(remoto, numero, base, proporcion_escrituras, hasta, latencias, errores):
+    """Un puesto de trabajo: 60% lecturas por ID, 25% páginas, 15% búsquedas; escrituras según la proporción."""
+    azar = random.Random(numero)
+    propios = 0
+    while time.monotonic() < hasta:
+        if azar.random() < proporcion_escrituras:
+            if propios and azar.random() < 0.5:
+                operacion = "actualizar_cliente"
+                cliente = ClienteRegular(f"P{numero:03d}{azar.randrange(propios):07d}", "Puesto Editado",
+                                         f"editado{numero}@carga.com", "555000111")
+                funcion = partial(remoto.actualizar_cliente, cliente)
+            else:
+                operacion = "guardar_cliente"
+                cliente = ClienteRegular(f"P{numero:03d}{propios:07d}", f"Puesto {numero}",
+                                         f"p{numero}.{propios}@carga.com", "555000222")
+                funcion = partial(remoto.guardar_cliente, cliente)
+                propios += 1
+        else:
+            sorteo = azar.random()
+            if sorteo < 0.6 or not base:
+                operacion = "obtener_por_id"
+                funcion = partial(remoto.obtener_por_id, f"C{azar.randrange(max(base, 1)):08d}")
+            elif sorteo < 0.85:
+                operacion = "obtener_pagina"
+                funcion = partial(remoto.obtener_pagina, f"C{azar.randrange(base):08d}", 100)
+            else:
+                operacion = "buscar"
+                funcion = partial(remoto.buscar, azar.choice(("garcia", "marta", "rojas", "empresa 1")))
+        inicio = time.perf_counter()
+        try:
+            funcion()
+        except (ErrorRemoto, ValueError):
+            errores[operacion] += 1
+        latencias[operacion].append(time.perf_counter() - inicio)
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+
+def _contador(metricas, nombre):
+    coincidencia = re.search(rf"^gic_{nombre} (\S+)$", metricas, re.MULTILINE)
+    return float(coincidencia.group(1)) if coincidencia else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puestos", type=int, default=16, help="Puestos simultáneos (hilos cliente)")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument("--escrituras", type=float, default=0.2, help="Proporción de escrituras (0 a 1)")
+    parser.add_argument("--base", type=int, default=10_000, help="Clientes precargados")
+    parser.add_argument("--lectores", type=int, default=8, help="Hilos de lectura del servidor")
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix="gic_carga_")
+    ruta = os.path.join(directorio, "solution_tech.db")
+    with DatabaseManager(ruta) as db:
+        db.guardar_clientes_lote((construir_cliente(f) for f in generar_clientes(args.base)), carga_masiva=True)
+
+    puerto = _puerto_libre()
+    token = secrets.token_urlsafe(16)
+    proceso = subprocess.Popen([sys.executable, os.path.join(RAIZ, "main.py"), "--db", ruta, "serve",
+                                "--puerto", str(puerto), "--lectores", str(args.lectores)],
+                               cwd=directorio, stderr=subprocess.DEVNULL, env={**os.environ, "GIC_TOKEN": token})
+    remoto = ClienteRemoto(f"http://127.0.0.1:{puerto}", token=token)
+    try:
+        _esperar_servidor(remoto, proceso)
+        latencias, errores = defaultdict(list), defaultdict(int)
+        hasta = time.monotonic() + args.duracion
+        hilos = [threading.Thread(target=puesto, args=(remoto, n, args.base, args.escrituras, hasta, latencias, errores))
+                 for n in range(args.puestos)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        transcurrido = time.perf_counter() - inicio
+        metricas = remoto.metricas()
+    finally:
+        remoto.close()
+        proceso.terminate()
+        proceso.wait()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    total = sum(len(v) for v in latencias.values())
+    print(f"{args.puestos} puestos, {args.duracion:.0f} s, {args.escrituras:.0%} escrituras, base de {args.base} clientes")
+    print(f"Total: {total} peticiones, {total / transcurrido:.1f} req/s, {sum(errores.values())} errores")
+    print(f"{'operación':<20}{'peticiones':>11}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errores':>9}")
+    for operacion in sorted(latencias):
+        ordenadas = sorted(latencias[operacion])
+        print(f"{operacion:<20}{len(ordenadas):>11}{len(ordenadas) / transcurrido:>10.1f}"
+              f"{_percentil(ordenadas, 0.50) * 1000:>9.2f}{_percentil(ordenadas, 0.95) * 1000:>9.2f}"
+              f"{_percentil(ordenadas, 0.99) * 1000:>9.2f}{errores[operacion]:>9}")
+    commits = _contador(metricas, "servidor_commits_total")
+    if commits:
+        print(f"Group commit: {_contador(metricas, 'servidor_escrituras_total') / commits:.1f} escrituras por commit "
+              f"({commits:.0f} commits)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
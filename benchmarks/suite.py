@@ -0,0 +1,400 @@
+"""
+Suite de benchmarks reproducible del sistema GIC.
+Genera bases sintéticas deterministas (semilla fija) de 1k, 100k y 1M clientes y mide,
+para cada operación y tamaño, el throughput, los percentiles de latencia y el pico de
+memoria residente (RSS). Cada medición corre en un subproceso propio para que el pico
+de memoria corresponda solo a esa operación.
+
+Los resultados se guardan en JSON y se comparan con una línea base: si alguna operación
+empeora más que el umbral configurado, el programa termina con código 1. Si la línea base
+no existe termina con código 2 antes de medir nada (créela con --guardar-baseline).
+Funciona sin red: los servicios externos usan su latencia simulada con time.sleep.
+
+Uso:
+    python benchmarks/suite.py [--tamanos 1000,100000,1000000] [--operaciones guardar_cliente,...]
+                               [--salida resultados.json] [--baseline benchmarks/baseline.json]
+                               [--umbral 0.20] [--umbral-memoria 0.25] [--guardar-baseline]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from itertools import islice
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+# Los subprocesos heredan la variable: ningún log de benchmark cae en el árbol del repositorio
+os.environ.setdefault("GIC_LOG", os.path.join(tempfile.gettempdir(), "gic_benchmarks.log"))
+
+import logger
+import services
+from database import DatabaseManager
+from models import ClienteRegular, ClientePremium, ClienteCorporativo
+
+SEMILLA = 42
+TAMANOS = (1_000, 100_000, 1_000_000)
+ESCRITURAS = 1_000            # Operaciones individuales medidas en guardar/actualizar
+LLAMADAS_SERVICIO = 200       # Llamadas medidas en cada servicio simulado
+LATENCIA_SERVICIOS = 0.002    # Sustituye la latencia de los servicios (segundos)
+MUESTRAS_MAXIMAS = 10_000     # Latencias individuales conservadas por operación
+DIRECTORIO_DATOS = os.path.join(tempfile.gettempdir(), "gic_benchmarks")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+NOMBRES = ("Ana", "Luis", "Marta", "Jorge", "Lucia", "Pedro", "Sofia", "Diego", "Elena", "Pablo")
+APELLIDOS = ("Garcia", "Rojas", "Munoz", "Soto", "Diaz", "Perez", "Silva", "Torres", "Vega", "Reyes")
+TIPOS = ("ClienteRegular", "ClientePremium", "ClienteCorporativo")
+
+Medicion = namedtuple("Medicion", ["operaciones", "duracion", "muestras"])
+Regresion = namedtuple("Regresion", ["clave", "campo", "base", "actual", "cambio"])
+
+
+def generar_clientes(cantidad, semilla=SEMILLA, inicio=0):
+    """Filas sintéticas (id, nombre, email, telefono, tipo, descuento, empresa), siempre iguales para una semilla."""
+    azar = random.Random(f"{semilla}-{inicio}")
+    for i in range(inicio, inicio + cantidad):
+        nombre, apellido = azar.choice(NOMBRES), azar.choice(APELLIDOS)
+        tipo = azar.choice(TIPOS)
+        yield (f"C{i:08d}", f"{nombre} {apellido}", f"{nombre.lower()}.{apellido.lower()}{i}@bench.com",
+               str(azar.randrange(10_000_000, 999_999_999)), tipo,
+               azar.randrange(5, 40) if tipo == "ClientePremium" else None,
+               f"Empresa {azar.randrange(1000)}" if tipo == "ClienteCorporativo" else None)
+
+
+def construir_cliente(fila):
+    """Objeto del modelo correspondiente a una fila generada (pasa por todas las validaciones)."""
+    id_cliente, nombre, email, telefono, tipo, descuento, empresa = fila
+    if tipo == "ClientePremium":
+        return ClientePremium(id_cliente, nombre, email, telefono, descuento)
+    if tipo == "ClienteCorporativo":
+        return ClienteCorporativo(id_cliente, nombre, email, telefono, empresa)
+    return ClienteRegular(id_cliente, nombre, email, telefono)
+
+
+def preparar_base(filas, semilla, directorio):
+    """Crea (o reutiliza) la base sintética de 'filas' clientes; se construye una sola vez por tamaño y semilla."""
+    ruta = os.path.join(directorio, f"base_{filas}_{semilla}", "solution_tech.db")
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + ".tmp"
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(temporal + sufijo):
+            os.remove(temporal + sufijo)
+    print(f"Generando base sintética de {filas:,} clientes...", flush=True)
+    with DatabaseManager(temporal) as db:
+        db.guardar_clientes_lote(generar_clientes(filas, semilla))
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def _rss_pico_kb():
+    """Pico de memoria residente del proceso en KB."""
+    # En Linux se lee VmHWM: ru_maxrss conserva el pico del proceso padre previo al exec
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+
+def _reiniciar_pico_rss():
+    """Reinicia el pico de memoria (solo Linux) para que refleje únicamente la operación medida."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _medir_cada(elementos, funcion, total):
+    """Ejecuta funcion(elemento) por cada elemento y conserva como máximo MUESTRAS_MAXIMAS latencias."""
+    paso = max(1, total // MUESTRAS_MAXIMAS)
+    muestras = []
+    inicio = time.perf_counter()
+    for i, elemento in enumerate(elementos):
+        t = time.perf_counter()
+        funcion(elemento)
+        if i % paso == 0:
+            muestras.append(time.perf_counter() - t)
+    return Medicion(total, time.perf_counter() - inicio, muestras)
+
+
+def _repeticiones(filas):
+    return max(1, min(10, 1_000_000 // filas))
+
+
+# --- Operaciones medidas (se ejecutan dentro del subproceso trabajador) ---
+
+def op_modelos(contexto):
+    """Construcción de objetos del modelo con validación; los objetos se retienen como en la aplicación."""
+    datos = list(generar_clientes(contexto.filas, contexto.semilla))
+    objetos = []
+    return _medir_cada(datos, lambda fila: objetos.append(construir_cliente(fila)), len(datos))
+
+
+def op_guardar_cliente(contexto):
+    """Altas individuales sobre una base con 'filas' clientes."""
+    nuevos = [construir_cliente(f) for f in generar_clientes(ESCRITURAS, contexto.semilla, inicio=contexto.filas)]
+    return _medir_cada(nuevos, contexto.db.guardar_cliente, len(nuevos))
+
+
+def op_actualizar_cliente(contexto):
+    """Ediciones individuales de clientes repartidos por toda la tabla."""
+    paso = max(1, contexto.filas // ESCRITURAS)
+    existentes = list(islice(contexto.db.iterar_clientes(), 0, None, paso))[:ESCRITURAS]
+
+    def actualizar(cliente):
+        cliente.nombre = cliente.nombre + " Editado"
+        contexto.db.actualizar_cliente(cliente)
+    return _medir_cada(existentes, actualizar, len(existentes))
+
+
+def op_obtener_todos(contexto):
+    """Lectura completa de la tabla."""
+    repeticiones = _repeticiones(contexto.filas)
+    return _medir_cada(range(repeticiones), lambda _: contexto.db.obtener_todos(), repeticiones)
+
+
+def op_exportar_datos(contexto):
+    """Exportación por bloques a JSON Lines y CSV."""
+    repeticiones = _repeticiones(contexto.filas)
+    return _medir_cada(range(repeticiones), lambda _: contexto.db.exportar_datos(
+        os.path.join(contexto.tmp, "backup.jsonl"), os.path.join(contexto.tmp, "backup.csv")), repeticiones)
+
+
+def op_cargar_datos(contexto):
+    """GIC_App.cargar_datos con la ventana oculta; se omite si no hay servidor gráfico."""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return f"sin servidor gráfico ({e})"
+    root.withdraw()
+    from gui import GIC_App
+    app = GIC_App(root, db=contexto.db)
+
+    def cargar(_):
+        app.cargar_datos()
+        root.update_idletasks()
+    try:
+        return _medir_cada(range(20), cargar, 20)
+    finally:
+        app.cerrar()
+
+
+def op_validar_identidad(contexto):
+    """Validación de identidad con la latencia simulada: mitad consultas a la API, mitad aciertos de caché."""
+    services.cache_identidad.limpiar()
+    azar = random.Random(contexto.semilla)
+    ids = [f"V{azar.randrange(LLAMADAS_SERVICIO // 2)}" for _ in range(LLAMADAS_SERVICIO)]
+    return _medir_cada(ids, services.validar_identidad_api, len(ids))
+
+
+def op_notificacion_bienvenida(contexto):
+    """Envío simulado del email de bienvenida."""
+    clientes = [construir_cliente(f) for f in generar_clientes(LLAMADAS_SERVICIO, contexto.semilla)]
+    return _medir_cada(clientes, services.enviar_notificacion_bienvenida, len(clientes))
+
+
+# nombre: (función, escala con el tamaño de la base, necesita base)
+OPERACIONES = {
+    "modelos": (op_modelos, True, False),
+    "guardar_cliente": (op_guardar_cliente, True, True),
+    "actualizar_cliente": (op_actualizar_cliente, True, True),
+    "obtener_todos": (op_obtener_todos, True, True),
+    "exportar_datos": (op_exportar_datos, True, True),
+    "cargar_datos": (op_cargar_datos, True, True),
+    "validar_identidad": (op_validar_identidad, False, False),
+    "notificacion_bienvenida": (op_notificacion_bienvenida, False, False),
+}
+
+
+def _percentil(ordenadas, p):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    indice = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def resumir(medicion, rss_inicio_kb, rss_pico_kb):
+    ordenadas = sorted(medicion.muestras)
+    return {
+        "operaciones": medicion.operaciones,
+        "duracion_s": round(medicion.duracion, 6),
+        "ops_por_segundo": round(medicion.operaciones / medicion.duracion, 3) if medicion.duracion else None,
+        "p50_ms": round(_percentil(ordenadas, 50) * 1000, 4),
+        "p95_ms": round(_percentil(ordenadas, 95) * 1000, 4),
+        "p99_ms": round(_percentil(ordenadas, 99) * 1000, 4),
+        "max_ms": round(ordenadas[-1] * 1000, 4),
+        "rss_inicio_kb": rss_inicio_kb,
+        "rss_pico_kb": rss_pico_kb,
+    }
+
+
+def ejecutar_trabajador(args):
+    """Punto de entrada del subproceso: ejecuta una operación y escribe su resumen JSON en stdout."""
+    funcion = OPERACIONES[args.trabajador][0]
+    services.LATENCIA_IDENTIDAD = services.LATENCIA_NOTIFICACION = args.latencia
+    with tempfile.TemporaryDirectory() as tmp:
+        logger.configurar_logging(os.path.join(tmp, "benchmark.log"))
+        db = None
+        if args.base:
+            shutil.copy(args.base, os.path.join(tmp, "solution_tech.db"))
+            db = DatabaseManager(os.path.join(tmp, "solution_tech.db"))
+        directorio_previo = os.getcwd()
+        os.chdir(tmp)
+        try:
+            contexto = argparse.Namespace(filas=args.filas, semilla=args.semilla, db=db, tmp=tmp)
+            _reiniciar_pico_rss()
+            rss_inicio = _rss_pico_kb()
+            medicion = funcion(contexto)
+            rss_pico = _rss_pico_kb()
+        finally:
+            os.chdir(directorio_previo)
+            if db is not None:
+                db.close()
+            logger.cerrar_logging()
+    if isinstance(medicion, str):
+        resultado = {"omitido": medicion}
+    else:
+        resultado = resumir(medicion, rss_inicio, rss_pico)
+    print(json.dumps(resultado))
+    return 0
+
+
+def _lanzar(operacion, filas, base, args):
+    comando = [sys.executable, os.path.abspath(__file__), "--trabajador", operacion, "--filas", str(filas),
+               "--semilla", str(args.semilla), "--latencia", str(args.latencia), "--base", base or ""]
+    proceso = subprocess.run(comando, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        return {"error": proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else "sin detalle"}
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def comparar(actual, base, umbral=0.20, umbral_memoria=0.25):
+    """
+    Compara dos conjuntos de resultados ({clave: resumen}) y devuelve las regresiones:
+    p95 o pico de memoria que suben, o throughput que baja, más que el umbral relativo.
+    Las claves ausentes en alguno de los dos conjuntos u omitidas no se comparan.
+    """
+    criterios = (("p95_ms", 1, umbral), ("ops_por_segundo", -1, umbral), ("rss_pico_kb", 1, umbral_memoria))
+    regresiones = []
+    for clave, medicion in actual.items():
+        previa = base.get(clave)
+        if not previa or "p95_ms" not in medicion or "p95_ms" not in previa:
+            continue
+        for campo, sentido, limite in criterios:
+            antes, ahora = previa.get(campo), medicion.get(campo)
+            if not antes or ahora is None:
+                continue
+            cambio = (ahora - antes) / antes * sentido
+            if cambio > limite:
+                regresiones.append(Regresion(clave, campo, antes, ahora, cambio))
+    return regresiones
+
+
+def _metadatos(args):
+    return {"fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"), "semilla": args.semilla,
+            "latencia_servicios": args.latencia, "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version, "plataforma": platform.platform()}
+
+
+def _imprimir(clave, resultado):
+    if "p95_ms" in resultado:
+        print(f"{clave:<32} {resultado['ops_por_segundo']:>12,.1f} ops/s  p50 {resultado['p50_ms']:>9.3f} ms  "
+              f"p95 {resultado['p95_ms']:>9.3f} ms  p99 {resultado['p99_ms']:>9.3f} ms  "
+              f"RSS {resultado['rss_pico_kb'] / 1024:>8.1f} MB", flush=True)
+    else:
+        print(f"{clave:<32} {resultado.get('omitido') or 'ERROR: ' + resultado.get('error', '')}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks reproducibles del sistema GIC.")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)),
+                        help="Tamaños de base separados por comas (por defecto 1000,100000,1000000)")
+    parser.add_argument("--operaciones", default=",".join(OPERACIONES),
+                        help="Operaciones a medir, separadas por comas")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--latencia", type=float, default=LATENCIA_SERVICIOS,
+                        help="Latencia simulada de los servicios externos, en segundos")
+    parser.add_argument("--salida", default="resultados_benchmarks.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--umbral", type=float, default=0.20, help="Regresión relativa tolerada en tiempo")
+    parser.add_argument("--umbral-memoria", type=float, default=0.25, help="Regresión relativa tolerada en memoria")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guarda los resultados como nueva línea base")
+    parser.add_argument("--datos", default=DIRECTORIO_DATOS, help="Directorio de las bases sintéticas")
+    parser.add_argument("--trabajador", help=argparse.SUPPRESS)
+    parser.add_argument("--filas", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--base", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.trabajador:
+        return ejecutar_trabajador(args)
+
+    operaciones = [op.strip() for op in args.operaciones.split(",") if op.strip()]
+    desconocidas = [op for op in operaciones if op not in OPERACIONES]
+    if desconocidas:
+        parser.error(f"Operaciones desconocidas: {', '.join(desconocidas)}")
+    tamanos = [int(t) for t in args.tamanos.split(",")]
+    # Sin línea base no hay contra qué comparar: un "sin regresiones" silencioso sería engañoso
+    if not args.guardar_baseline and not os.path.exists(args.baseline):
+        print(f"Error: no existe la línea base {args.baseline} (use --guardar-baseline para crearla).",
+              file=sys.stderr)
+        return 2
+
+    os.makedirs(args.datos, exist_ok=True)
+    logger.configurar_logging(os.path.join(args.datos, "benchmarks.log"))
+    resultados = {}
+    for operacion in operaciones:
+        funcion, escala, necesita_base = OPERACIONES[operacion]
+        if not escala:
+            resultados[operacion] = _lanzar(operacion, LLAMADAS_SERVICIO, None, args)
+            _imprimir(operacion, resultados[operacion])
+            continue
+        for filas in tamanos:
+            base = preparar_base(filas, args.semilla, args.datos) if necesita_base else None
+            clave = f"{operacion}@{filas}"
+            resultados[clave] = _lanzar(operacion, filas, base, args)
+            _imprimir(clave, resultados[clave])
+
+    documento = {"metadatos": _metadatos(args), "resultados": resultados}
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(documento, f, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+    errores = [clave for clave, resultado in resultados.items() if "error" in resultado]
+    if args.guardar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(documento, f, indent=2)
+        print(f"Línea base actualizada: {args.baseline}")
+        return 1 if errores else 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    if base.get("metadatos", {}).get("plataforma") != documento["metadatos"]["plataforma"]:
+        print("Aviso: la línea base se generó en otra plataforma; la comparación es orientativa.")
+    regresiones = comparar(resultados, base.get("resultados", {}), args.umbral, args.umbral_memoria)
+    for r in regresiones:
+        print(f"REGRESIÓN {r.clave} {r.campo}: {r.base} -> {r.actual} ({r.cambio:+.0%})")
+    if not regresiones:
+        print("Sin regresiones respecto a la línea base.")
+    return 1 if regresiones or errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Módulo de Línea de Comandos - Proyecto GIC
+Permite ejecutar las tareas por lotes (importación, exportación, consultas y mantenimiento)
+en servidores sin entorno gráfico. No importa tkinter ni la interfaz.
+
+    python main.py import clientes.csv [--actualizar] [--validar-identidad] [--procesos N]
+    python main.py export [--json RUTA] [--csv RUTA] [--comprimir]
+    python main.py query [TEXTO] [--tipo Premium] [--limite 50] [--formato tsv|csv|jsonl]
+    python main.py stats [--json]
+    python main.py vacuum [--purgar-enviadas DIAS]
+    python main.py backup [--snapshot] [--directorio respaldos]
+    python main.py restore DESTINO [--hasta CAMBIO]
+
+Códigos de salida: 0 éxito, 1 resultado parcial (filas rechazadas o consulta sin resultados),
+2 error (argumentos inválidos, archivo ilegible o fallo de la base de datos o de un servicio).
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from database import DatabaseManager
+from logger import registrar_evento, registrar_error
+
+SALIDA_OK = 0
+SALIDA_PARCIAL = 1
+SALIDA_ERROR = 2
+
+COLUMNAS_CONSULTA = ("id", "nombre", "email", "telefono", "tipo", "extra")
+TAMANO_BLOQUE_IMPORTACION = 50000  # Registros por bloque de validación y por transacción al importar
+ESTADOS_IMPORTACION = ("insertado", "actualizado", "duplicado", "invalido")
+TAMANO_PAGINA_CONSULTA = 1000
+
+def _rechazo(referencia, motivo):
+    print(f"Rechazado {referencia}: {motivo}", file=sys.stderr)
+
+def comando_import(db, args):
+    """
+    Importa clientes desde CSV o JSON Lines (opcionalmente .gz, o '-' para stdin) con la
+    ingesta por etapas: validación en paralelo, un único escritor y checkpoint para reanudar.
+    """
+    from ingesta import importar_archivo  # Solo se carga (con su pool de procesos) al importar
+
+    resumen = importar_archivo(db, args.archivo, formato=args.formato, actualizar=args.actualizar,
+                               procesos=args.procesos, tamano_bloque=args.lote, ruta_rechazos=args.rechazos,
+                               validar_identidad=args.validar_identidad, al_rechazar=_rechazo)
+    if resumen["reanudado_desde"]:
+        print(f"Importación reanudada desde el registro {resumen['reanudado_desde']}.", file=sys.stderr)
+    conteo = {estado: resumen[estado] for estado in ESTADOS_IMPORTACION if resumen.get(estado)}
+    print(", ".join(f"{estado}: {cantidad}" for estado, cantidad in sorted(conteo.items())) or "Sin filas.")
+    if resumen["ruta_rechazos"]:
+        print(f"Filas rechazadas y sus motivos en {resumen['ruta_rechazos']}.", file=sys.stderr)
+    return SALIDA_PARCIAL if resumen["rechazados"] else SALIDA_OK
+
+def comando_export(db, args):
+    total = db.exportar_datos(args.json, args.csv, comprimir=args.comprimir)
+    if total is None:
+        print("La exportación falló; revise el log del sistema.", file=sys.stderr)
+        return SALIDA_ERROR
+    print(f"{total} clientes exportados.")
+    return SALIDA_OK
+
+def _paginas(db, limite):
+    """Recorre la tabla por páginas con paginación por clave, hasta 'limite' filas (None: todas)."""
+    ultimo, restantes = None, limite
+    while restantes is None or restantes > 0:
+        tamano = TAMANO_PAGINA_CONSULTA if restantes is None else min(restantes, TAMANO_PAGINA_CONSULTA)
+        pagina = db.obtener_pagina(after_id=ultimo, limit=tamano)
+        if not pagina:
+            return
+        yield from pagina
+        ultimo = pagina[-1][0]
+        if restantes is not None:
+            restantes -= len(pagina)
+
+def comando_query(db, args):
+    """Escribe en stdout los clientes que coinciden con el texto (o todos si no se indica) a medida que se leen."""
+    tipo = None
+    if args.tipo:
+        tipo = args.tipo if args.tipo.startswith("Cliente") else "Cliente" + args.tipo
+    if args.texto:
+        filas = db.buscar(args.texto, tipo=tipo, limit=args.limite or 50)
+    elif tipo:
+        # Una categoría completa se lee en orden de ID por el índice (tipo, id), sin filtrar en Python
+        filas = db.buscar("", tipo=tipo, limit=args.limite or -1)
+    else:
+        filas = _paginas(db, args.limite)
+
+    if args.formato == "jsonl":
+        escribir = lambda fila: sys.stdout.write(json.dumps(dict(zip(COLUMNAS_CONSULTA, fila)), ensure_ascii=False) + "\n")
+    else:
+        escritor = csv.writer(sys.stdout, delimiter="\t" if args.formato == "tsv" else ",", lineterminator="\n")
+        if args.encabezado:
+            escritor.writerow(COLUMNAS_CONSULTA)
+        escribir = escritor.writerow
+    encontrados = 0
+    for fila in filas:
+        escribir(fila)
+        encontrados += 1
+    return SALIDA_OK if encontrados else SALIDA_PARCIAL
+
+def comando_stats(db, args):
+    """Resumen de la base leído de las tablas de resumen; --verificar las contrasta con la tabla completa."""
+    if args.verificar or args.reconstruir:
+        verificacion = db.verificar_estadisticas(reconstruir=args.reconstruir)
+        if verificacion is None:
+            print("La verificación falló; revise el log del sistema.", file=sys.stderr)
+            return SALIDA_ERROR
+        for tabla, clave, esperado, guardado in verificacion["diferencias"]:
+            print(f"{tabla} [{clave}]: esperado {esperado}, guardado {guardado}", file=sys.stderr)
+        if not verificacion["consistente"] and not verificacion["reconstruido"]:
+            print(f"{len(verificacion['diferencias'])} diferencias; use --reconstruir para corregirlas.", file=sys.stderr)
+            return SALIDA_PARCIAL
+    estadisticas = db.estadisticas(args.empresas)
+    if estadisticas is None:
+        print("No se pudieron leer las estadísticas; revise el log del sistema.", file=sys.stderr)
+        return SALIDA_ERROR
+    datos = {**estadisticas, "notificaciones": db.contar_notificaciones(),
+             "busqueda_texto_completo": db.fts_disponible,
+             "bytes": os.path.getsize(db.db_name) if os.path.exists(db.db_name) else 0}
+    if args.json:
+        print(json.dumps(datos, ensure_ascii=False))
+        return SALIDA_OK
+    print(f"Clientes: {datos['clientes']}")
+    for tipo, cantidad in sorted(datos["por_tipo"].items()):
+        promedio = datos["descuento_promedio"].get(tipo)
+        print(f"  {tipo}: {cantidad}" + (f" (descuento promedio {promedio}%)" if promedio is not None else ""))
+    print(f"Empresas: {datos['empresas']}")
+    for empresa, cantidad in datos["top_empresas"]:
+        print(f"  {empresa}: {cantidad}")
+    print("Notificaciones: " + (", ".join(f"{e}: {n}" for e, n in sorted(datos["notificaciones"].items())) or "ninguna"))
+    print(f"Búsqueda de texto completo: {'sí' if datos['busqueda_texto_completo'] else 'no (LIKE)'}")
+    print(f"Tamaño del archivo: {datos['bytes']} bytes")
+    return SALIDA_OK
+
+def comando_vacuum(db, args):
+    resumen = db.compactar(args.purgar_enviadas)
+    if resumen is None:
+        print("La compactación falló; revise el log del sistema.", file=sys.stderr)
+        return SALIDA_ERROR
+    print(f"{resumen['bytes_antes']} -> {resumen['bytes_despues']} bytes, "
+          f"{resumen['notificaciones_purgadas']} notificaciones purgadas.")
+    return SALIDA_OK
+
+def comando_backup(db, args):
+    """Respaldo incremental de los cambios desde el anterior; completo con --snapshot o si aún no hay uno."""
+    from respaldo import GestorRespaldos
+
+    gestor = GestorRespaldos(db, args.directorio)
+    if args.snapshot or gestor.manifiesto()["snapshot"] is None:
+        resumen = gestor.snapshot()
+        if resumen is None:
+            print("El snapshot falló; revise el log del sistema.", file=sys.stderr)
+            return SALIDA_ERROR
+        print(f"Snapshot completo en {resumen['ruta']} (cambio {resumen['seq']}, {resumen['bytes']} bytes).")
+        return SALIDA_OK
+    resumen = gestor.exportar_incremental(comprimir=args.comprimir)
+    if resumen is None:
+        print("El respaldo incremental falló; revise el log del sistema.", file=sys.stderr)
+        return SALIDA_ERROR
+    if resumen["ruta"] is None:
+        print(f"Sin cambios desde el cambio {resumen['desde']}.")
+    else:
+        print(f"{resumen['filas']} clientes modificados en {resumen['ruta']} "
+              f"(cambios {resumen['desde']} a {resumen['hasta']}).")
+    return SALIDA_OK
+
+def comando_restore(db, args):
+    """Reconstruye una base nueva desde el snapshot y los deltas del directorio de respaldos."""
+    from respaldo import GestorRespaldos
+
+    try:
+        resumen = GestorRespaldos(db, args.directorio).restaurar(args.destino, hasta=args.hasta)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return SALIDA_ERROR
+    print(f"Base {args.destino} restaurada hasta el cambio {resumen['seq']} ({resumen['deltas']} respaldos incrementales).")
+    return SALIDA_OK
+
+def comando_serve(db, args):
+    """Atiende a varios puestos sobre esta base hasta Ctrl+C (ver servidor.py)."""
+    from servidor import ServidorGIC
+
+    servidor = ServidorGIC(db, args.host, args.puerto, lectores=args.lectores,
+                           directorio_exportacion=args.exportaciones, token=os.environ.get("GIC_TOKEN"))
+    print(f"Servidor GIC en http://{args.host}:{args.puerto} (Ctrl+C para detener)", file=sys.stderr)
+    if not os.environ.get("GIC_TOKEN"):
+        # Sin token configurado se generó uno: los puestos lo necesitan para leer y escribir
+        print(f"Token de acceso para los puestos: GIC_TOKEN={servidor.token}", file=sys.stderr)
+    servidor.ejecutar()
+    return SALIDA_OK
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Gestor Inteligente de Clientes - modo línea de comandos.")
+    parser.add_argument("--db", default="solution_tech.db", help="Archivo de la base de datos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("import", help="Importa clientes desde CSV o JSON Lines")
+    p.add_argument("archivo", help="Ruta del archivo (.csv, .jsonl, opcionalmente .gz) o '-' para stdin")
+    p.add_argument("--formato", choices=("csv", "jsonl"), help="Por defecto se deduce de la extensión")
+    p.add_argument("--actualizar", action="store_true", help="Actualiza los IDs existentes en lugar de rechazarlos")
+    p.add_argument("--validar-identidad", action="store_true", help="Valida cada ID con la API de identidad")
+    p.add_argument("--lote", type=int, default=TAMANO_BLOQUE_IMPORTACION, help="Registros por bloque y transacción")
+    p.add_argument("--procesos", type=int, help="Procesos de validación (por defecto uno por núcleo; 0 valida en este proceso)")
+    p.add_argument("--rechazos", help="Archivo JSON Lines de filas rechazadas (por defecto ARCHIVO.rechazos.jsonl)")
+    p.set_defaults(funcion=comando_import)
+
+    p = sub.add_parser("export", help="Exporta la base a JSON Lines y CSV")
+    p.add_argument("--json", default="clientes_backup.jsonl")
+    p.add_argument("--csv", default="clientes_backup.csv")
+    p.add_argument("--comprimir", action="store_true", help="Escribe los archivos en gzip")
+    p.set_defaults(funcion=comando_export)
+
+    p = sub.add_parser("query", help="Busca clientes y los escribe en stdout")
+    p.add_argument("texto", nargs="?", help="Términos de búsqueda; sin texto lista todos los clientes")
+    p.add_argument("--tipo", help="Regular, Premium o Corporativo")
+    p.add_argument("--limite", type=int, help="Máximo de resultados (50 por defecto al buscar texto)")
+    p.add_argument("--formato", choices=("tsv", "csv", "jsonl"), default="tsv")
+    p.add_argument("--encabezado", action="store_true", help="Incluye la fila de encabezado (tsv/csv)")
+    p.set_defaults(funcion=comando_query)
+
+    p = sub.add_parser("stats", help="Muestra un resumen de la base")
+    p.add_argument("--json", action="store_true", help="Salida en JSON")
+    p.add_argument("--empresas", type=int, default=10, help="Empresas con más clientes a listar")
+    p.add_argument("--verificar", action="store_true", help="Contrasta el resumen con un recuento completo")
+    p.add_argument("--reconstruir", action="store_true", help="Como --verificar, y corrige el resumen si difiere")
+    p.set_defaults(funcion=comando_stats)
+
+    p = sub.add_parser("vacuum", help="Compacta la base y reconstruye el índice de búsqueda")
+    p.add_argument("--purgar-enviadas", type=float, metavar="DIAS",
+                   help="Elimina antes las notificaciones enviadas hace más de DIAS días")
+    p.set_defaults(funcion=comando_vacuum)
+
+    p = sub.add_parser("backup", help="Respaldo incremental (o completo con --snapshot)")
+    p.add_argument("--directorio", default="respaldos", help="Directorio de snapshots, deltas y manifiesto")
+    p.add_argument("--snapshot", action="store_true", help="Genera un snapshot completo que reinicia la cadena")
+    p.add_argument("--comprimir", action="store_true", help="Escribe el delta en gzip")
+    p.set_defaults(funcion=comando_backup)
+
+    p = sub.add_parser("restore", help="Restaura el último snapshot y sus deltas en una base nueva")
+    p.add_argument("destino", help="Ruta de la base a crear (no debe existir)")
+    p.add_argument("--directorio", default="respaldos")
+    p.add_argument("--hasta", type=int, metavar="CAMBIO", help="Aplica solo los deltas hasta ese número de cambio")
+    p.set_defaults(funcion=comando_restore)
+
+    p = sub.add_parser("serve", help="Sirve la base por HTTP a varios puestos (GIC_SERVIDOR=http://HOST:PUERTO, "
+                                     "GIC_TOKEN=token compartido)")
+    p.add_argument("--host", default="127.0.0.1", help="Interfaz de escucha (solo local por defecto)")
+    p.add_argument("--puerto", type=int, default=8765)
+    p.add_argument("--lectores", type=int, default=8, help="Hilos que atienden lecturas en paralelo")
+    p.add_argument("--exportaciones", default="exportaciones", help="Directorio donde se escriben las exportaciones remotas")
+    p.set_defaults(funcion=comando_serve)
+    return parser
+
+def ejecutar(argv):
+    """Punto de entrada de la línea de comandos; devuelve el código de salida del proceso."""
+    try:
+        args = crear_parser().parse_args(argv)
+    except SystemExit as e:
+        return SALIDA_ERROR if e.code else SALIDA_OK  # --help sale con 0, argumentos inválidos con 2
+    try:
+        with DatabaseManager(args.db) as db:
+            codigo = args.funcion(db, args)
+        registrar_evento(f"Comando '{args.comando}' finalizado con código {codigo}.", operacion="cli", resultado=codigo)
+        return codigo
+    except BrokenPipeError:
+        # El consumidor de la salida (por ejemplo 'head') cerró la tubería: no es un error.
+        # stdout se redirige a devnull para que el vaciado final del intérprete no vuelva a fallar.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return SALIDA_OK
+    except Exception as e:
+        registrar_error(f"Error en el comando '{args.comando}': {e}", operacion="cli", resultado="error")
+        print(f"Error: {e}", file=sys.stderr)
+        return SALIDA_ERROR
@@ -1,136 +1,1097 @@
 import sqlite3
 import json
 import csv
+import gzip
 import os
-from logger import registrar_evento, registrar_error
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from logger import ms_desde, registrar_evento, registrar_error
+from metricas import medir, registro
+from models import TIPOS_CLIENTE, Cliente, hidratar_filas
+
+# Resultado por fila de las operaciones masivas: estado es 'insertado', 'actualizado',
+# 'duplicado' o 'invalido'; motivo explica los dos últimos casos.
+ResultadoFila = namedtuple("ResultadoFila", ["id_cliente", "estado", "motivo"])
+
+_PATRON_DESCUENTO = re.compile(r"Descuento:\s*(\d+)%")
+_PREFIJO_EMPRESA = "Empresa: "
+
+def _parsear_extra(extra):
+    """Interpreta el texto de la antigua columna 'extra' y devuelve (descuento, empresa)."""
+    extra = extra or ""
+    coincidencia = _PATRON_DESCUENTO.match(extra)
+    if coincidencia:
+        return int(coincidencia.group(1)), None
+    if extra.startswith(_PREFIJO_EMPRESA):
+        return None, extra[len(_PREFIJO_EMPRESA):]
+    return None, None
 
 class DatabaseManager:
     """Clase responsable de la persistencia de datos en SQLite y backups externos."""
-    
-    def __init__(self, db_name="solution_tech.db"):
+
+    # Sentencias reutilizadas: al ser siempre el mismo texto SQL, la caché de
+    # sentencias preparadas de cada conexión evita recompilarlas en cada llamada.
+    SQL_AHORA = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+    SQL_INSERTAR = f"""INSERT INTO clientes (id, nombre, email, telefono, tipo, descuento, empresa, created_at, updated_at) 
+                       VALUES (?, ?, ?, ?, ?, ?, ?, {SQL_AHORA}, {SQL_AHORA})"""
+    SQL_ACTUALIZAR = f"""UPDATE clientes 
+                        SET nombre = ?, email = ?, telefono = ?, tipo = ?, descuento = ?, empresa = ?, 
+                            updated_at = {SQL_AHORA} 
+                        WHERE id = ?"""
+    SQL_UPSERT = SQL_INSERTAR + """ ON CONFLICT(id) DO UPDATE 
+                        SET nombre = excluded.nombre, email = excluded.email, telefono = excluded.telefono, 
+                            tipo = excluded.tipo, descuento = excluded.descuento, empresa = excluded.empresa, 
+                            updated_at = excluded.updated_at"""
+    SQL_ELIMINAR = "DELETE FROM clientes WHERE id = ?"
+    # Vista de 6 columnas que consume la interfaz: 'extra' se arma a partir de las columnas tipadas
+    SQL_EXTRA = """CASE WHEN {t}descuento IS NOT NULL THEN 'Descuento: ' || {t}descuento || '%' 
+                        WHEN {t}empresa IS NOT NULL THEN 'Empresa: ' || {t}empresa ELSE '' END"""
+    SQL_COLUMNAS = "{t}id, {t}nombre, {t}email, {t}telefono, {t}tipo, " + SQL_EXTRA + " AS extra"
+    SQL_TODOS = "SELECT " + SQL_COLUMNAS.format(t="") + " FROM clientes"
+    SQL_BUSCAR_FTS = ("SELECT " + SQL_COLUMNAS.format(t="c.") + 
+                      " FROM clientes_fts JOIN clientes c ON c.rowid = clientes_fts.rowid WHERE clientes_fts MATCH ?")
+    # Paginación por clave (keyset): usa el índice de la clave primaria en lugar de OFFSET
+    SQL_PAGINA = {
+        ("asc", False): SQL_TODOS + " ORDER BY id ASC LIMIT ?",
+        ("asc", True): SQL_TODOS + " WHERE id > ? ORDER BY id ASC LIMIT ?",
+        ("desc", False): SQL_TODOS + " ORDER BY id DESC LIMIT ?",
+        ("desc", True): SQL_TODOS + " WHERE id < ? ORDER BY id DESC LIMIT ?",
+    }
+
+    # Tablas de resumen (migración 7): {origen} es un SELECT con las filas a sumar, sea la fila de
+    # un trigger (new.*) o un GROUP BY sobre toda la tabla al reconstruirlas
+    SQL_SUMAR_TIPOS = """INSERT INTO resumen_tipos (tipo, clientes, con_descuento, suma_descuento) {origen}
+                         ON CONFLICT(tipo) DO UPDATE SET clientes = clientes + excluded.clientes,
+                             con_descuento = con_descuento + excluded.con_descuento,
+                             suma_descuento = suma_descuento + excluded.suma_descuento"""
+    SQL_SUMAR_EMPRESAS = """INSERT INTO resumen_empresas (empresa, clientes) {origen}
+                            ON CONFLICT(empresa) DO UPDATE SET clientes = clientes + excluded.clientes"""
+    SQL_ORIGEN_TIPOS = """SELECT tipo, COUNT(*), COUNT(descuento), COALESCE(SUM(descuento), 0)
+                          FROM clientes GROUP BY tipo"""
+    SQL_ORIGEN_EMPRESAS = "SELECT empresa, COUNT(*) FROM clientes WHERE empresa IS NOT NULL GROUP BY empresa"
+
+    # Ajustes de la conexión persistente
+    TIMEOUT_OCUPADO = 5.0        # Segundos de espera ante "database is locked"
+    SENTENCIAS_EN_CACHE = 128    # Tamaño de la caché de sentencias preparadas por conexión
+    TAMANO_LOTE = 500            # Filas por executemany en las operaciones masivas (< 999 parámetros)
+    TAMANO_BLOQUE_EXPORTACION = 1000  # Filas leídas por fetchmany durante la exportación
+
+    def __init__(self, db_name="solution_tech.db", timeout=TIMEOUT_OCUPADO):
         self.db_name = db_name
+        self.timeout = timeout
+        # Una conexión por hilo: sqlite3 no permite compartir conexiones entre hilos
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+        # Observadores de cambios: callback(evento, fila)
+        self._suscriptores = []
+        self.fts_disponible = False
         self.crear_tabla()
 
-    def crear_tabla(self):
-        """Crea la estructura de la tabla y aplica migraciones de columnas si es necesario."""
-        try:
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
-                # Inicialización de la tabla base con campos de negocio
-                cursor.execute('''CREATE TABLE IF NOT EXISTS clientes 
-                                 (id TEXT PRIMARY KEY, nombre TEXT, email TEXT, 
-                                  tipo TEXT, extra TEXT)''')
-                
-                # Proceso de migración para asegurar la existencia de la columna 'telefono'
-                cursor.execute("PRAGMA table_info(clientes)")
-                columnas = [col[1] for col in cursor.fetchall()]
-                
-                if 'telefono' not in columnas:
-                    cursor.execute("ALTER TABLE clientes ADD COLUMN telefono TEXT DEFAULT 'Sin Teléfono'")
-                
+    def conexion(self):
+        """Devuelve la conexión persistente del hilo actual, creándola y ajustándola si no existe."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: las transacciones se gestionan explícitamente en transaccion().
+            # check_same_thread=False solo para que close() pueda cerrarla desde otro hilo:
+            # cada conexión se sigue usando exclusivamente en el hilo que la creó.
+            conn = sqlite3.connect(self.db_name, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=self.SENTENCIAS_EN_CACHE)
+            # WAL permite lectores concurrentes con un escritor y abarata cada commit;
+            # synchronous=NORMAL evita el fsync por transacción sin riesgo de corrupción en WAL.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+            self._local.profundidad = 0
+            self._local.eventos = []
+            with self._lock:
+                self._conexiones.append(conn)
+                registro.medidor("db_conexiones_abiertas", "Conexiones SQLite abiertas").fijar(len(self._conexiones))
+        return conn
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa las operaciones del bloque en una única transacción de escritura.
+        Los bloques anidados se convierten en SAVEPOINTs, de modo que un fallo interno
+        solo deshace su propia parte y el commit ocurre una sola vez al final.
+        """
+        conn = self.conexion()
+        nivel = self._local.profundidad
+        eventos = self._local.eventos
+        eventos_previos = len(eventos)
+        if nivel == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute(f"SAVEPOINT sp_{nivel}")
+        self._local.profundidad = nivel + 1
+        try:
+            yield conn
+        except BaseException:
+            if nivel == 0:
+                conn.rollback()
+                registro.contador("db_transacciones_revertidas_total", "Transacciones revertidas").incrementar()
+            else:
+                conn.execute(f"ROLLBACK TO sp_{nivel}")
+                conn.execute(f"RELEASE sp_{nivel}")
+            # Los cambios deshechos no deben notificarse
+            del eventos[eventos_previos:]
+            raise
+        else:
+            if nivel == 0:
                 conn.commit()
+                registro.contador("db_transacciones_total", "Transacciones confirmadas").incrementar()
+            else:
+                conn.execute(f"RELEASE sp_{nivel}")
+        finally:
+            self._local.profundidad = nivel
+
+        # Los eventos solo se emiten una vez confirmada la transacción externa
+        if nivel == 0 and eventos:
+            pendientes = eventos[:]
+            del eventos[:]
+            for evento, fila in pendientes:
+                self._emitir(evento, fila)
+
+    def suscribir(self, callback):
+        """
+        Registra un observador de cambios. callback(evento, fila) se invoca tras cada commit,
+        en el hilo que realizó la escritura, con evento igual a:
+        'insertado' / 'actualizado' (fila completa), 'eliminado' (fila = (id,)),
+        'eliminado_lote' (fila = tupla con los IDs eliminados), 'actualizado_lote' (fila = tupla
+        de filas completas, una por cliente actualizado) o 'masivo' (fila = None, tras operaciones
+        masivas que requieren resincronizar). Una fila completa es la tupla de 6 columnas
+        (id, nombre, email, telefono, tipo, extra) que devuelven obtener_todos/obtener_por_id.
+        """
+        self._suscriptores.append(callback)
+
+    def desuscribir(self, callback):
+        """Elimina un observador previamente registrado."""
+        if callback in self._suscriptores:
+            self._suscriptores.remove(callback)
+
+    def _notificar(self, evento, fila):
+        """Encola un evento de cambio; se emitirá cuando la transacción en curso se confirme."""
+        if self._suscriptores:
+            self._local.eventos.append((evento, fila))
+
+    def _emitir(self, evento, fila):
+        for callback in list(self._suscriptores):
+            try:
+                callback(evento, fila)
+            except Exception as e:
+                # Un observador defectuoso no debe afectar la operación ya confirmada
+                registrar_error(f"Error en observador de cambios ({evento}): {e}")
+
+    def close(self):
+        """Cierra todas las conexiones abiertas por el gestor (de todos los hilos)."""
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+            registro.medidor("db_conexiones_abiertas", "Conexiones SQLite abiertas").fijar(0)
+        for conn in conexiones:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                registrar_error(f"Error al cerrar la conexión: {e}")
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Migraciones del esquema en orden; PRAGMA user_version guarda cuántas se aplicaron
+    MIGRACIONES = (
+        "_migrar_tabla_base",
+        "_migrar_busqueda",
+        "_migrar_outbox",
+        "_migrar_columnas_tipadas",
+        "_migrar_duplicados",
+        "_migrar_historial_cambios",
+        "_migrar_estadisticas",
+        "_migrar_indice_tipo",
+    )
+
+    @medir("db_crear_tabla")
+    def crear_tabla(self):
+        """
+        Lleva el esquema a la versión actual aplicando solo las migraciones pendientes.
+        Si la base ya está al día, el arranque se limita a leer PRAGMA user_version.
+        """
+        try:
+            conn = self.conexion()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for numero in range(version + 1, len(self.MIGRACIONES) + 1):
+                migracion = self.MIGRACIONES[numero - 1]
+                with self.transaccion():
+                    # Otro proceso pudo aplicarla mientras se esperaba el bloqueo de escritura
+                    if conn.execute("PRAGMA user_version").fetchone()[0] >= numero:
+                        continue
+                    getattr(self, migracion)(conn)
+                    conn.execute(f"PRAGMA user_version = {numero}")
+                registrar_evento(f"Migración {numero} ({migracion}) aplicada a {self.db_name}.")
+            self.fts_disponible = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'").fetchone() is not None
         except sqlite3.Error as e:
             registrar_error(f"Error en la migración de DB: {e}")
 
+    @staticmethod
+    def _columnas(conn, tabla):
+        return [col[1] for col in conn.execute(f"PRAGMA table_info({tabla})").fetchall()]
+
+    def _migrar_tabla_base(self, conn):
+        """Migración 1: tabla base de clientes con la columna 'telefono'."""
+        # Inicialización de la tabla base con campos de negocio
+        conn.execute('''CREATE TABLE IF NOT EXISTS clientes 
+                         (id TEXT PRIMARY KEY, nombre TEXT, email TEXT, 
+                          tipo TEXT, extra TEXT)''')
+        
+        # Proceso de migración para asegurar la existencia de la columna 'telefono'
+        if 'telefono' not in self._columnas(conn, "clientes"):
+            conn.execute("ALTER TABLE clientes ADD COLUMN telefono TEXT DEFAULT 'Sin Teléfono'")
+
+    def _migrar_busqueda(self, conn):
+        """Migración 2: índices secundarios e índice de texto completo."""
+        # Índices secundarios para búsquedas exactas y filtros por categoría
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_email ON clientes(email)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_telefono ON clientes(telefono)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_tipo ON clientes(tipo)")
+        self._crear_indice_texto(conn, "extra")
+
+    def _migrar_outbox(self, conn):
+        """Migración 3: bandeja de salida (outbox) de notificaciones."""
+        # Se escribe en la misma transacción que el cliente y la vacía un despachador
+        # en segundo plano con reintentos.
+        conn.execute('''CREATE TABLE IF NOT EXISTS notificaciones_outbox 
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT, id_cliente TEXT, tipo TEXT, 
+                          payload TEXT, estado TEXT DEFAULT 'pendiente', intentos INTEGER DEFAULT 0, 
+                          proximo_intento REAL, ultimo_error TEXT, creado REAL, enviado REAL)''')
+        conn.execute("""CREATE INDEX IF NOT EXISTS idx_outbox_pendientes 
+                        ON notificaciones_outbox(estado, proximo_intento)""")
+
+    def _migrar_columnas_tipadas(self, conn):
+        """
+        Migración 4: reemplaza el texto libre de 'extra' por columnas tipadas
+        (descuento, empresa) y agrega las marcas de tiempo created_at / updated_at.
+        Los valores existentes se completan por bloques interpretando 'extra'.
+        """
+        columnas = self._columnas(conn, "clientes")
+        for columna, tipo in (("descuento", "INTEGER"), ("empresa", "TEXT"),
+                              ("created_at", "TEXT"), ("updated_at", "TEXT")):
+            if columna not in columnas:
+                conn.execute(f"ALTER TABLE clientes ADD COLUMN {columna} {tipo}")
+
+        # El índice de texto pasa a indexar 'empresa' en lugar de 'extra'. Se elimina antes del
+        # completado para no disparar sus triggers por cada fila, y se reconstruye al final.
+        tenia_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'").fetchone()
+        if tenia_fts:
+            for trigger in ("clientes_fts_ai", "clientes_fts_ad", "clientes_fts_au"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("DROP TABLE clientes_fts")
+
+        if "extra" in columnas:
+            ahora = conn.execute(f"SELECT {self.SQL_AHORA}").fetchone()[0]
+            ultimo = 0
+            while True:
+                bloque = conn.execute("SELECT rowid, extra FROM clientes WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                      (ultimo, self.TAMANO_BLOQUE_EXPORTACION)).fetchall()
+                if not bloque:
+                    break
+                conn.executemany("""UPDATE clientes SET descuento = ?, empresa = ?, 
+                                    created_at = COALESCE(created_at, ?), updated_at = COALESCE(updated_at, ?) 
+                                    WHERE rowid = ?""",
+                                 [(*_parsear_extra(extra), ahora, ahora, rowid) for rowid, extra in bloque])
+                ultimo = bloque[-1][0]
+
+        # DROP COLUMN existe desde SQLite 3.35; en versiones previas la columna queda sin uso
+        if "extra" in columnas and sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute("ALTER TABLE clientes DROP COLUMN extra")
+
+        if tenia_fts:
+            self._crear_indice_texto(conn, "empresa")
+
+    def _migrar_duplicados(self, conn):
+        """
+        Migración 5: tablas del detector de duplicados (duplicados.py).
+        'clientes_claves' guarda los valores normalizados de cada cliente y 'duplicados_revision'
+        los pares candidatos pendientes de revisión. Los triggers descartan las claves que
+        quedan obsoletas al editar o eliminar un cliente.
+        """
+        conn.execute('''CREATE TABLE IF NOT EXISTS clientes_claves 
+                         (id TEXT PRIMARY KEY, nombre_clave TEXT, email_norm TEXT, telefono_norm TEXT)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_claves_nombre ON clientes_claves(nombre_clave)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_claves_email ON clientes_claves(email_norm)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_claves_telefono ON clientes_claves(telefono_norm)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS duplicados_revision 
+                         (id_a TEXT, id_b TEXT, puntaje REAL, motivo TEXT, estado TEXT DEFAULT 'pendiente', 
+                          detectado REAL, resuelto REAL, PRIMARY KEY (id_a, id_b))''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_revision_id_b ON duplicados_revision(id_b)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_revision_estado ON duplicados_revision(estado, puntaje)")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS clientes_claves_ad AFTER DELETE ON clientes BEGIN
+                            DELETE FROM clientes_claves WHERE id = old.id;
+                            DELETE FROM duplicados_revision WHERE id_a = old.id OR id_b = old.id;
+                        END""")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS clientes_claves_au AFTER UPDATE OF nombre, email, telefono 
+                        ON clientes BEGIN
+                            DELETE FROM clientes_claves WHERE id = old.id;
+                        END""")
+
+    def _migrar_historial_cambios(self, conn):
+        """
+        Migración 6: historial de cambios para los respaldos incrementales (respaldo.py).
+        Los triggers anotan en 'clientes_cambios' el ID de cada alta, edición o baja; 'seq'
+        crece siempre (AUTOINCREMENT no reutiliza valores purgados) y sirve de checkpoint.
+        """
+        conn.execute('''CREATE TABLE IF NOT EXISTS clientes_cambios 
+                         (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL, operacion TEXT NOT NULL)''')
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS clientes_cambios_ai AFTER INSERT ON clientes BEGIN
+                            INSERT INTO clientes_cambios (id, operacion) VALUES (new.id, 'upsert');
+                        END""")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS clientes_cambios_au AFTER UPDATE ON clientes BEGIN
+                            INSERT INTO clientes_cambios (id, operacion) 
+                                SELECT old.id, 'delete' WHERE old.id IS NOT new.id;
+                            INSERT INTO clientes_cambios (id, operacion) VALUES (new.id, 'upsert');
+                        END""")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS clientes_cambios_ad AFTER DELETE ON clientes BEGIN
+                            INSERT INTO clientes_cambios (id, operacion) VALUES (old.id, 'delete');
+                        END""")
+
+    def _migrar_estadisticas(self, conn):
+        """
+        Migración 7: tablas de resumen para estadisticas(). 'resumen_tipos' guarda por tipo la
+        cantidad de clientes y la suma de descuentos; 'resumen_empresas', los clientes de cada
+        empresa. Los triggers las mantienen al día en la misma transacción que cada cambio, así
+        que leerlas nunca requiere recorrer 'clientes'. Se completan con los datos existentes.
+        """
+        conn.execute('''CREATE TABLE IF NOT EXISTS resumen_tipos
+                         (tipo TEXT PRIMARY KEY, clientes INTEGER NOT NULL, con_descuento INTEGER NOT NULL,
+                          suma_descuento INTEGER NOT NULL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS resumen_empresas
+                         (empresa TEXT PRIMARY KEY, clientes INTEGER NOT NULL)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_resumen_empresas_clientes ON resumen_empresas(clientes)")
+        sumar = (self.SQL_SUMAR_TIPOS.format(origen="SELECT new.tipo, 1, new.descuento IS NOT NULL, "
+                                                    "COALESCE(new.descuento, 0) WHERE true") + ";\n" +
+                 self.SQL_SUMAR_EMPRESAS.format(origen="SELECT new.empresa, 1 WHERE new.empresa IS NOT NULL") + ";")
+        restar = """UPDATE resumen_tipos SET clientes = clientes - 1,
+                        con_descuento = con_descuento - (old.descuento IS NOT NULL),
+                        suma_descuento = suma_descuento - COALESCE(old.descuento, 0)
+                    WHERE tipo = old.tipo;
+                    DELETE FROM resumen_tipos WHERE tipo = old.tipo AND clientes <= 0;
+                    UPDATE resumen_empresas SET clientes = clientes - 1 WHERE empresa = old.empresa;
+                    DELETE FROM resumen_empresas WHERE empresa = old.empresa AND clientes <= 0;"""
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS clientes_resumen_ai AFTER INSERT ON clientes BEGIN {sumar} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS clientes_resumen_ad AFTER DELETE ON clientes BEGIN {restar} END")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS clientes_resumen_au AFTER UPDATE OF tipo, descuento, empresa
+                         ON clientes BEGIN {restar} {sumar} END""")
+        self._reconstruir_resumen(conn)
+
+    def _migrar_indice_tipo(self, conn):
+        """
+        Migración 8: el índice por tipo incluye el ID, de modo que listar una categoría en orden
+        (buscar sin texto y con tipo) recorre el índice en lugar de ordenar todas sus filas.
+        """
+        conn.execute("DROP INDEX IF EXISTS idx_clientes_tipo")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_tipo_id ON clientes(tipo, id)")
+
+    def _reconstruir_resumen(self, conn):
+        """Recalcula las tablas de resumen desde 'clientes' (dentro de una transacción abierta)."""
+        conn.execute("DELETE FROM resumen_tipos")
+        conn.execute("DELETE FROM resumen_empresas")
+        conn.execute(self.SQL_SUMAR_TIPOS.format(origen=self.SQL_ORIGEN_TIPOS))
+        conn.execute(self.SQL_SUMAR_EMPRESAS.format(origen=self.SQL_ORIGEN_EMPRESAS))
+
+    def _crear_indice_texto(self, conn, columna_detalle):
+        """
+        Crea el índice de texto completo FTS5 sobre la tabla clientes, sincronizado mediante triggers.
+        'columna_detalle' es la columna con los datos propios de cada tipo de cliente.
+        Si la versión de SQLite no incluye FTS5, la búsqueda recurre a LIKE sobre la tabla.
+        """
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'").fetchone():
+            return
+        columnas = f"id, nombre, email, telefono, {columna_detalle}"
+        nuevos = ", ".join(f"new.{c.strip()}" for c in columnas.split(","))
+        viejos = ", ".join(f"old.{c.strip()}" for c in columnas.split(","))
+        try:
+            # Savepoint propio: si FTS5 no existe, solo se deshace esta parte de la migración
+            with self.transaccion():
+                conn.execute(f"""CREATE VIRTUAL TABLE clientes_fts USING fts5(
+                                     {columnas},
+                                     content='clientes', content_rowid='rowid',
+                                     tokenize='unicode61 remove_diacritics 2')""")
+                conn.execute(f"""CREATE TRIGGER clientes_fts_ai AFTER INSERT ON clientes BEGIN
+                                     INSERT INTO clientes_fts(rowid, {columnas}) VALUES (new.rowid, {nuevos});
+                                 END""")
+                conn.execute(f"""CREATE TRIGGER clientes_fts_ad AFTER DELETE ON clientes BEGIN
+                                     INSERT INTO clientes_fts(clientes_fts, rowid, {columnas})
+                                     VALUES ('delete', old.rowid, {viejos});
+                                 END""")
+                conn.execute(f"""CREATE TRIGGER clientes_fts_au AFTER UPDATE ON clientes BEGIN
+                                     INSERT INTO clientes_fts(clientes_fts, rowid, {columnas})
+                                     VALUES ('delete', old.rowid, {viejos});
+                                     INSERT INTO clientes_fts(rowid, {columnas}) VALUES (new.rowid, {nuevos});
+                                 END""")
+                # Indexa los registros que existieran antes de crear la tabla virtual
+                conn.execute("INSERT INTO clientes_fts(clientes_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            registrar_error(f"FTS5 no disponible, la búsqueda usará LIKE: {e}")
+
+    @medir("db_eliminar_cliente_db")
     def eliminar_cliente_db(self, id_cliente):
         """Elimina un registro de la base de datos basándose en su ID único."""
+        inicio = time.perf_counter()
         try:
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM clientes WHERE id = ?", (id_cliente,))
-                conn.commit()
+            with self.transaccion() as conn:
+                cursor = conn.execute(self.SQL_ELIMINAR, (id_cliente,))
                 if cursor.rowcount > 0:
-                    registrar_evento(f"ID {id_cliente} eliminado de la base de datos.")
-                    return True
-                return False
+                    self._notificar("eliminado", (id_cliente,))
+            if cursor.rowcount > 0:
+                registrar_evento(f"ID {id_cliente} eliminado de la base de datos.", operacion="eliminar_cliente",
+                                 id_cliente=id_cliente, duracion_ms=ms_desde(inicio), resultado="ok")
+                return True
+            return False
         except sqlite3.Error as e:
-            registrar_error(f"Error al eliminar: {e}")
+            registrar_error(f"Error al eliminar: {e}", operacion="eliminar_cliente", id_cliente=id_cliente,
+                            resultado="error")
             return False
 
-    def guardar_cliente(self, cliente):
-        """Persiste un objeto cliente extrayendo datos específicos mediante inspección de atributos."""
+    @medir("db_eliminar_clientes_lote")
+    def eliminar_clientes_lote(self, ids, tamano_lote=TAMANO_LOTE):
+        """
+        Elimina varios clientes en una única transacción (todos o ninguno) y devuelve la lista
+        de IDs que existían y se eliminaron. Emite un solo evento 'eliminado_lote' con esos IDs.
+        Si la base falla no se elimina ninguno y se relanza el sqlite3.Error, como en actualizar_tipo_lote.
+        """
+        inicio = time.perf_counter()
+        ids = list(dict.fromkeys(ids))
+        try:
+            eliminados = []
+            with self.transaccion() as conn:
+                for desde in range(0, len(ids), tamano_lote):
+                    bloque = ids[desde:desde + tamano_lote]
+                    marcadores = ", ".join("?" * len(bloque))
+                    eliminados.extend(fila[0] for fila in conn.execute(
+                        f"SELECT id FROM clientes WHERE id IN ({marcadores})", bloque))
+                    conn.execute(f"DELETE FROM clientes WHERE id IN ({marcadores})", bloque)
+                if eliminados:
+                    self._notificar("eliminado_lote", tuple(eliminados))
+            registrar_evento(f"{len(eliminados)} de {len(ids)} clientes eliminados en lote.",
+                             operacion="eliminar_clientes_lote", filas=len(eliminados),
+                             duracion_ms=ms_desde(inicio), resultado="ok")
+            return eliminados
+        except sqlite3.Error as e:
+            registrar_error(f"Error al eliminar {len(ids)} clientes en lote: {e}", operacion="eliminar_clientes_lote",
+                            filas=len(ids), resultado="error")
+            raise
+
+    # Cambio de categoría en lote: ?1 tipo, ?2 descuento, ?3 empresa. Se conserva el descuento o la
+    # empresa que el cliente ya tuviera (como al editar uno solo) y se descarta el de la otra categoría.
+    SQL_CAMBIAR_TIPO = f"""UPDATE clientes SET tipo = ?1,
+                               descuento = CASE WHEN ?1 = 'ClientePremium' THEN COALESCE(?2, descuento, 15) END,
+                               empresa = CASE WHEN ?1 = 'ClienteCorporativo'
+                                              THEN COALESCE(?3, empresa, 'Empresa Genérica') END,
+                               updated_at = {SQL_AHORA}
+                           WHERE id IN ({{marcadores}})"""
+
+    @medir("db_actualizar_tipo_lote")
+    def actualizar_tipo_lote(self, ids, tipo, descuento=None, empresa=None, tamano_lote=TAMANO_LOTE):
+        """
+        Cambia la categoría de varios clientes en una única transacción. 'tipo' admite el nombre
+        de la clase (ClientePremium) o la categoría (Premium); 'descuento' y 'empresa' reemplazan
+        los datos propios de la nueva categoría. Devuelve la cantidad de clientes actualizados y
+        emite un solo evento 'actualizado_lote' con sus filas. Lanza ValueError si los datos no
+        son válidos.
+        """
+        inicio = time.perf_counter()
+        clase = TIPOS_CLIENTE.get(tipo) or TIPOS_CLIENTE.get(f"Cliente{tipo}")
+        if clase is None or clase is Cliente:
+            raise ValueError(f"Tipo de cliente desconocido: {tipo}")
+        if descuento is not None:
+            descuento = int(descuento)
+            if not 0 <= descuento <= 100:
+                raise ValueError(f"Descuento inválido: {descuento}. Debe estar entre 0 y 100.")
+        ids = list(dict.fromkeys(ids))
         try:
-            # Determinamos el dato extra según la subclase (Premium o Corporativo)
-            extra = ""
-            if hasattr(cliente, 'descuento'): extra = f"Descuento: {cliente.descuento}%"
-            elif hasattr(cliente, 'empresa'): extra = f"Empresa: {cliente.empresa}"
+            filas = []
+            with self.transaccion() as conn:
+                for desde in range(0, len(ids), tamano_lote):
+                    bloque = ids[desde:desde + tamano_lote]
+                    marcadores = ", ".join("?" * len(bloque))
+                    conn.execute(self.SQL_CAMBIAR_TIPO.format(marcadores=", ".join(f"?{i + 4}" for i in range(len(bloque)))),
+                                 (clase.__name__, descuento, empresa, *bloque))
+                    filas.extend(conn.execute(f"{self.SQL_TODOS} WHERE id IN ({marcadores})", bloque))
+                if filas:
+                    self._notificar("actualizado_lote", tuple(filas))
+            registrar_evento(f"{len(filas)} de {len(ids)} clientes pasados a {clase.__name__} en lote.",
+                             operacion="actualizar_tipo_lote", filas=len(filas), tipo=clase.__name__,
+                             duracion_ms=ms_desde(inicio), resultado="ok")
+            return len(filas)
+        except sqlite3.Error as e:
+            registrar_error(f"Error al cambiar la categoría de {len(ids)} clientes: {e}",
+                            operacion="actualizar_tipo_lote", filas=len(ids), resultado="error")
+            raise
+
+    @staticmethod
+    def _datos_tipados(cliente):
+        """Obtiene los datos propios de la subclase (Premium o Corporativo) como (descuento, empresa)."""
+        return getattr(cliente, 'descuento', None), getattr(cliente, 'empresa', None)
+
+    @staticmethod
+    def _texto_extra(descuento, empresa):
+        """Texto de detalle que muestra la interfaz (equivalente a SQL_EXTRA)."""
+        if descuento is not None: return f"Descuento: {descuento}%"
+        if empresa is not None: return f"Empresa: {empresa}"
+        return ""
+
+    @medir("db_guardar_cliente")
+    def guardar_cliente(self, cliente, notificar=False):
+        """
+        Persiste un objeto cliente extrayendo datos específicos mediante inspección de atributos.
+        Con notificar=True encola el email de bienvenida en el outbox dentro de la misma
+        transacción: o se guardan ambos o ninguno.
+        """
+        inicio = time.perf_counter()
+        try:
+            descuento, empresa = self._datos_tipados(cliente)
             
             # Identificamos el tipo de cliente por el nombre de su clase
             tipo_nombre = type(cliente).__name__
 
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
+            with self.transaccion() as conn:
                 # Inserción parametrizada para evitar inyección SQL
-                cursor.execute("INSERT INTO clientes (id, nombre, email, telefono, tipo, extra) VALUES (?, ?, ?, ?, ?, ?)",
-                               (cliente.id_cliente, cliente.nombre, cliente.email, cliente.telefono, tipo_nombre, extra))
-                conn.commit()
+                conn.execute(self.SQL_INSERTAR, (cliente.id_cliente, cliente.nombre, cliente.email,
+                                                 cliente.telefono, tipo_nombre, descuento, empresa))
+                if notificar:
+                    self._encolar_notificacion(conn, cliente.id_cliente, "bienvenida",
+                                               {"id_cliente": cliente.id_cliente, "nombre": cliente.nombre,
+                                                "email": cliente.email})
+                self._notificar("insertado", (cliente.id_cliente, cliente.nombre, cliente.email, cliente.telefono,
+                                              tipo_nombre, self._texto_extra(descuento, empresa)))
             
-            registrar_evento(f"Cliente {cliente.id_cliente} ({tipo_nombre}) guardado exitosamente.")
+            registrar_evento(f"Cliente {cliente.id_cliente} ({tipo_nombre}) guardado exitosamente.",
+                             operacion="guardar_cliente", id_cliente=cliente.id_cliente,
+                             duracion_ms=ms_desde(inicio), resultado="ok")
         except sqlite3.IntegrityError:
-            registrar_error(f"Intento de duplicación de ID: {cliente.id_cliente}")
+            registrar_error(f"Intento de duplicación de ID: {cliente.id_cliente}", operacion="guardar_cliente",
+                            id_cliente=cliente.id_cliente, resultado="duplicado")
             raise ValueError("El ID del cliente ya existe en el sistema.")
         except Exception as e:
-            registrar_error(f"Error inesperado al guardar: {e}")
+            registrar_error(f"Error inesperado al guardar: {e}", operacion="guardar_cliente",
+                            id_cliente=getattr(cliente, 'id_cliente', None), resultado="error")
+            raise
+
+    def _encolar_notificacion(self, conn, id_cliente, tipo, payload):
+        ahora = time.time()
+        conn.execute("""INSERT INTO notificaciones_outbox (id_cliente, tipo, payload, proximo_intento, creado) 
+                        VALUES (?, ?, ?, ?, ?)""", (id_cliente, tipo, json.dumps(payload, ensure_ascii=False), ahora, ahora))
+
+    @medir("db_obtener_notificaciones_pendientes")
+    def obtener_notificaciones_pendientes(self, limite=50):
+        """Devuelve las notificaciones pendientes cuyo próximo intento ya venció, en orden de llegada."""
+        try:
+            filas = self.conexion().execute(
+                """SELECT id, id_cliente, tipo, payload, intentos FROM notificaciones_outbox 
+                   WHERE estado = 'pendiente' AND proximo_intento <= ? ORDER BY id LIMIT ?""",
+                (time.time(), limite)).fetchall()
+            return [(id_, id_cliente, tipo, json.loads(payload), intentos)
+                    for id_, id_cliente, tipo, payload, intentos in filas]
+        except sqlite3.Error as e:
+            registrar_error(f"Error al consultar el outbox de notificaciones: {e}")
+            return []
+
+    @medir("db_registrar_resultado_notificaciones")
+    def registrar_resultado_notificaciones(self, enviadas, fallidas):
+        """
+        Actualiza el outbox tras un lote de envíos en una sola transacción.
+        'enviadas' es una lista de IDs; 'fallidas' una lista de tuplas
+        (id, intentos, proximo_intento, error, estado) con estado 'pendiente' o 'muerto'.
+        """
+        try:
+            with self.transaccion() as conn:
+                ahora = time.time()
+                conn.executemany("""UPDATE notificaciones_outbox SET estado = 'enviado', enviado = ?, 
+                                    intentos = intentos + 1 WHERE id = ?""", [(ahora, id_) for id_ in enviadas])
+                conn.executemany("""UPDATE notificaciones_outbox SET intentos = ?, proximo_intento = ?, 
+                                    ultimo_error = ?, estado = ? WHERE id = ?""",
+                                 [(intentos, proximo, error, estado, id_) for id_, intentos, proximo, error, estado in fallidas])
+        except sqlite3.Error as e:
+            registrar_error(f"Error al actualizar el outbox de notificaciones: {e}")
             raise
 
+    @medir("db_contar_notificaciones")
+    def contar_notificaciones(self):
+        """Cantidad de notificaciones del outbox por estado (pendiente, enviado, muerto)."""
+        try:
+            return dict(self.conexion().execute(
+                "SELECT estado, COUNT(*) FROM notificaciones_outbox GROUP BY estado").fetchall())
+        except sqlite3.Error as e:
+            registrar_error(f"Error al contar notificaciones: {e}")
+            return {}
+
+    @medir("db_contar_clientes")
+    def contar_clientes(self):
+        """Cantidad de clientes por tipo ({'ClienteRegular': n, ...}), leída de la tabla de resumen."""
+        try:
+            return dict(self.conexion().execute("SELECT tipo, clientes FROM resumen_tipos").fetchall())
+        except sqlite3.Error as e:
+            registrar_error(f"Error al contar clientes: {e}")
+            return {}
+
+    @medir("db_estadisticas")
+    def estadisticas(self, top_empresas=10):
+        """
+        Resumen de la base leído de las tablas de resumen, sin recorrer 'clientes':
+        {'clientes', 'por_tipo', 'descuento_promedio' (por tipo, solo los que tienen descuento),
+        'empresas' (cantidad distinta) y 'top_empresas' [(empresa, clientes), ...]}.
+        Devuelve None si la consulta falla.
+        """
+        try:
+            conn = self.conexion()
+            tipos = conn.execute("SELECT tipo, clientes, con_descuento, suma_descuento FROM resumen_tipos").fetchall()
+            return {
+                "clientes": sum(fila[1] for fila in tipos),
+                "por_tipo": {tipo: clientes for tipo, clientes, _, _ in tipos},
+                "descuento_promedio": {tipo: round(suma / con_descuento, 2)
+                                       for tipo, _, con_descuento, suma in tipos if con_descuento},
+                "empresas": conn.execute("SELECT COUNT(*) FROM resumen_empresas").fetchone()[0],
+                "top_empresas": conn.execute("""SELECT empresa, clientes FROM resumen_empresas
+                                                ORDER BY clientes DESC, empresa LIMIT ?""",
+                                             (top_empresas,)).fetchall(),
+            }
+        except sqlite3.Error as e:
+            registrar_error(f"Error al leer las estadísticas: {e}", operacion="estadisticas", resultado="error")
+            return None
+
+    @medir("db_verificar_estadisticas")
+    def verificar_estadisticas(self, reconstruir=False):
+        """
+        Compara las tablas de resumen con un recálculo completo desde 'clientes' (recorre la
+        tabla) y, con reconstruir=True, las reemplaza si difieren. Devuelve
+        {'consistente', 'diferencias' [(tabla, clave, esperado, guardado)], 'reconstruido'}
+        o None si falló.
+        """
+        inicio = time.perf_counter()
+        try:
+            with self.transaccion() as conn:
+                diferencias = []
+                for tabla, origen in (("resumen_tipos", self.SQL_ORIGEN_TIPOS),
+                                      ("resumen_empresas", self.SQL_ORIGEN_EMPRESAS)):
+                    esperado = {fila[0]: tuple(fila[1:]) for fila in conn.execute(origen)}
+                    guardado = {fila[0]: tuple(fila[1:]) for fila in conn.execute(f"SELECT * FROM {tabla}")}
+                    diferencias.extend((tabla, clave, esperado.get(clave), guardado.get(clave))
+                                       for clave in sorted(esperado.keys() | guardado.keys())
+                                       if esperado.get(clave) != guardado.get(clave))
+                reconstruido = bool(diferencias) and reconstruir
+                if reconstruido:
+                    self._reconstruir_resumen(conn)
+            resultado = "ok" if not diferencias else ("reconstruido" if reconstruido else "inconsistente")
+            registrar_evento(f"Estadísticas verificadas: {len(diferencias)} diferencias.",
+                             operacion="verificar_estadisticas", filas=len(diferencias),
+                             duracion_ms=ms_desde(inicio), resultado=resultado)
+            return {"consistente": not diferencias, "diferencias": diferencias, "reconstruido": reconstruido}
+        except sqlite3.Error as e:
+            registrar_error(f"Error al verificar las estadísticas: {e}", operacion="verificar_estadisticas",
+                            resultado="error")
+            return None
+
+    @medir("db_compactar")
+    def compactar(self, purgar_enviadas_dias=None):
+        """
+        Mantenimiento de la base: opcionalmente elimina las notificaciones ya enviadas hace más
+        de 'purgar_enviadas_dias' días, compacta el archivo con VACUUM y reconstruye el índice
+        de texto (VACUUM puede renumerar los rowid a los que apunta). Devuelve un resumen
+        {'notificaciones_purgadas', 'bytes_antes', 'bytes_despues'} o None si falló.
+        """
+        inicio = time.perf_counter()
+        try:
+            conn = self.conexion()
+            pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+            bytes_antes = conn.execute("PRAGMA page_count").fetchone()[0] * pagina
+            purgadas = 0
+            if purgar_enviadas_dias is not None:
+                with self.transaccion():
+                    purgadas = conn.execute(
+                        "DELETE FROM notificaciones_outbox WHERE estado = 'enviado' AND enviado < ?",
+                        (time.time() - purgar_enviadas_dias * 86400,)).rowcount
+            conn.execute("VACUUM")
+            if self.fts_disponible:
+                with self.transaccion():
+                    conn.execute("INSERT INTO clientes_fts(clientes_fts) VALUES ('rebuild')")
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            resumen = {"notificaciones_purgadas": purgadas, "bytes_antes": bytes_antes,
+                       "bytes_despues": conn.execute("PRAGMA page_count").fetchone()[0] * pagina}
+            registrar_evento(f"Base compactada: {bytes_antes} -> {resumen['bytes_despues']} bytes, "
+                             f"{purgadas} notificaciones purgadas.", operacion="compactar",
+                             duracion_ms=ms_desde(inicio), resultado="ok")
+            return resumen
+        except sqlite3.Error as e:
+            registrar_error(f"Error al compactar la base: {e}", operacion="compactar", resultado="error")
+            return None
+
+    # Columnas de las tuplas crudas que acepta _a_fila, según su largo
+    COLUMNAS_TUPLA = {6: ("id", "nombre", "email", "telefono", "tipo", "extra"),
+                      7: ("id", "nombre", "email", "telefono", "tipo", "descuento", "empresa")}
+
+    def _a_fila(self, registro, validar=True):
+        """
+        Convierte un objeto Cliente o una tupla cruda en los parámetros de inserción
+        (id, nombre, email, telefono, tipo, descuento, empresa). Las tuplas pueden venir
+        tipadas (7 campos) o con el formato de obtener_todos (6 campos, con 'extra' en texto)
+        y se validan con las reglas del modelo (Cliente.desde_registro); validar=False lo omite
+        para tuplas tipadas que ya vienen validadas (importador).
+        """
+        if hasattr(registro, 'id_cliente'):
+            return (registro.id_cliente, registro.nombre, registro.email, registro.telefono,
+                    type(registro).__name__, *self._datos_tipados(registro))
+        fila = tuple(registro)
+        columnas = self.COLUMNAS_TUPLA.get(len(fila))
+        if columnas is None:
+            raise ValueError(f"Se esperaban 6 o 7 campos (id, nombre, email, telefono, tipo, extra | descuento, empresa) "
+                             f"y llegaron {len(fila)}.")
+        if validar or len(fila) == 6:
+            return self._a_fila(Cliente.desde_registro(dict(zip(columnas, fila))))
+        if not fila[0]:
+            raise ValueError("ID de cliente vacío.")
+        return fila
+
+    @staticmethod
+    def _id_registro(registro):
+        """ID de un registro rechazado (objeto Cliente o tupla cruda), para informarlo en su ResultadoFila."""
+        if hasattr(registro, 'id_cliente'):
+            return registro.id_cliente
+        try:
+            return registro[0] if len(registro) else None
+        except TypeError:
+            return None
+
+    # Triggers de inserción que una carga masiva reemplaza por sentencias únicas sobre las filas
+    # nuevas ({columnas} son las del índice de texto)
+    SQL_TRIGGERS_DIFERIDOS = {
+        "clientes_fts_ai": ("INSERT INTO clientes_fts(rowid, {columnas}) SELECT rowid, {columnas} FROM clientes WHERE rowid > ?",),
+        "clientes_cambios_ai": ("INSERT INTO clientes_cambios (id, operacion) SELECT id, 'upsert' FROM clientes WHERE rowid > ? ORDER BY rowid",),
+        "clientes_resumen_ai": (
+            SQL_SUMAR_TIPOS.format(origen="""SELECT tipo, COUNT(*), COUNT(descuento), COALESCE(SUM(descuento), 0)
+                                             FROM clientes WHERE rowid > ? GROUP BY tipo"""),
+            SQL_SUMAR_EMPRESAS.format(origen="""SELECT empresa, COUNT(*) FROM clientes
+                                                WHERE rowid > ? AND empresa IS NOT NULL GROUP BY empresa"""),
+        ),
+    }
+    # Triggers de actualización que durante la carga solo deben aplicarse a las filas previas: las
+    # nuevas que se vuelven a escribir en el mismo lote (IDs repetidos con upsert) ya entran con su
+    # valor final en las sentencias diferidas
+    TRIGGERS_SOLO_FILAS_PREVIAS = ("clientes_fts_au", "clientes_resumen_au")
+
+    @contextmanager
+    def _triggers_diferidos(self, conn):
+        """
+        Dentro de una transacción: suspende los triggers de inserción (índice de texto, historial
+        de cambios y tablas de resumen) y, al salir, los aplica a todas las filas nuevas con una
+        sola sentencia cada uno, varias veces más rápido que fila a fila. Como todo ocurre en la
+        misma transacción, las demás conexiones nunca ven los triggers modificados.
+        """
+        nombres = (*self.SQL_TRIGGERS_DIFERIDOS, *self.TRIGGERS_SOLO_FILAS_PREVIAS)
+        triggers = conn.execute(f"""SELECT name, sql FROM sqlite_master WHERE type = 'trigger' 
+                                    AND name IN ({", ".join("?" * len(nombres))})""", nombres).fetchall()
+        if not triggers:
+            yield
+            return
+        ultimo_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM clientes").fetchone()[0]
+        for nombre, sql in triggers:
+            conn.execute(f"DROP TRIGGER {nombre}")
+            if nombre in self.TRIGGERS_SOLO_FILAS_PREVIAS:
+                conn.execute(re.sub(r"\bBEGIN\b", f"WHEN old.rowid <= {int(ultimo_rowid)} BEGIN", sql, count=1))
+        yield
+        columnas = ", ".join(self._columnas(conn, "clientes_fts")) if self.fts_disponible else ""
+        for nombre, sql in triggers:
+            if nombre in self.TRIGGERS_SOLO_FILAS_PREVIAS:
+                conn.execute(f"DROP TRIGGER {nombre}")
+            # Sin AUTOINCREMENT, las filas insertadas reciben rowid mayores que el máximo previo
+            for sentencia in self.SQL_TRIGGERS_DIFERIDOS.get(nombre, ()):
+                conn.execute(sentencia.format(columnas=columnas), (ultimo_rowid,))
+            conn.execute(sql)
+
+    def _escribir_lote(self, registros, actualizar, tamano_lote, carga_masiva=False, validar=True):
+        """
+        Núcleo de las operaciones masivas: procesa los registros en bloques con executemany
+        dentro de una única transacción y clasifica el resultado de cada fila.
+        """
+        sql = self.SQL_UPSERT if actualizar else self.SQL_INSERTAR
+        resultados = []
+        escritos = False
+        iterador = iter(registros)
+        with self.transaccion() as conn, \
+                (self._triggers_diferidos(conn) if carga_masiva else nullcontext()):
+            while True:
+                bloque = list(islice(iterador, tamano_lote))
+                if not bloque:
+                    break
+
+                filas = []
+                for registro in bloque:
+                    try:
+                        filas.append((self._a_fila(registro, validar), None))
+                    except (ValueError, TypeError) as e:
+                        filas.append((self._id_registro(registro), str(e)))
+
+                # Los bloques anteriores ya están escritos en esta transacción, así que
+                # una sola consulta por bloque detecta los IDs existentes.
+                ids = [fila[0] for fila, error in filas if error is None]
+                marcadores = ", ".join("?" * len(ids))
+                existentes = {row[0] for row in conn.execute(
+                    f"SELECT id FROM clientes WHERE id IN ({marcadores})", ids)} if ids else set()
+
+                aplicar = []
+                for fila, error in filas:
+                    if error is not None:
+                        resultados.append(ResultadoFila(fila, "invalido", error))
+                        continue
+                    id_cliente = fila[0]
+                    if id_cliente in existentes:
+                        if actualizar:
+                            resultados.append(ResultadoFila(id_cliente, "actualizado", None))
+                        else:
+                            resultados.append(ResultadoFila(id_cliente, "duplicado", "El ID del cliente ya existe en el sistema."))
+                            continue
+                    else:
+                        resultados.append(ResultadoFila(id_cliente, "insertado", None))
+                        # Repeticiones dentro del mismo bloque se tratan igual que un ID existente
+                        existentes.add(id_cliente)
+                    aplicar.append(fila)
+
+                conn.executemany(sql, aplicar)
+                if aplicar:
+                    escritos = True
+            if escritos:
+                self._notificar("masivo", None)
+        return resultados
+
+    def _registrar_lote(self, operacion, resultados, inicio):
+        """Deja una única entrada de log con el resumen de una operación masiva."""
+        conteo = {}
+        for resultado in resultados:
+            conteo[resultado.estado] = conteo.get(resultado.estado, 0) + 1
+        resumen = ", ".join(f"{estado}: {cantidad}" for estado, cantidad in sorted(conteo.items()))
+        registrar_evento(f"{operacion} completado ({len(resultados)} filas) - {resumen or 'sin filas'}.",
+                         operacion=operacion, filas=len(resultados), duracion_ms=ms_desde(inicio),
+                         resultado="ok", **conteo)
+
+    @medir("db_guardar_clientes_lote")
+    def guardar_clientes_lote(self, registros, tamano_lote=TAMANO_LOTE, carga_masiva=False, validar=True):
+        """
+        Inserta masivamente clientes (objetos Cliente o tuplas crudas) en una sola transacción.
+        Los IDs ya existentes no se modifican y se informan como 'duplicado'.
+        Con carga_masiva=True el índice de texto y el historial de cambios se actualizan al final
+        en una sola sentencia (conviene para lotes de miles de filas).
+        Las tuplas crudas se validan como los objetos del modelo y las que no cumplen se informan
+        como 'invalido'; validar=False omite esa validación para tuplas tipadas ya validadas.
+        Devuelve la lista de ResultadoFila en el mismo orden de entrada.
+        """
+        inicio = time.perf_counter()
+        try:
+            resultados = self._escribir_lote(registros, False, tamano_lote, carga_masiva, validar)
+        except sqlite3.Error as e:
+            registrar_error(f"Error en la inserción masiva (se revierte el lote completo): {e}",
+                            operacion="guardar_clientes_lote", resultado="error")
+            raise
+        self._registrar_lote("guardar_clientes_lote", resultados, inicio)
+        return resultados
+
+    @medir("db_upsert_clientes_lote")
+    def upsert_clientes_lote(self, registros, tamano_lote=TAMANO_LOTE, carga_masiva=False, validar=True):
+        """
+        Inserta o actualiza masivamente clientes en una sola transacción.
+        Cada fila se informa como 'insertado' o 'actualizado' según existiera su ID.
+        carga_masiva y validar tienen el mismo efecto que en guardar_clientes_lote.
+        """
+        inicio = time.perf_counter()
+        try:
+            resultados = self._escribir_lote(registros, True, tamano_lote, carga_masiva, validar)
+        except sqlite3.Error as e:
+            registrar_error(f"Error en el upsert masivo (se revierte el lote completo): {e}",
+                            operacion="upsert_clientes_lote", resultado="error")
+            raise
+        self._registrar_lote("upsert_clientes_lote", resultados, inicio)
+        return resultados
+
+    @medir("db_actualizar_cliente")
     def actualizar_cliente(self, cliente):
         """Actualiza la información de un registro existente utilizando el ID como referencia."""
+        inicio = time.perf_counter()
         try:
-            extra = ""
-            if hasattr(cliente, 'descuento'): extra = f"Descuento: {cliente.descuento}%"
-            elif hasattr(cliente, 'empresa'): extra = f"Empresa: {cliente.empresa}"
-            
+            descuento, empresa = self._datos_tipados(cliente)
             tipo_nombre = type(cliente).__name__
 
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""UPDATE clientes 
-                                  SET nombre = ?, email = ?, telefono = ?, tipo = ?, extra = ? 
-                                  WHERE id = ?""",
-                               (cliente.nombre, cliente.email, cliente.telefono, tipo_nombre, extra, cliente.id_cliente))
-                conn.commit()
+            with self.transaccion() as conn:
+                cursor = conn.execute(self.SQL_ACTUALIZAR, (cliente.nombre, cliente.email, cliente.telefono, tipo_nombre,
+                                                            descuento, empresa, cliente.id_cliente))
+                if cursor.rowcount > 0:
+                    self._notificar("actualizado", (cliente.id_cliente, cliente.nombre, cliente.email, cliente.telefono,
+                                                    tipo_nombre, self._texto_extra(descuento, empresa)))
             
-            registrar_evento(f"Cliente {cliente.id_cliente} actualizado correctamente.")
+            registrar_evento(f"Cliente {cliente.id_cliente} actualizado correctamente.", operacion="actualizar_cliente",
+                             id_cliente=cliente.id_cliente, duracion_ms=ms_desde(inicio), resultado="ok")
             return True
         except Exception as e:
-            registrar_error(f"Error al actualizar cliente {cliente.id_cliente}: {e}")
+            registrar_error(f"Error al actualizar cliente {cliente.id_cliente}: {e}", operacion="actualizar_cliente",
+                            id_cliente=cliente.id_cliente, resultado="error")
             raise
 
+    @medir("db_obtener_todos")
     def obtener_todos(self):
         """Recupera todos los registros de la tabla para alimentar la vista de la aplicación."""
         try:
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, nombre, email, telefono, tipo, extra FROM clientes")
-                return cursor.fetchall()
+            return self.conexion().execute(self.SQL_TODOS).fetchall()
         except sqlite3.Error as e:
             registrar_error(f"Error al consultar: {e}")
             return []
 
-    def exportar_datos(self):
-        """Implementa la exportación masiva de datos a archivos planos JSON y CSV."""
+    @medir("db_obtener_por_id")
+    def obtener_por_id(self, id_cliente):
+        """Devuelve la fila (id, nombre, email, telefono, tipo, extra) del cliente, o None si no existe."""
         try:
-            with sqlite3.connect(self.db_name) as conn:
-                conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM clientes")
-                filas = [dict(row) for row in cursor.fetchall()]
+            return self.conexion().execute(self.SQL_TODOS + " WHERE id = ?", (id_cliente,)).fetchone()
+        except sqlite3.Error as e:
+            registrar_error(f"Error al consultar el cliente {id_cliente}: {e}")
+            return None
 
-            if not filas:
-                registrar_evento("Exportación cancelada: No hay datos para exportar.")
+    @medir("db_obtener_por_ids")
+    def obtener_por_ids(self, ids, tamano_lote=TAMANO_LOTE):
+        """Devuelve las filas de los IDs indicados que existan (en orden de ID), con una consulta por bloque."""
+        ids = list(dict.fromkeys(ids))
+        filas = []
+        try:
+            conn = self.conexion()
+            for i in range(0, len(ids), tamano_lote):
+                bloque = ids[i:i + tamano_lote]
+                marcadores = ", ".join("?" * len(bloque))
+                filas.extend(conn.execute(f"{self.SQL_TODOS} WHERE id IN ({marcadores})", bloque).fetchall())
+            return sorted(filas)
+        except sqlite3.Error as e:
+            registrar_error(f"Error al consultar clientes por ID: {e}")
+            return []
+
+    @medir("db_iterar_clientes")
+    def iterar_clientes(self, tamano_bloque=TAMANO_BLOQUE_EXPORTACION, validar=False):
+        """
+        Recorre la tabla completa devolviendo objetos Cliente de la subclase correspondiente.
+        Las filas se leen por bloques y se hidratan a medida que se consumen, sin cargar
+        la tabla entera en memoria.
+        """
+        cursor = self.conexion().execute(self.SQL_TODOS)
+        while True:
+            bloque = cursor.fetchmany(tamano_bloque)
+            if not bloque:
                 return
+            yield from hidratar_filas(bloque, validar)
 
-            # Generación de archivo JSON para interoperabilidad
-            with open("clientes_backup.json", "w", encoding='utf-8') as f:
-                json.dump(filas, f, indent=4, ensure_ascii=False)
-            
-            # Generación de archivo CSV para compatibilidad con hojas de cálculo
-            keys = filas[0].keys()
-            with open("clientes_backup.csv", "w", newline='', encoding='utf-8') as f:
-                dict_writer = csv.DictWriter(f, fieldnames=keys)
-                dict_writer.writeheader()
-                dict_writer.writerows(filas)
-                
-            registrar_evento("Backup exportado correctamente en formatos JSON y CSV.")
+    @medir("db_obtener_pagina")
+    def obtener_pagina(self, after_id=None, limit=100, orden="asc"):
+        """
+        Devuelve hasta 'limit' registros ordenados por ID, a continuación de 'after_id'.
+        Con orden="desc" recorre hacia atrás (IDs menores a 'after_id'), lo que permite
+        paginar en ambos sentidos sin OFFSET: el costo no depende de la posición en la tabla.
+        """
+        if orden not in ("asc", "desc"):
+            raise ValueError(f"Orden de paginación inválido: {orden}")
+        sql = self.SQL_PAGINA[(orden, after_id is not None)]
+        parametros = (limit,) if after_id is None else (after_id, limit)
+        try:
+            return self.conexion().execute(sql, parametros).fetchall()
+        except sqlite3.Error as e:
+            registrar_error(f"Error al consultar página: {e}")
+            return []
+
+    @medir("db_buscar")
+    def buscar(self, texto, tipo=None, limit=50):
+        """
+        Busca clientes cuyo ID, nombre, email, teléfono o empresa contenga palabras que
+        empiecen por los términos de 'texto' (sin distinguir mayúsculas ni acentos).
+        'tipo' filtra por categoría usando el nombre de la clase (ej. 'ClientePremium'); sin
+        texto se listan los clientes de esa categoría en orden de ID. limit=-1 no limita.
+        """
+        terminos = re.findall(r"\w+", texto or "")
+        try:
+            conn = self.conexion()
+            if not terminos:
+                if tipo is None:
+                    return self.obtener_pagina(limit=limit)
+                return conn.execute(self.SQL_TODOS + " WHERE tipo = ? ORDER BY id LIMIT ?", (tipo, limit)).fetchall()
+
+            if self.fts_disponible:
+                # Cada término se busca como prefijo; los términos se combinan con AND
+                consulta = " ".join(f'"{termino}"*' for termino in terminos)
+                sql, parametros = self.SQL_BUSCAR_FTS, [consulta]
+                if tipo is not None:
+                    sql += " AND c.tipo = ?"
+                    parametros.append(tipo)
+            else:
+                condicion = "(id LIKE ? OR nombre LIKE ? OR email LIKE ? OR telefono LIKE ? OR empresa LIKE ?)"
+                sql = self.SQL_TODOS + " WHERE " + " AND ".join([condicion] * len(terminos))
+                parametros = [f"%{termino}%" for termino in terminos for _ in range(5)]
+                if tipo is not None:
+                    sql += " AND tipo = ?"
+                    parametros.append(tipo)
+            parametros.append(limit)
+            return conn.execute(sql + " LIMIT ?", parametros).fetchall()
+        except sqlite3.Error as e:
+            registrar_error(f"Error en la búsqueda '{texto}': {e}")
+            return []
+
+    @staticmethod
+    def _abrir_salida(ruta, comprimir):
+        """Abre un archivo de texto para escritura, opcionalmente comprimido con gzip."""
+        if comprimir:
+            return gzip.open(ruta, "wt", encoding='utf-8', newline='')
+        return open(ruta, "w", encoding='utf-8', newline='')
+
+    @medir("db_exportar_datos")
+    def exportar_datos(self, ruta_json="clientes_backup.jsonl", ruta_csv="clientes_backup.csv",
+                       comprimir=False, tamano_bloque=TAMANO_BLOQUE_EXPORTACION, progreso=None):
+        """
+        Exporta la tabla completa a JSON Lines y CSV en una sola pasada sobre el cursor.
+        Las filas se leen en bloques con fetchmany, por lo que la memoria no crece con la tabla.
+        Con comprimir=True ambos archivos se escriben en gzip (se añade la extensión .gz).
+        'progreso', si se indica, recibe el total de filas exportadas tras cada bloque.
+        Devuelve la cantidad de filas exportadas, o None si la exportación falló.
+        """
+        inicio = time.perf_counter()
+        try:
+            # La conexión es compartida: se usa cursor.description en lugar de cambiar su row_factory
+            cursor = self.conexion().execute("SELECT * FROM clientes")
+            columnas = [col[0] for col in cursor.description]
+            bloque = cursor.fetchmany(tamano_bloque)
+
+            if not bloque:
+                registrar_evento("Exportación cancelada: No hay datos para exportar.")
+                return 0
+
+            if comprimir:
+                ruta_json = ruta_json if ruta_json.endswith(".gz") else ruta_json + ".gz"
+                ruta_csv = ruta_csv if ruta_csv.endswith(".gz") else ruta_csv + ".gz"
+
+            codificar = json.JSONEncoder(ensure_ascii=False).encode
+            total = 0
+            with self._abrir_salida(ruta_json, comprimir) as f_json, self._abrir_salida(ruta_csv, comprimir) as f_csv:
+                # JSON Lines para interoperabilidad y CSV para hojas de cálculo, escritos a la par
+                escritor_csv = csv.writer(f_csv)
+                escritor_csv.writerow(columnas)
+                while bloque:
+                    f_json.writelines(codificar(dict(zip(columnas, fila))) + "\n" for fila in bloque)
+                    escritor_csv.writerows(bloque)
+                    total += len(bloque)
+                    if progreso:
+                        progreso(total)
+                    bloque = cursor.fetchmany(tamano_bloque)
+
+            registrar_evento(f"Backup exportado correctamente en {ruta_json} y {ruta_csv} ({total} registros).",
+                             operacion="exportar_datos", filas=total, duracion_ms=ms_desde(inicio), resultado="ok")
+            return total
         except Exception as e:
-            registrar_error(f"Fallo en la exportación de datos: {e}")
\ No newline at end of file
+            registrar_error(f"Fallo en la exportación de datos: {e}", operacion="exportar_datos", resultado="error")
+            return None
@@ -0,0 +1,393 @@
+"""
+Módulo de Detección de Duplicados - Proyecto GIC
+Encuentra clientes probablemente duplicados comparando nombre, email y teléfono normalizados.
+Para no comparar todos contra todos (O(n²)) se usa el método de vecindario ordenado
+(sorted neighborhood) en varias pasadas: los clientes se ordenan por cada clave de bloqueo
+y cada uno se compara solo con los VENTANA anteriores en ese orden. Los pares que superan
+el umbral quedan en la tabla 'duplicados_revision' para que un operador los revise.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import deque, namedtuple
+from logger import ms_desde, registrar_evento, registrar_error
+from metricas import medir
+
+UMBRAL = 0.6            # Puntaje mínimo para proponer un par como duplicado
+SIMILITUD_MINIMA = 0.8  # Por debajo, un nombre o email parecido no suma al puntaje
+VENTANA = 8             # Vecinos comparados por cliente en cada pasada
+DIGITOS_TELEFONO = 8    # Se comparan los últimos dígitos (ignora prefijos de país/área)
+TAMANO_BLOQUE = 5000
+BLOQUE_VERIFICACION = 500  # Clientes verificados por transacción al completar una carga masiva
+# Peso de cada campo en el puntaje (suman 1)
+PESO_NOMBRE, PESO_EMAIL, PESO_TELEFONO = 0.35, 0.4, 0.25
+# Dominios que ignoran los puntos de la parte local del email
+DOMINIOS_SIN_PUNTOS = {"gmail.com": "gmail.com", "googlemail.com": "gmail.com"}
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+_NO_DIGITO = re.compile(r"\D+")
+
+ParDuplicado = namedtuple("ParDuplicado", ["id_a", "id_b", "puntaje", "motivo"])
+
+def normalizar_texto(texto):
+    """Minúsculas sin acentos ni signos, con espacios simples: 'José  PÉREZ-Díaz' -> 'jose perez diaz'."""
+    texto = (texto or "").casefold()
+    if not texto.isascii():
+        # Descompone 'é' en 'e' + acento y descarta los acentos
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", texto).strip()
+
+def clave_nombre(nombre):
+    """Palabras del nombre normalizadas y ordenadas: 'Pérez, Ana' y 'Ana Perez' comparten clave."""
+    return " ".join(sorted(normalizar_texto(nombre).split()))
+
+def normalizar_email(email):
+    """Email en minúsculas, sin alias '+etiqueta' y sin los puntos que Gmail ignora."""
+    email = (email or "").strip().casefold()
+    local, arroba, dominio = email.rpartition("@")
+    if not arroba:
+        return email
+    local = local.split("+", 1)[0]
+    if dominio in DOMINIOS_SIN_PUNTOS:
+        dominio = DOMINIOS_SIN_PUNTOS[dominio]
+        local = local.replace(".", "")
+    return f"{local}@{dominio}"
+
+def normalizar_telefono(telefono):
+    """Solo los últimos DIGITOS_TELEFONO dígitos: '+56 9 1234-5678' y '912345678' coinciden."""
+    return _NO_DIGITO.sub("", str(telefono or ""))[-DIGITOS_TELEFONO:]
+
+def claves_cliente(id_cliente, nombre, email, telefono):
+    """Fila de 'clientes_claves' para un cliente."""
+    return (id_cliente, clave_nombre(nombre), normalizar_email(email), normalizar_telefono(telefono))
+
+def _bigramas(texto):
+    return frozenset(texto[i:i + 2] for i in range(len(texto) - 1)) if len(texto) > 1 else frozenset((texto,))
+
+def _dice(a, b):
+    """Coeficiente de Dice entre dos conjuntos de bigramas (0 a 1)."""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+class _Registro:
+    """Claves de un cliente con sus bigramas precalculados para compararlo con sus vecinos."""
+
+    __slots__ = ("id", "nombre", "email", "telefono", "digitos_email", "bigramas_nombre", "bigramas_email")
+
+    def __init__(self, id_cliente, nombre, email, telefono):
+        self.id = id_cliente
+        self.nombre = nombre
+        self.email = email
+        self.telefono = telefono
+        # El dominio se excluye de la similitud: casi todos comparten los mismos
+        local = email.partition("@")[0]
+        self.digitos_email = _NO_DIGITO.sub("", local)
+        self.bigramas_nombre = _bigramas(nombre)
+        self.bigramas_email = _bigramas(local)
+
+def _similitud(a, b):
+    similitud = _dice(a, b)
+    return similitud if similitud >= SIMILITUD_MINIMA else 0.0
+
+def puntuar(a, b):
+    """Puntaje de similitud (0 a 1) entre dos _Registro y los campos que coinciden."""
+    s_telefono = 1.0 if len(a.telefono) >= 7 and a.telefono == b.telefono else 0.0
+    if a.email and a.email == b.email:
+        s_email = 1.0
+    elif a.digitos_email != b.digitos_email:
+        s_email = 0.0  # 'ana.soto84' y 'ana.soto85' suelen ser personas distintas
+    else:
+        s_email = _similitud(a.bigramas_email, b.bigramas_email)
+    # Si ni con el nombre idéntico se alcanzaría el umbral, no se calcula su similitud
+    if PESO_EMAIL * s_email + PESO_TELEFONO * s_telefono + PESO_NOMBRE < UMBRAL:
+        return 0.0, ""
+    s_nombre = 1.0 if a.nombre and a.nombre == b.nombre else _similitud(a.bigramas_nombre, b.bigramas_nombre)
+    puntaje = PESO_NOMBRE * s_nombre + PESO_EMAIL * s_email + PESO_TELEFONO * s_telefono
+    motivo = [campo for campo, s in (("nombre", s_nombre), ("email", s_email), ("telefono", s_telefono)) if s]
+    return round(puntaje, 4), ",".join(motivo)
+
+class DetectorDuplicados:
+    """
+    Motor de detección de duplicados sobre un DatabaseManager.
+    analizar() recorre la base completa; verificar_cliente() compara un solo cliente con sus
+    candidatos mediante los índices de claves, y con iniciar_incremental() se aplica
+    automáticamente a cada alta o edición.
+    'escritor', si se indica, recibe (funcion, *args) y ejecuta esa escritura por su cuenta sin
+    esperar a que termine (p. ej. la cola del escritor único de ServidorGIC); por defecto se
+    ejecuta en el acto.
+    """
+
+    # Columnas de orden de cada pasada del vecindario ordenado
+    PASADAS = ("nombre_clave", "email_norm", "telefono_norm")
+
+    def __init__(self, db, umbral=UMBRAL, ventana=VENTANA, escritor=None):
+        self.db = db
+        self.umbral = umbral
+        self.ventana = ventana
+        self._escritor = escritor or (lambda funcion, *args: funcion(*args))
+        self._diferido = escritor is not None
+        self._incremental = False
+        self._por_verificar = []  # Clientes cambiados a la espera de su verificación
+        self._lock = threading.Lock()
+
+    # --- Claves de bloqueo ---
+
+    def reconstruir_claves(self, tamano_bloque=TAMANO_BLOQUE):
+        """Recalcula 'clientes_claves' para toda la base. Devuelve la cantidad de clientes procesados."""
+        total = 0
+        with self.db.transaccion() as conn:
+            conn.execute("DELETE FROM clientes_claves")
+            cursor = conn.execute("SELECT id, nombre, email, telefono FROM clientes")
+            while True:
+                bloque = cursor.fetchmany(tamano_bloque)
+                if not bloque:
+                    break
+                conn.executemany("INSERT INTO clientes_claves VALUES (?, ?, ?, ?)",
+                                 [claves_cliente(*fila) for fila in bloque])
+                total += len(bloque)
+        return total
+
+    def completar_claves(self, verificar=False, tamano_bloque=None):
+        """
+        Calcula las claves de los clientes que aún no las tienen: bases anteriores al detector,
+        cargas masivas y ediciones hechas sin él. Con verificar=True cada uno se compara además con
+        sus candidatos, como un alta individual. Cada bloque se confirma en su propia transacción.
+        Devuelve la cantidad de clientes procesados.
+        """
+        inicio = time.perf_counter()
+        total, ultimo = 0, ""
+        while True:
+            procesados, ultimo = self._completar_bloque(verificar, tamano_bloque, ultimo)
+            if not procesados:
+                break
+            total += procesados
+        if total:
+            registrar_evento(f"Claves de duplicados completadas para {total} clientes.", operacion="completar_claves",
+                             filas=total, duracion_ms=ms_desde(inicio), resultado="ok")
+        return total
+
+    def _completar_bloque(self, verificar, tamano_bloque, ultimo):
+        """Un bloque de completar_claves a partir del ID 'ultimo': devuelve (procesados, nuevo ultimo)."""
+        tamano_bloque = tamano_bloque or (BLOQUE_VERIFICACION if verificar else TAMANO_BLOQUE)
+        try:
+            with self.db.transaccion() as conn:
+                # Paginación por ID: un cliente cuya verificación falla no se vuelve a leer
+                bloque = conn.execute("""SELECT c.id, c.nombre, c.email, c.telefono FROM clientes c
+                                         LEFT JOIN clientes_claves k ON k.id = c.id
+                                         WHERE k.id IS NULL AND c.id > ? ORDER BY c.id LIMIT ?""",
+                                      (ultimo, tamano_bloque)).fetchall()
+                if verificar:
+                    self._verificar_filas(bloque)
+                else:
+                    conn.executemany("INSERT INTO clientes_claves VALUES (?, ?, ?, ?)",
+                                     [claves_cliente(*fila) for fila in bloque])
+        except Exception as e:
+            registrar_error(f"Error al completar las claves de duplicados: {e}", operacion="completar_claves",
+                            resultado="error")
+            raise
+        return len(bloque), (bloque[-1][0] if bloque else ultimo)
+
+    def _completar_por_tandas(self, verificar, ultimo="", total=0):
+        """
+        completar_claves a través del escritor: cada bloque es un encargo y, al terminar, encarga
+        el siguiente, de modo que las demás escrituras se intercalan con una carga masiva grande.
+        """
+        procesados, ultimo = self._completar_bloque(verificar, None, ultimo)
+        if procesados:
+            self._escritor(self._completar_por_tandas, verificar, ultimo, total + procesados)
+        elif total:
+            registrar_evento(f"Claves de duplicados completadas para {total} clientes.", operacion="completar_claves",
+                             filas=total, resultado="ok")
+
+    def _encargar_completado(self, verificar):
+        if self._diferido:
+            self._escritor(self._completar_por_tandas, verificar)
+        else:
+            self.completar_claves(verificar)
+
+    # --- Análisis completo ---
+
+    def _pasada(self, conn, columna, pares):
+        """
+        Una pasada de vecindario ordenado: compara cada cliente con los 'ventana' anteriores.
+        Devuelve la cantidad de clientes recorridos.
+        """
+        vecinos = deque(maxlen=self.ventana)
+        recorridos = 0
+        cursor = conn.execute(f"""SELECT id, nombre_clave, email_norm, telefono_norm FROM clientes_claves
+                                  WHERE {columna} != '' ORDER BY {columna}, nombre_clave""")
+        while True:
+            bloque = cursor.fetchmany(TAMANO_BLOQUE)
+            if not bloque:
+                return recorridos
+            recorridos += len(bloque)
+            for fila in bloque:
+                actual = _Registro(*fila)
+                for vecino in vecinos:
+                    clave = (vecino.id, actual.id) if vecino.id < actual.id else (actual.id, vecino.id)
+                    if clave in pares:
+                        continue
+                    puntaje, motivo = puntuar(actual, vecino)
+                    if puntaje >= self.umbral:
+                        pares[clave] = (puntaje, motivo)
+                vecinos.append(actual)
+
+    @medir("duplicados_calcular_pares")
+    def calcular_pares(self):
+        """
+        Fase de lectura del análisis: recorre 'clientes_claves' y devuelve los ParDuplicado que
+        superan el umbral, sin escribir nada (puede correr en paralelo con las escrituras).
+        """
+        inicio = time.perf_counter()
+        pares = {}
+        conn = self.db.conexion()
+        clientes = max(self._pasada(conn, columna, pares) for columna in self.PASADAS)
+        registrar_evento(f"Análisis de duplicados: {clientes} clientes, {len(pares)} pares probables.",
+                         operacion="analizar_duplicados", filas=clientes, pares=len(pares),
+                         duracion_ms=ms_desde(inicio), resultado="ok")
+        return [ParDuplicado(a, b, p, m) for (a, b), (p, m) in pares.items()]
+
+    @medir("duplicados_analizar")
+    def analizar(self):
+        """
+        Recorre toda la base y registra los pares probables en 'duplicados_revision'.
+        Los pares ya revisados conservan su decisión. Devuelve la cantidad de pares detectados.
+        """
+        try:
+            self.reconstruir_claves()
+            pares = self.calcular_pares()
+            self.guardar_pares(pares)
+            return len(pares)
+        except Exception as e:
+            registrar_error(f"Error en el análisis de duplicados: {e}", operacion="analizar_duplicados",
+                            resultado="error")
+            raise
+
+    # --- Verificación incremental ---
+
+    def _candidatos(self, conn, claves):
+        """Clientes que comparten email o teléfono, más los vecinos por nombre y email en orden de clave."""
+        id_cliente, nombre, email, telefono = claves
+        consultas = []
+        if email:
+            consultas.append(("SELECT * FROM clientes_claves WHERE email_norm = ? LIMIT ?", (email, self.ventana * 4)))
+        if len(telefono) >= 7:
+            consultas.append(("SELECT * FROM clientes_claves WHERE telefono_norm = ? LIMIT ?", (telefono, self.ventana * 4)))
+        for columna, valor in (("nombre_clave", nombre), ("email_norm", email)):
+            consultas.append((f"SELECT * FROM clientes_claves WHERE {columna} >= ? ORDER BY {columna} LIMIT ?",
+                              (valor, self.ventana)))
+            consultas.append((f"SELECT * FROM clientes_claves WHERE {columna} < ? ORDER BY {columna} DESC LIMIT ?",
+                              (valor, self.ventana)))
+        candidatos = {}
+        for sql, parametros in consultas:
+            for fila in conn.execute(sql, parametros):
+                if fila[0] != id_cliente:
+                    candidatos[fila[0]] = fila
+        return candidatos.values()
+
+    @medir("duplicados_verificar_cliente")
+    def verificar_cliente(self, id_cliente, nombre, email, telefono):
+        """
+        Compara un cliente (recién creado o editado) con sus candidatos, registra los pares
+        probables y actualiza sus claves. Devuelve la lista de ParDuplicado encontrados.
+        """
+        claves = claves_cliente(id_cliente, nombre, email, telefono)
+        actual = _Registro(*claves)
+        with self.db.transaccion() as conn:
+            pares = []
+            for fila in self._candidatos(conn, claves):
+                puntaje, motivo = puntuar(actual, _Registro(*fila))
+                if puntaje >= self.umbral:
+                    a, b = sorted((id_cliente, fila[0]))
+                    pares.append(ParDuplicado(a, b, puntaje, motivo))
+            conn.execute("INSERT OR REPLACE INTO clientes_claves VALUES (?, ?, ?, ?)", claves)
+            self.guardar_pares(pares)
+        if pares:
+            registrar_evento(f"Cliente {id_cliente}: {len(pares)} posibles duplicados.",
+                             operacion="verificar_duplicados", id_cliente=id_cliente, pares=len(pares))
+        return pares
+
+    def iniciar_incremental(self):
+        """
+        Verifica automáticamente cada cliente insertado o actualizado tras su commit, y los
+        cargados en masa. Al iniciar se completan las claves que falten en la base.
+        """
+        if not self._incremental:
+            self.db.suscribir(self._al_cambiar_db)
+            self._incremental = True
+            self._encargar_completado(False)
+
+    def detener_incremental(self):
+        if self._incremental:
+            self.db.desuscribir(self._al_cambiar_db)
+            self._incremental = False
+
+    def _al_cambiar_db(self, evento, fila):
+        # Se invoca en el hilo que confirmó el cambio: aquí solo se acumula, la verificación se
+        # encarga al escritor una vez por tanda de cambios
+        if evento == "masivo":
+            # Las cargas masivas no informan filas: sus clientes son los que quedaron sin claves
+            self._encargar_completado(True)
+            return
+        if evento not in ("insertado", "actualizado"):
+            return
+        with self._lock:
+            encargar = not self._por_verificar
+            self._por_verificar.append(tuple(fila[:4]))
+        if encargar:
+            self._escritor(self._verificar_pendientes)
+
+    def _verificar_pendientes(self):
+        """Verifica en una sola transacción todos los clientes acumulados. Devuelve cuántos verificó."""
+        with self._lock:
+            filas, self._por_verificar = self._por_verificar, []
+        with self.db.transaccion():
+            self._verificar_filas(filas)
+        return len(filas)
+
+    def _verificar_filas(self, filas):
+        for fila in filas:
+            try:
+                self.verificar_cliente(*fila)
+            except Exception as e:
+                # La detección es auxiliar: su fallo no debe afectar al alta ya confirmada
+                registrar_error(f"Error en la verificación de duplicados de {fila[0]}: {e}",
+                                operacion="verificar_duplicados", id_cliente=fila[0], resultado="error")
+
+    # --- Revisión ---
+
+    def guardar_pares(self, pares):
+        """Registra (o actualiza, si siguen pendientes) los pares en 'duplicados_revision'."""
+        ahora = time.time()
+        with self.db.transaccion() as conn:
+            conn.executemany("""INSERT INTO duplicados_revision (id_a, id_b, puntaje, motivo, detectado)
+                                VALUES (?, ?, ?, ?, ?)
+                                ON CONFLICT(id_a, id_b) DO UPDATE SET puntaje = excluded.puntaje,
+                                    motivo = excluded.motivo WHERE estado = 'pendiente'""",
+                             ((p.id_a, p.id_b, p.puntaje, p.motivo, ahora) for p in pares))
+
+    def pendientes(self, limite=200):
+        """
+        Pares pendientes de revisión, de mayor a menor puntaje, con los datos actuales de ambos:
+        (id_a, nombre_a, email_a, telefono_a, id_b, nombre_b, email_b, telefono_b, puntaje, motivo).
+        """
+        return self.db.conexion().execute(
+            """SELECT r.id_a, a.nombre, a.email, a.telefono, r.id_b, b.nombre, b.email, b.telefono,
+                      r.puntaje, r.motivo
+               FROM duplicados_revision r
+               JOIN clientes a ON a.id = r.id_a JOIN clientes b ON b.id = r.id_b
+               WHERE r.estado = 'pendiente' ORDER BY r.puntaje DESC, r.id_a LIMIT ?""", (limite,)).fetchall()
+
+    def resolver(self, id_a, id_b, estado):
+        """Marca un par como 'confirmado' (duplicado real) o 'descartado' (personas distintas)."""
+        if estado not in ("confirmado", "descartado"):
+            raise ValueError(f"Estado de revisión inválido: {estado}")
+        a, b = sorted((id_a, id_b))
+        with self.db.transaccion() as conn:
+            conn.execute("UPDATE duplicados_revision SET estado = ?, resuelto = ? WHERE id_a = ? AND id_b = ?",
+                         (estado, time.time(), a, b))
+        registrar_evento(f"Par de duplicados {a} / {b} marcado como {estado}.", operacion="resolver_duplicado",
+                         id_cliente=a, resultado=estado)
@@ -1,17 +1,454 @@
+import bisect
+import queue
+import threading
+import time
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tkinter import messagebox, ttk
 from models import ClienteRegular, ClientePremium, ClienteCorporativo
 from database import DatabaseManager
-from services import validar_identidad_api, enviar_notificacion_bienvenida
+from duplicados import DetectorDuplicados
+from repositorio import ClienteRepository
+from services import validar_identidad_api, cache_identidad
+from metricas import registro
+from notificaciones import DespachadorNotificaciones
+from logger import ms_desde, registrar_evento
+
+# Relación entre las categorías de la interfaz y las clases del modelo
+CLASES_POR_TIPO = {"Regular": ClienteRegular, "Premium": ClientePremium, "Corporativo": ClienteCorporativo}
+TIPOS_POR_CLASE = {clase: tipo for tipo, clase in CLASES_POR_TIPO.items()}
+
+class TablaVirtual:
+    """
+    Treeview virtualizado: solo mantiene en pantalla una ventana de páginas contiguas.
+    Al acercarse a un borde del scroll se pide la página vecina mediante paginación por clave
+    y se descarta la del extremo opuesto, de modo que la cantidad de filas renderizadas
+    no depende del tamaño de la base de datos.
+    """
+
+    def __init__(self, tree, scrollbar, fuente, tamano_pagina=200, max_paginas=3):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        # fuente(after_id, limit, orden) -> lista de filas; normalmente DatabaseManager.obtener_pagina
+        self.fuente = fuente
+        self.tamano_pagina = tamano_pagina
+        self.max_filas = tamano_pagina * max_paginas
+        self.hay_anteriores = False
+        self.hay_siguientes = False
+        self.filtrada = False
+        self._pendiente = False
+        # Se incrementa con cada cambio de contenido: invalida los rellenos progresivos en curso
+        self._generacion = 0
+
+        self.tree.configure(yscrollcommand=self._al_desplazar)
+        self.scrollbar.configure(command=self.tree.yview)
+
+    def recargar(self):
+        """Vuelve al inicio de la tabla descartando todo lo renderizado."""
+        self._generacion += 1
+        self.tree.delete(*self.tree.get_children())
+        filas = self.fuente(None, self.tamano_pagina, "asc")
+        for fila in filas:
+            self.tree.insert("", tk.END, iid=fila[0], values=fila)
+        self.filtrada = False
+        self.hay_anteriores = False
+        self.hay_siguientes = len(filas) == self.tamano_pagina
+        self._pendiente = False
+        self.tree.yview_moveto(0)
+
+    def generacion(self):
+        """Marca del contenido actual; permite descartar una primera página que llega tarde."""
+        return self._generacion
+
+    def llenar_progresivo(self, filas, generacion, bloque=50, al_terminar=None):
+        """
+        Muestra la primera página (obtenida fuera del hilo de Tk) de a 'bloque' filas por
+        ciclo del bucle de eventos, para que la ventana siga respondiendo mientras se llena.
+        Si el contenido cambió desde 'generacion' (búsqueda, recarga), las filas se descartan.
+        """
+        if generacion != self._generacion:
+            return
+        self._generacion += 1
+        generacion = self._generacion
+        self.tree.delete(*self.tree.get_children())
+        self.filtrada = False
+        self.hay_anteriores = self.hay_siguientes = False
+        self._pendiente = True  # Sin paginación por scroll hasta completar la página
+
+        def insertar(desde):
+            if generacion != self._generacion:
+                return
+            for fila in filas[desde:desde + bloque]:
+                if not self.tree.exists(fila[0]):  # Pudo llegar antes como alta individual
+                    self.tree.insert("", tk.END, iid=fila[0], values=fila)
+            if desde + bloque < len(filas):
+                self.tree.after_idle(insertar, desde + bloque)
+                return
+            self.hay_siguientes = len(filas) == self.tamano_pagina
+            self._pendiente = False
+            if al_terminar:
+                al_terminar()
+        insertar(0)
+
+    def mostrar_resultados(self, filas):
+        """Muestra un conjunto fijo de filas (resultado de búsqueda) sin paginación."""
+        self._generacion += 1
+        self._pendiente = False
+        self.tree.delete(*self.tree.get_children())
+        for fila in filas:
+            self.tree.insert("", tk.END, iid=fila[0], values=fila)
+        self.filtrada = True
+        self.hay_anteriores = self.hay_siguientes = False
+        self.tree.yview_moveto(0)
+
+    def aplicar_cambio(self, evento, fila):
+        """
+        Refleja un cambio de la base de datos sobre la ventana visible, con un costo proporcional
+        a las filas afectadas y no al tamaño de la tabla. Solo 'masivo' fuerza una resincronización
+        completa.
+        """
+        if evento == "masivo":
+            self.recargar()
+            return
+
+        if evento == "eliminado_lote":
+            # Un solo delete para todo el lote: el Treeview se redibuja una vez
+            self.tree.delete(*[iid for iid in fila if self.tree.exists(iid)])
+            return
+        if evento == "actualizado_lote":
+            for fila_cliente in fila:
+                if self.tree.exists(fila_cliente[0]):
+                    self.tree.item(fila_cliente[0], values=fila_cliente)
+            return
+
+        iid = fila[0]
+        if evento == "eliminado":
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+        elif self.tree.exists(iid):
+            self.tree.item(iid, values=fila)
+        elif evento == "insertado" and not self.filtrada:
+            hijos = self.tree.get_children()
+            # Fuera de la ventana cargada: aparecerá cuando se pagine hasta su posición
+            if hijos and ((iid < hijos[0] and self.hay_anteriores) or (iid > hijos[-1] and self.hay_siguientes)):
+                return
+            self.tree.insert("", bisect.bisect(hijos, iid), iid=iid, values=fila)
+
+    def _al_desplazar(self, primero, ultimo):
+        """Callback de yscrollcommand: sincroniza la barra y pide páginas cerca de los bordes."""
+        self.scrollbar.set(primero, ultimo)
+        if self._pendiente:
+            return
+        if float(ultimo) >= 0.9 and self.hay_siguientes:
+            self._pendiente = True
+            self.tree.after_idle(self._cargar_siguiente)
+        elif float(primero) <= 0.1 and self.hay_anteriores:
+            self._pendiente = True
+            self.tree.after_idle(self._cargar_anterior)
+
+    def _ancla(self):
+        """Primera fila visible, usada para conservar la posición al modificar la ventana."""
+        hijos = self.tree.get_children()
+        if not hijos:
+            return None
+        indice = min(int(self.tree.yview()[0] * len(hijos)), len(hijos) - 1)
+        return hijos[indice]
+
+    def _restaurar(self, ancla):
+        hijos = self.tree.get_children()
+        if ancla is not None and hijos and self.tree.exists(ancla):
+            self.tree.yview_moveto(self.tree.index(ancla) / len(hijos))
+
+    def _cargar_siguiente(self):
+        try:
+            hijos = self.tree.get_children()
+            if not hijos:
+                return
+            filas = self.fuente(hijos[-1], self.tamano_pagina, "asc")
+            self.hay_siguientes = len(filas) == self.tamano_pagina
+            if not filas:
+                return
+            ancla = self._ancla()
+            for fila in filas:
+                self.tree.insert("", tk.END, iid=fila[0], values=fila)
+            exceso = len(hijos) + len(filas) - self.max_filas
+            if exceso > 0:
+                self.tree.delete(*hijos[:exceso])
+                self.hay_anteriores = True
+            self._restaurar(ancla)
+        finally:
+            self._pendiente = False
+
+    def _cargar_anterior(self):
+        try:
+            hijos = self.tree.get_children()
+            if not hijos:
+                return
+            # Las filas llegan en orden descendente: insertarlas al inicio de a una las deja ordenadas
+            filas = self.fuente(hijos[0], self.tamano_pagina, "desc")
+            self.hay_anteriores = len(filas) == self.tamano_pagina
+            if not filas:
+                return
+            ancla = self._ancla()
+            for fila in filas:
+                self.tree.insert("", 0, iid=fila[0], values=fila)
+            exceso = len(hijos) + len(filas) - self.max_filas
+            if exceso > 0:
+                self.tree.delete(*hijos[-exceso:])
+                self.hay_siguientes = True
+            self._restaurar(ancla)
+        finally:
+            self._pendiente = False
+
+class PanelDiagnostico:
+    """
+    Ventana con las métricas del registro global: latencias (ms) por operación con sus
+    percentiles, contadores y el estado de las cachés (identidad, repositorio). Se refresca sola
+    mientras permanece abierta.
+    """
+
+    INTERVALO_MS = 1000
+
+    def __init__(self, root, caches=None):
+        # caches: {nombre: función que devuelve las estadísticas de una caché}
+        self.caches = {"caché identidad": cache_identidad.estadisticas, **(caches or {})}
+        self.ventana = tk.Toplevel(root)
+        self.ventana.title("Diagnóstico de rendimiento")
+        columnas = ("Operación", "Llamadas", "p50", "p95", "p99", "Máximo")
+        self.tree = ttk.Treeview(self.ventana, columns=columnas, show="headings", height=15)
+        for columna in columnas:
+            self.tree.heading(columna, text=columna if columna in ("Operación", "Llamadas") else f"{columna} (ms)")
+            self.tree.column(columna, width=220 if columna == "Operación" else 80, anchor="w" if columna == "Operación" else "e")
+        self.tree.pack(padx=10, pady=10, fill="both", expand=True)
+        self.lbl_contadores = tk.Label(self.ventana, justify="left", anchor="w")
+        self.lbl_contadores.pack(padx=10, fill="x")
+        tk.Button(self.ventana, text="Exportar métricas", command=self.exportar).pack(pady=5)
+        self.refrescar()
+
+    def abierto(self):
+        return bool(self.ventana.winfo_exists())
+
+    def refrescar(self):
+        if not self.abierto():
+            return
+        histogramas, otros = {}, {}
+        for nombre, valor in registro.instantanea().items():
+            nombre = nombre[len(registro.prefijo):]
+            if isinstance(valor, dict):
+                histogramas[nombre[:-len("_segundos")]] = valor
+            else:
+                otros[nombre] = valor
+        # Las llamadas por operación ya figuran en la tabla; el resto se lista debajo
+        contadores = [f"{nombre}: {valor}" for nombre, valor in sorted(otros.items())
+                      if nombre[:-len("_total")] not in histogramas]
+
+        def ms(segundos):
+            return "-" if segundos is None else f"{segundos * 1000:.2f}"
+
+        self.tree.delete(*self.tree.get_children())
+        for operacion, resumen in sorted(histogramas.items()):
+            self.tree.insert("", tk.END, values=(operacion, resumen["total"], ms(resumen["p50"]),
+                                                 ms(resumen["p95"]), ms(resumen["p99"]), ms(resumen["maximo"])))
+        for nombre, estadisticas in self.caches.items():
+            contadores.append(f"{nombre}: " + ", ".join(f"{k}={v}" for k, v in estadisticas().items()))
+        self.lbl_contadores.config(text="\n".join(contadores))
+        self.ventana.after(self.INTERVALO_MS, self.refrescar)
+
+    def exportar(self):
+        try:
+            registro.exportar_archivo()
+            messagebox.showinfo("Métricas", "Métricas exportadas a metricas_gic.prom.", parent=self.ventana)
+        except OSError as e:
+            messagebox.showerror("Métricas", f"No se pudieron exportar las métricas: {e}", parent=self.ventana)
+
+class PanelDuplicados:
+    """
+    Ventana de revisión de duplicados probables: lista los pares pendientes de mayor a menor
+    puntaje y permite confirmarlos o descartarlos. El análisis completo de la base corre en
+    segundo plano mediante la función 'en_segundo_plano' de la aplicación.
+    """
+
+    def __init__(self, root, detector, en_segundo_plano):
+        self.detector = detector
+        self.en_segundo_plano = en_segundo_plano
+        self.ventana = tk.Toplevel(root)
+        self.ventana.title("Revisión de duplicados")
+        columnas = ("Puntaje", "ID A", "Nombre A", "Email A", "ID B", "Nombre B", "Email B", "Coinciden")
+        self.tree = ttk.Treeview(self.ventana, columns=columnas, show="headings", height=15)
+        for columna in columnas:
+            self.tree.heading(columna, text=columna)
+            self.tree.column(columna, width=70 if columna in ("Puntaje", "ID A", "ID B") else 150)
+        self.tree.pack(padx=10, pady=10, fill="both", expand=True)
+        btn_frame = tk.Frame(self.ventana)
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Es duplicado", command=lambda: self.resolver("confirmado")).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Son distintos", command=lambda: self.resolver("descartado")).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Analizar base", command=self.analizar).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Refrescar", command=self.refrescar).pack(side=tk.LEFT, padx=5)
+        self.lbl_estado = tk.Label(self.ventana, anchor="w")
+        self.lbl_estado.pack(padx=10, pady=(0, 5), fill="x")
+        self.refrescar()
+
+    def abierto(self):
+        return bool(self.ventana.winfo_exists())
+
+    def refrescar(self):
+        self.en_segundo_plano(self.detector.pendientes, al_terminar=self._mostrar,
+                              al_fallar=lambda error: self._estado(f"No se pudieron leer los pares: {error}"))
+
+    def _mostrar(self, pares):
+        if not self.abierto():
+            return
+        self.tree.delete(*self.tree.get_children())
+        for id_a, nombre_a, email_a, _, id_b, nombre_b, email_b, _, puntaje, motivo in pares:
+            # El iid guarda el par para resolverlo sin volver a consultar
+            self.tree.insert("", tk.END, iid=f"{id_a}|{id_b}",
+                             values=(f"{puntaje:.2f}", id_a, nombre_a, email_a, id_b, nombre_b, email_b, motivo))
+        self._estado(f"{len(pares)} pares pendientes de revisión.")
+
+    def _estado(self, mensaje):
+        if self.abierto():
+            self.lbl_estado.config(text=mensaje)
+
+    def resolver(self, estado):
+        for iid in self.tree.selection():
+            id_a, id_b = iid.split("|", 1)
+            self.detector.resolver(id_a, id_b, estado)
+            self.tree.delete(iid)
+
+    def analizar(self):
+        self._estado("Analizando la base completa...")
+        self.en_segundo_plano(self.detector.analizar,
+                              al_terminar=lambda pares: self.refrescar(),
+                              al_fallar=lambda error: self._estado(f"El análisis falló: {error}"))
+
+class PanelEstadisticas:
+    """
+    Ventana de estadísticas de la base: clientes por tipo, descuento promedio y empresas con más
+    clientes. Lee las tablas de resumen (una consulta de costo constante), así que se refresca tras
+    cada cambio; los cambios seguidos se agrupan en un solo refresco.
+    """
+
+    ESPERA_REFRESCO_MS = 200
+
+    def __init__(self, root, db, en_segundo_plano):
+        self.db = db
+        self.en_segundo_plano = en_segundo_plano
+        self._refresco_programado = None
+        self.ventana = tk.Toplevel(root)
+        self.ventana.title("Estadísticas")
+        self.lbl_total = tk.Label(self.ventana, anchor="w", font=("Arial", 11, "bold"))
+        self.lbl_total.pack(padx=10, pady=(10, 0), fill="x")
+        self.tree_tipos = self._tabla(("Categoría", "Clientes", "Descuento promedio"), 3)
+        self.tree_empresas = self._tabla(("Empresa", "Clientes"), 10)
+        btn_frame = tk.Frame(self.ventana)
+        btn_frame.pack(pady=5)
+        tk.Button(btn_frame, text="Refrescar", command=self.refrescar).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Verificar consistencia", command=self.verificar).pack(side=tk.LEFT, padx=5)
+        self.lbl_estado = tk.Label(self.ventana, anchor="w")
+        self.lbl_estado.pack(padx=10, pady=(0, 5), fill="x")
+        self.refrescar()
+
+    def abierto(self):
+        return bool(self.ventana.winfo_exists())
+
+    def _tabla(self, columnas, alto):
+        tree = ttk.Treeview(self.ventana, columns=columnas, show="headings", height=alto)
+        for columna in columnas:
+            tree.heading(columna, text=columna)
+            tree.column(columna, width=180 if columna == columnas[0] else 120)
+        tree.pack(padx=10, pady=5, fill="both", expand=True)
+        return tree
+
+    def programar_refresco(self):
+        """Llamado desde el hilo de Tk ante cada cambio en la base."""
+        if self._refresco_programado is None and self.abierto():
+            self._refresco_programado = self.ventana.after(self.ESPERA_REFRESCO_MS, self.refrescar)
+
+    def refrescar(self):
+        self._refresco_programado = None
+        self.en_segundo_plano(self.db.estadisticas, al_terminar=self._mostrar,
+                              al_fallar=lambda error: self._estado(f"No se pudieron leer las estadísticas: {error}"))
+
+    def _mostrar(self, estadisticas):
+        if not self.abierto():
+            return
+        if estadisticas is None:
+            self._estado("No se pudieron leer las estadísticas. Revise el log del sistema.")
+            return
+        self.lbl_total.config(text=f"Clientes: {estadisticas['clientes']}    Empresas: {estadisticas['empresas']}")
+        self.tree_tipos.delete(*self.tree_tipos.get_children())
+        for tipo, cantidad in sorted(estadisticas["por_tipo"].items()):
+            promedio = estadisticas["descuento_promedio"].get(tipo)
+            self.tree_tipos.insert("", tk.END, values=(tipo, cantidad, "-" if promedio is None else f"{promedio}%"))
+        self.tree_empresas.delete(*self.tree_empresas.get_children())
+        for empresa, cantidad in estadisticas["top_empresas"]:
+            self.tree_empresas.insert("", tk.END, values=(empresa, cantidad))
+
+    def _estado(self, mensaje):
+        if self.abierto():
+            self.lbl_estado.config(text=mensaje)
+
+    def verificar(self):
+        """Recalcula el resumen desde la tabla completa en segundo plano y lo corrige si difiere."""
+        self._estado("Verificando contra la tabla completa...")
+        self.en_segundo_plano(self.db.verificar_estadisticas, True, al_terminar=self._verificado,
+                              al_fallar=lambda error: self._estado(f"La verificación falló: {error}"))
+
+    def _verificado(self, verificacion):
+        if verificacion is None:
+            self._estado("La verificación falló. Revise el log del sistema.")
+        elif verificacion["consistente"]:
+            self._estado("El resumen coincide con la tabla de clientes.")
+        else:
+            self._estado(f"Se corrigieron {len(verificacion['diferencias'])} diferencias en el resumen.")
+            self.refrescar()
 
 class GIC_App:
     """Clase principal que gestiona la Interfaz Gráfica de Usuario (GUI)."""
+
+    ESPERA_BUSQUEDA_MS = 250   # Pausa de escritura antes de lanzar la búsqueda
+    LIMITE_BUSQUEDA = 500      # Máximo de resultados mostrados por búsqueda
+    MAX_TAREAS = 4             # Hilos para llamadas a servicios externos en segundo plano
+    INTERVALO_COLA_MS = 50     # Frecuencia con la que el hilo de Tk procesa resultados de los workers
     
-    def __init__(self, root):
+    def __init__(self, root, db=None):
+        inicio = time.perf_counter()
         self.root = root
         self.root.title("Solution Tech - Sistema GIC Pro")
-        # Instancia del gestor de persistencia
-        self.db = DatabaseManager()
+        # Gestor de persistencia compartido con quien arranca la aplicación (main.py);
+        # solo se crea uno propio si no se inyecta
+        self.db = db if db is not None else DatabaseManager()
+        # Lecturas puntuales (edición, verificación de duplicados) a través del mapa de identidad
+        self.repo = ClienteRepository(self.db)
+        self._cliente_en_edicion = None
+        # Con un ClienteRemoto (modo servidor) la verificación de duplicados y el envío de
+        # notificaciones los hace el servidor; en local, esta misma aplicación
+        self.remoto = getattr(self.db, "remoto", False)
+
+        # Las llamadas a servicios externos corren en un pool de hilos; sus resultados vuelven
+        # al hilo de Tk a través de una cola que se procesa periódicamente con root.after.
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_TAREAS, thread_name_prefix="gic-servicios")
+        # Cada alta o edición se compara con sus candidatos a duplicado tras confirmarse; la
+        # verificación (y el completado inicial de claves) corre en el pool, no en el hilo de Tk
+        if self.remoto:
+            self.detector = self.db.detector_duplicados()
+        else:
+            self.detector = DetectorDuplicados(self.db, escritor=self.executor.submit)
+            self.detector.iniciar_incremental()
+        self._cola_ui = queue.Queue()
+        self._lock_tareas = threading.Lock()
+        self._tareas_en_cola = 0
+        self._avance = None  # Avance de la exportación en curso, mostrado junto al estado de las tareas
+        self._tareas_en_proceso = 0
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+        # Los emails de bienvenida se envían desde el outbox, fuera del flujo de registro
+        self.despachador = None
+        if not self.remoto:
+            self.despachador = DespachadorNotificaciones(self.db)
+            self.despachador.iniciar()
 
         # --- Sección de Formulario de Entrada ---
         frame_form = tk.LabelFrame(root, text=" Registro de Cliente ", padx=10, pady=10)
@@ -50,39 +487,113 @@ class GIC_App:
         # Funciones para el flujo de edición (Update)
         tk.Button(btn_frame, text="Cargar para Editar", bg="#2196F3", fg="white", command=self.cargar_para_editar).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Guardar Cambios", bg="#FF9800", fg="white", command=self.ejecutar_actualizacion).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Cambiar Categoría", bg="#FF9800", fg="white", command=self.cambiar_tipo_seleccion).pack(side=tk.LEFT, padx=5)
         
-        tk.Button(btn_frame, text="Eliminar Seleccionado", bg="#f44336", fg="white", command=self.eliminar_cliente).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Eliminar Seleccionados", bg="#f44336", fg="white", command=self.eliminar_cliente).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Exportar Backup", command=self.exportar).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Refrescar", command=self.cargar_datos).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Diagnóstico", command=self.abrir_diagnostico).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Duplicados", command=self.abrir_duplicados).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Estadísticas", command=self.abrir_estadisticas).pack(side=tk.LEFT, padx=5)
+
+        # --- Búsqueda incremental (search-as-you-type) ---
+        frame_busqueda = tk.Frame(root)
+        frame_busqueda.pack(padx=10, fill="x")
+        tk.Label(frame_busqueda, text="Buscar:").pack(side=tk.LEFT)
+        self.ent_buscar = tk.Entry(frame_busqueda)
+        self.ent_buscar.pack(side=tk.LEFT, fill="x", expand=True, padx=5)
+        self.ent_buscar.bind("<KeyRelease>", self.programar_busqueda)
+        self.combo_filtro = ttk.Combobox(frame_busqueda, values=["Todos"] + list(CLASES_POR_TIPO), state="readonly", width=12)
+        self.combo_filtro.current(0)
+        self.combo_filtro.pack(side=tk.LEFT)
+        self.combo_filtro.bind("<<ComboboxSelected>>", self.programar_busqueda)
+        self._busqueda_programada = None
+        self._ultima_busqueda = 0  # Solo se muestran los resultados de la búsqueda más reciente
+        self._panel_diagnostico = None
+        self._panel_duplicados = None
+        self._panel_estadisticas = None
 
-        # --- Tabla de Visualización de Datos (Treeview) ---
-        self.tree = ttk.Treeview(root, columns=("ID", "Nombre", "Email", "Telefono", "Tipo", "Detalle"), show='headings')
+        # --- Tabla de Visualización de Datos (Treeview virtualizado) ---
+        frame_tabla = tk.Frame(root)
+        frame_tabla.pack(padx=10, pady=10, fill="both", expand=True)
+        scroll = ttk.Scrollbar(frame_tabla, orient="vertical")
+        scroll.pack(side=tk.RIGHT, fill="y")
+        # Selección múltiple (Ctrl/Shift + clic) para eliminar o cambiar la categoría en lote
+        self.tree = ttk.Treeview(frame_tabla, columns=("ID", "Nombre", "Email", "Telefono", "Tipo", "Detalle"),
+                                 show='headings', selectmode="extended")
         self.tree.heading("ID", text="ID"); self.tree.heading("Nombre", text="Nombre")
         self.tree.heading("Email", text="Email"); self.tree.heading("Telefono", text="Teléfono")
         self.tree.heading("Tipo", text="Categoría"); self.tree.heading("Detalle", text="Beneficio/Empresa")
         
         self.tree.column("ID", width=50); self.tree.column("Telefono", width=100); self.tree.column("Detalle", width=150)
-        self.tree.pack(padx=10, pady=10, fill="both", expand=True)
-        
-        # Carga inicial de datos desde la BD
-        self.cargar_datos()
+        self.tree.pack(side=tk.LEFT, fill="both", expand=True)
+        # Cada fila usa el ID del cliente como iid del Treeview
+        self.tabla = TablaVirtual(self.tree, scroll, self.db.obtener_pagina)
+        # Las altas, ediciones y bajas se reflejan fila a fila sin recargar la tabla
+        self.db.suscribir(self._al_cambiar_db)
+
+        # --- Barra de estado de tareas en segundo plano ---
+        self.lbl_estado = tk.Label(root, text="Sin tareas pendientes.", anchor="w")
+        self.lbl_estado.pack(padx=10, pady=(0, 5), fill="x")
+        self.root.after(self.INTERVALO_COLA_MS, self._procesar_cola_ui)
+        registrar_evento("Arranque: interfaz construida", operacion="arranque", fase="interfaz",
+                         duracion_ms=ms_desde(inicio))
+
+        # Primero se pinta la ventana; la primera página se consulta en segundo plano
+        self._inicio_carga = time.perf_counter()
+        self._mostrar_estado("Cargando clientes...")
+        generacion = self.tabla.generacion()
+        self._en_segundo_plano(self.db.obtener_pagina, None, self.tabla.tamano_pagina, "asc",
+                               al_terminar=lambda filas: self._mostrar_carga_inicial(filas, generacion),
+                               al_fallar=lambda error: self._mostrar_estado(f"No se pudieron cargar los clientes: {error}"))
+        self.root.after_idle(self._registrar_primer_pintado)
+
+    def _registrar_primer_pintado(self):
+        registrar_evento("Arranque: ventana visible", operacion="arranque", fase="primer_pintado",
+                         duracion_ms=ms_desde(self._inicio_carga))
+
+    def _mostrar_carga_inicial(self, filas, generacion):
+        """Recibe en el hilo de Tk la primera página obtenida en segundo plano y la muestra por partes."""
+        def al_terminar():
+            self._mostrar_estado(f"{len(filas)} clientes cargados.")
+            registrar_evento("Arranque: datos iniciales visibles", operacion="arranque", fase="datos_iniciales",
+                             filas=len(filas), duracion_ms=ms_desde(self._inicio_carga))
+        self.tabla.llenar_progresivo(filas, generacion, al_terminar=al_terminar)
 
     def cargar_para_editar(self):
-        """Pasa la información de la fila seleccionada a los campos de texto para su edición."""
+        """Carga en el formulario el estado actual del cliente seleccionado para su edición."""
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("Atención", "Seleccione un cliente de la tabla para editar.")
             return
-        
-        datos = self.tree.item(selected)['values']
+
+        # Se consulta el repositorio (no los valores mostrados, que pueden estar desactualizados)
+        cliente = self.repo.obtener_por_id(selected[0])
+        if cliente is None:
+            messagebox.showwarning("Atención", f"El cliente {selected[0]} ya no existe.")
+            return
         self.limpiar_campos()
+        self._cliente_en_edicion = cliente
         
         # Poblar formulario y bloquear ID para mantener integridad referencial
-        self.ent_id.insert(0, datos[0])
+        self.ent_id.insert(0, cliente.id_cliente)
         self.ent_id.config(state='disabled') 
-        self.ent_nombre.insert(0, datos[1])
-        self.ent_email.insert(0, datos[2])
-        self.ent_tel.insert(0, datos[3])
-        self.combo_tipo.set(datos[4])
+        self.ent_nombre.insert(0, cliente.nombre)
+        self.ent_email.insert(0, cliente.email)
+        self.ent_tel.insert(0, cliente.telefono)
+        self.combo_tipo.set(TIPOS_POR_CLASE.get(type(cliente), "Regular"))
+
+    def _construir_cliente(self, cid, nom, eml, tel, tipo, anterior=None):
+        """
+        Instancia la subclase de la categoría elegida. Al editar se conservan el descuento
+        o la empresa del cliente anterior, que el formulario no muestra.
+        """
+        clase = CLASES_POR_TIPO.get(tipo, ClienteRegular)
+        if clase is ClientePremium:
+            return ClientePremium(cid, nom, eml, tel, getattr(anterior, "descuento", 15))
+        if clase is ClienteCorporativo:
+            return ClienteCorporativo(cid, nom, eml, tel, getattr(anterior, "empresa", "Empresa Genérica"))
+        return ClienteRegular(cid, nom, eml, tel)
 
     def ejecutar_actualizacion(self):
         """Procesa la modificación de datos del cliente en la base de datos."""
@@ -94,64 +605,247 @@ class GIC_App:
                 raise ValueError("Todos los campos son obligatorios.")
 
             # Instanciación polimórfica para la actualización
-            if tipo == "Regular": nuevo = ClienteRegular(cid, nom, eml, tel)
-            elif tipo == "Premium": nuevo = ClientePremium(cid, nom, eml, tel)
-            else: nuevo = ClienteCorporativo(cid, nom, eml, tel, "Empresa Editada")
+            anterior = self._cliente_en_edicion
+            nuevo = self._construir_cliente(cid, nom, eml, tel, tipo,
+                                            anterior if anterior is not None and anterior.id_cliente == cid else None)
 
             # Ejecución del Update en persistencia
             if self.db.actualizar_cliente(nuevo):
                 messagebox.showinfo("Éxito", "Datos actualizados correctamente.")
                 self.ent_id.config(state='normal') 
                 self.limpiar_campos()
-                self.cargar_datos()
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo actualizar: {e}")
 
     def ejecutar_registro(self):
-        """Gestiona el flujo de alta de clientes: validación API, creación y guardado."""
+        """
+        Gestiona el flujo de alta de clientes: la validación de datos ocurre en el acto y la
+        validación API, el guardado y la notificación se encolan en segundo plano, de modo que
+        el operador puede seguir cargando clientes mientras se procesan.
+        """
         try:
             cid, nom, eml, tel = self.ent_id.get(), self.ent_nombre.get(), self.ent_email.get(), self.ent_tel.get()
             tipo = self.combo_tipo.get()
             
             if not all([cid, nom, eml, tel]): raise ValueError("Todos los campos son obligatorios.")
-            # Integración con servicio externo de validación
-            if not validar_identidad_api(cid): raise ValueError("Error de identidad.")
 
             # Selección de clase según categoría
-            if tipo == "Regular": nuevo = ClienteRegular(cid, nom, eml, tel)
-            elif tipo == "Premium": nuevo = ClientePremium(cid, nom, eml, tel)
-            else: nuevo = ClienteCorporativo(cid, nom, eml, tel, "Empresa Genérica")
-
-            # Persistencia y notificación automática
-            self.db.guardar_cliente(nuevo)
-            enviar_notificacion_bienvenida(nuevo)
-            messagebox.showinfo("Éxito", f"Cliente {nom} registrado.")
-            self.limpiar_campos(); self.cargar_datos()
+            nuevo = self._construir_cliente(cid, nom, eml, tel, tipo)
+            # Verificación previa de duplicados: evita la llamada a la API y el INSERT fallido
+            if self.repo.existe(cid):
+                raise ValueError(f"El ID {cid} ya existe en el sistema.")
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+
+        self.limpiar_campos()
+        self._en_segundo_plano(self._tarea_registro, nuevo,
+                               al_terminar=lambda c: self._mostrar_estado(f"Cliente {c.nombre} registrado."),
+                               al_fallar=lambda e: messagebox.showerror("Error", f"Registro de {cid} fallido: {e}"))
+
+    def _tarea_registro(self, nuevo):
+        """Se ejecuta en un hilo del pool: integra los servicios externos y persiste el cliente."""
+        # Integración con servicio externo de validación
+        if not validar_identidad_api(nuevo.id_cliente): raise ValueError("Error de identidad.")
+        # Persistencia; la notificación queda encolada en el outbox en la misma transacción
+        self.db.guardar_cliente(nuevo, notificar=True)
+        return nuevo
+
+    def _en_segundo_plano(self, tarea, *args, al_terminar=None, al_fallar=None):
+        """Envía 'tarea' al pool y programa los callbacks de resultado en el hilo de Tk."""
+        def ejecutar():
+            with self._lock_tareas:
+                self._tareas_en_cola -= 1
+                self._tareas_en_proceso += 1
+            try:
+                return tarea(*args)
+            finally:
+                with self._lock_tareas:
+                    self._tareas_en_proceso -= 1
+
+        def al_finalizar(futuro):
+            if futuro.cancelled():
+                return
+            error = futuro.exception()
+            if error is None:
+                callback, argumento = al_terminar, futuro.result()
+            else:
+                callback, argumento = al_fallar, error
+            if callback is not None:
+                self._cola_ui.put((callback, (argumento,)))
+
+        with self._lock_tareas:
+            self._tareas_en_cola += 1
+        self.executor.submit(ejecutar).add_done_callback(al_finalizar)
+        self._actualizar_estado_tareas()
+
+    def _procesar_cola_ui(self):
+        """Ejecuta en el hilo de Tk los callbacks enviados por los workers y vuelve a programarse."""
+        try:
+            while True:
+                callback, args = self._cola_ui.get_nowait()
+                try:
+                    callback(*args)
+                except Exception as e:
+                    messagebox.showerror("Error", str(e))
+        except queue.Empty:
+            pass
+        self._actualizar_estado_tareas()
+        self.root.after(self.INTERVALO_COLA_MS, self._procesar_cola_ui)
+
+    def _actualizar_estado_tareas(self):
+        with self._lock_tareas:
+            en_cola, en_proceso = self._tareas_en_cola, self._tareas_en_proceso
+        if en_cola or en_proceso:
+            avance = f" | {self._avance}" if self._avance else ""
+            self._mostrar_estado(f"Tareas pendientes: {en_cola} | En proceso: {en_proceso}{avance}")
+
+    def _mostrar_estado(self, mensaje):
+        self.lbl_estado.config(text=mensaje)
+
+    def cerrar(self):
+        """
+        Detiene el pool de servicios (descartando tareas no iniciadas) y el despachador, cierra
+        la base y la ventana. En local se espera a las tareas en curso: aún usan la conexión.
+        """
+        if not self.remoto:
+            self.detector.detener_incremental()  # Antes que el pool: ya no se le encargan verificaciones
+        self.executor.shutdown(wait=not self.remoto, cancel_futures=True)
+        if not self.remoto:
+            self.despachador.detener()
+        self.db.close()
+        self.root.destroy()
 
     def eliminar_cliente(self):
-        """Elimina el registro seleccionado tras confirmación del usuario."""
+        """
+        Elimina los registros seleccionados tras una única confirmación, en segundo plano. Varios
+        clientes se eliminan en una sola transacción y la tabla se actualiza una vez.
+        """
         selected = self.tree.selection()
         if not selected: return
-        id_cliente = self.tree.item(selected)['values'][0]
-        if messagebox.askyesno("Confirmar", f"¿Eliminar ID {id_cliente}?"):
-            if self.db.eliminar_cliente_db(id_cliente):
-                self.cargar_datos()
+        if len(selected) == 1:
+            id_cliente = selected[0]
+            if messagebox.askyesno("Confirmar", f"¿Eliminar ID {id_cliente}?"):
+                self._en_segundo_plano(
+                    self.db.eliminar_cliente_db, id_cliente,
+                    al_terminar=lambda eliminado: None if eliminado else messagebox.showerror(
+                        "Error", f"No se pudo eliminar {id_cliente}. Revise el log del sistema."))
+            return
+        if not messagebox.askyesno("Confirmar", f"¿Eliminar los {len(selected)} clientes seleccionados?"):
+            return
+        self._en_segundo_plano(self.db.eliminar_clientes_lote, list(selected),
+                               al_terminar=lambda ids: self._mostrar_estado(f"{len(ids)} clientes eliminados."),
+                               al_fallar=lambda e: messagebox.showerror("Error", f"No se pudieron eliminar: {e}"))
+
+    def cambiar_tipo_seleccion(self):
+        """Asigna la categoría del formulario a todos los clientes seleccionados, en una sola transacción."""
+        selected = self.tree.selection()
+        if not selected:
+            messagebox.showwarning("Atención", "Seleccione uno o más clientes de la tabla.")
+            return
+        tipo = self.combo_tipo.get()
+        if not messagebox.askyesno("Confirmar", f"¿Pasar los {len(selected)} clientes seleccionados a {tipo}?"):
+            return
+        self._en_segundo_plano(self.db.actualizar_tipo_lote, list(selected), CLASES_POR_TIPO[tipo].__name__,
+                               al_terminar=lambda n: self._mostrar_estado(f"{n} clientes pasados a {tipo}."),
+                               al_fallar=lambda e: messagebox.showerror("Error", f"No se pudo cambiar la categoría: {e}"))
+
+    def _al_cambiar_db(self, evento, fila):
+        """
+        Observador de DatabaseManager: actualiza solo la fila afectada de la tabla y, si está
+        abierto, el panel de estadísticas. Los cambios hechos desde hilos del pool se aplican en el hilo de Tk mediante la cola.
+        """
+        if threading.current_thread() is threading.main_thread():
+            self._aplicar_cambio(evento, fila)
+        else:
+            self._cola_ui.put((self._aplicar_cambio, (evento, fila)))
+
+    def _aplicar_cambio(self, evento, fila):
+        self.tabla.aplicar_cambio(evento, fila)
+        if self._panel_estadisticas is not None and self._panel_estadisticas.abierto():
+            self._panel_estadisticas.programar_refresco()
 
     def cargar_datos(self):
-        """Refresca la tabla visual con los datos actuales de la base de datos."""
-        for item in self.tree.get_children(): self.tree.delete(item)
-        for row in self.db.obtener_todos():
-            self.tree.insert("", tk.END, values=row)
+        """
+        Resincroniza la tabla visual con la primera página de datos (refresco explícito). También
+        vacía la caché del repositorio, por si la base cambió por fuera de esta aplicación.
+        """
+        self.repo.limpiar()
+        self.tabla.recargar()
+
+    def programar_busqueda(self, event=None):
+        """Aplaza la consulta hasta que el usuario deja de escribir (debounce) para no saturar la BD."""
+        if self._busqueda_programada is not None:
+            self.root.after_cancel(self._busqueda_programada)
+        self._busqueda_programada = self.root.after(self.ESPERA_BUSQUEDA_MS, self.ejecutar_busqueda)
+
+    def ejecutar_busqueda(self):
+        """
+        Consulta el índice de búsqueda con el texto y filtro actuales en segundo plano y muestra
+        los resultados. Las respuestas de búsquedas anteriores que lleguen tarde se descartan.
+        """
+        self._busqueda_programada = None
+        self._ultima_busqueda += 1
+        texto = self.ent_buscar.get().strip()
+        filtro = self.combo_filtro.get()
+        if not texto and filtro == "Todos":
+            self.tabla.recargar()
+            return
+        tipo = CLASES_POR_TIPO[filtro].__name__ if filtro in CLASES_POR_TIPO else None
+        numero = self._ultima_busqueda
+
+        def mostrar(filas):
+            if numero == self._ultima_busqueda:
+                self.tabla.mostrar_resultados(filas)
+
+        self._en_segundo_plano(self.db.buscar, texto, tipo, self.LIMITE_BUSQUEDA, al_terminar=mostrar,
+                               al_fallar=lambda e: messagebox.showerror("Búsqueda", f"No se pudo buscar: {e}"))
+
+    def abrir_diagnostico(self):
+        """Abre (o trae al frente) el panel con las métricas de rendimiento en vivo."""
+        if self._panel_diagnostico is not None and self._panel_diagnostico.abierto():
+            self._panel_diagnostico.ventana.lift()
+            return
+        self._panel_diagnostico = PanelDiagnostico(self.root, {"repositorio": self.repo.estadisticas})
+
+    def abrir_duplicados(self):
+        """Abre (o trae al frente) la ventana de revisión de duplicados probables."""
+        if self._panel_duplicados is not None and self._panel_duplicados.abierto():
+            self._panel_duplicados.ventana.lift()
+            return
+        self._panel_duplicados = PanelDuplicados(self.root, self.detector, self._en_segundo_plano)
+
+    def abrir_estadisticas(self):
+        """Abre (o trae al frente) el panel de estadísticas, que se actualiza con cada cambio."""
+        if self._panel_estadisticas is not None and self._panel_estadisticas.abierto():
+            self._panel_estadisticas.ventana.lift()
+            return
+        self._panel_estadisticas = PanelEstadisticas(self.root, self.db, self._en_segundo_plano)
 
     def limpiar_campos(self):
         """Restablece los campos de entrada del formulario."""
+        self._cliente_en_edicion = None
         self.ent_id.config(state='normal')
         for entry in [self.ent_id, self.ent_nombre, self.ent_email, self.ent_tel]:
             entry.delete(0, tk.END)
 
     def exportar(self):
-        """Activa la generación de backups en formatos externos."""
-        self.db.exportar_datos()
-        messagebox.showinfo("Exportación", "Backups generados.")
\ No newline at end of file
+        """Genera los backups en formatos externos en segundo plano, informando el avance en la barra de estado."""
+        def progreso(total):
+            # Se invoca en el worker tras cada bloque; el hilo de Tk lo muestra en su próximo ciclo
+            self._avance = f"Exportando: {total} clientes"
+
+        def terminar(total):
+            self._avance = None
+            if total is None:
+                messagebox.showerror("Exportación", "No se pudieron generar los backups. Revise el log del sistema.")
+            else:
+                self._mostrar_estado(f"Backups generados ({total} clientes).")
+                messagebox.showinfo("Exportación", f"Backups generados ({total} clientes).")
+
+        def fallar(error):
+            self._avance = None
+            messagebox.showerror("Exportación", f"No se pudieron generar los backups: {error}")
+
+        self._en_segundo_plano(partial(self.db.exportar_datos, progreso=progreso), al_terminar=terminar,
+                               al_fallar=fallar)
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""
+Módulo de Ingesta - Proyecto GIC
+Importa archivos grandes de clientes (CSV o JSON Lines, opcionalmente .gz, incluidos los
+backups de exportar_datos) sin cargarlos en memoria:
+
+    lectura (proceso principal) -> validación por bloques (ProcessPoolExecutor, reglas de models.py)
+    -> escritura (proceso principal, un único escritor SQLite con una transacción por bloque)
+
+Las filas rechazadas se escriben con su motivo en un archivo aparte y, tras cada bloque
+confirmado, un checkpoint permite reanudar una importación interrumpida sin repetir trabajo.
+"""
+
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from logger import registrar_evento, registrar_error
+from metricas import medir
+from models import Cliente
+
+TAMANO_BLOQUE = 50000       # Registros por bloque de validación y por transacción de escritura
+BLOQUES_EN_VUELO = 2        # Bloques encolados por proceso para que ninguno quede ocioso
+COLUMNAS = ("id", "nombre", "email", "telefono", "tipo", "descuento", "empresa")
+
+def formato_de(ruta, formato=None):
+    """'csv' o 'jsonl' según la extensión (ignorando .gz), salvo que se indique explícitamente."""
+    if formato:
+        return formato
+    nombre = ruta[:-3] if ruta.endswith(".gz") else ruta
+    return "csv" if nombre.endswith(".csv") else "jsonl"
+
+def _abrir_entrada(ruta):
+    if ruta == "-":
+        return sys.stdin
+    if ruta.endswith(".gz"):
+        return gzip.open(ruta, "rt", encoding="utf-8", newline="")
+    return open(ruta, encoding="utf-8", newline="")
+
+def _comillas_abiertas(linea, abiertas=False):
+    """
+    Indica si un campo entre comillas sigue abierto al final de la línea. Como en csv, una
+    comilla solo abre un campo al comienzo de este: la de 'Juan O"Brien' es un carácter más.
+    """
+    inicio_campo, cerrada = not abiertas, False
+    for caracter in linea:
+        if abiertas:
+            if caracter == '"':
+                abiertas, cerrada = False, True
+        elif caracter == ",":
+            inicio_campo, cerrada = True, False
+        elif caracter == '"' and (inicio_campo or cerrada):
+            abiertas = True  # Abre un campo o, tras el cierre, es una comilla duplicada ("")
+            inicio_campo = cerrada = False
+        else:
+            inicio_campo = cerrada = False
+    return abiertas
+
+def _registros_csv(entrada):
+    """
+    Agrupa las líneas físicas en registros CSV completos: un campo entre comillas puede
+    contener saltos de línea, y el registro sigue abierto mientras ese campo no se cierre.
+    """
+    pendiente = None
+    for linea in entrada:
+        if pendiente is not None:
+            pendiente += linea
+            if not _comillas_abiertas(linea, True):
+                yield pendiente
+                pendiente = None
+        elif '"' in linea and _comillas_abiertas(linea):
+            pendiente = linea
+        else:
+            yield linea
+    if pendiente is not None:
+        yield pendiente
+
+def _interpretar_csv(columnas, registro):
+    # Un lector por registro: un registro mal formado se rechaza solo, sin arrastrar a los siguientes
+    try:
+        campos = next(csv.reader((registro,)), None)
+    except csv.Error as e:
+        return None, f"CSV inválido: {e}"
+    return (dict(zip(columnas, campos)) if campos else None), None
+
+def validar_bloque(formato, columnas, primer_numero, lineas):
+    """
+    Se ejecuta en los procesos de validación: interpreta cada registro del bloque y lo valida
+    con Cliente.desde_registro. Devuelve (numeros, filas, rechazos) donde 'filas' son tuplas
+    listas para insertar (id, nombre, email, telefono, tipo, descuento, empresa) y 'rechazos'
+    son tuplas (numero, id, motivo, texto original).
+    """
+    numeros, filas, rechazos = [], [], []
+    if formato == "csv":
+        interpretados = (_interpretar_csv(columnas, linea) for linea in lineas)
+    else:
+        interpretados = map(_interpretar_json, lineas)
+    for numero, linea, (registro, error) in zip(range(primer_numero, primer_numero + len(lineas)), lineas, interpretados):
+        if registro is None and error is None:
+            continue  # Línea en blanco
+        if error is None:
+            try:
+                cliente = Cliente.desde_registro(registro)
+                numeros.append(numero)
+                filas.append((cliente.id_cliente, cliente.nombre, cliente.email, cliente.telefono,
+                              type(cliente).__name__, getattr(cliente, "descuento", None),
+                              getattr(cliente, "empresa", None)))
+                continue
+            except (ValueError, TypeError, AttributeError) as e:
+                error = str(e)
+        id_cliente = registro.get("id") if registro is not None else None
+        rechazos.append((numero, id_cliente, error, linea.rstrip("\r\n")))
+    return numeros, filas, rechazos
+
+def _interpretar_json(linea):
+    if not linea.strip():
+        return None, None
+    try:
+        registro = json.loads(linea)
+    except json.JSONDecodeError as e:
+        return None, f"JSON inválido: {e}"
+    if not isinstance(registro, dict):
+        return None, "Se esperaba un objeto JSON por línea."
+    return registro, None
+
+class ImportadorClientes:
+    """
+    Importación por etapas de un archivo de clientes sobre un DatabaseManager.
+    Con procesos=0 la validación ocurre en el propio proceso (útil para archivos pequeños);
+    con None se usan todos los núcleos disponibles.
+    """
+
+    def __init__(self, db, ruta, formato=None, actualizar=False, procesos=None, tamano_bloque=TAMANO_BLOQUE,
+                 ruta_rechazos=None, ruta_checkpoint=None, validar_identidad=False, al_rechazar=None):
+        self.db = db
+        self.ruta = ruta
+        self.formato = formato_de(ruta, formato)
+        self.actualizar = actualizar
+        self.procesos = (os.cpu_count() or 1) if procesos is None else procesos
+        self.tamano_bloque = tamano_bloque
+        desde_stdin = ruta == "-"
+        # Desde stdin no se puede reanudar: no hay checkpoint y los rechazos solo se escriben si se pide
+        self.ruta_rechazos = ruta_rechazos or (None if desde_stdin else ruta + ".rechazos.jsonl")
+        self.ruta_checkpoint = None if desde_stdin else (ruta_checkpoint or ruta + ".checkpoint")
+        self.validar_identidad = validar_identidad
+        # al_rechazar(referencia, motivo) se invoca además por cada fila rechazada (p. ej. para la consola)
+        self.al_rechazar = al_rechazar
+        self.conteo = {}
+        self.registros = 0
+        self._archivo_rechazos = None
+
+    # --- Checkpoint ---
+
+    def _firma_archivo(self):
+        estado = os.stat(self.ruta)
+        return {"archivo": os.path.abspath(self.ruta), "bytes": estado.st_size, "modificado": estado.st_mtime}
+
+    def _leer_checkpoint(self):
+        """Registros ya importados según el checkpoint (0 si no hay uno válido para este archivo)."""
+        if not self.ruta_checkpoint or not os.path.exists(self.ruta_checkpoint):
+            return 0
+        try:
+            with open(self.ruta_checkpoint, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            registrar_error(f"Checkpoint ilegible {self.ruta_checkpoint}, se importa desde el inicio: {e}",
+                            operacion="importar", resultado="checkpoint_invalido")
+            return 0
+        if {k: checkpoint.get(k) for k in ("archivo", "bytes", "modificado")} != self._firma_archivo():
+            registrar_evento(f"El checkpoint {self.ruta_checkpoint} corresponde a otra versión del archivo; "
+                             "se importa desde el inicio.", operacion="importar", resultado="checkpoint_descartado")
+            return 0
+        self.conteo = checkpoint.get("conteo", {})
+        return checkpoint["registros"]
+
+    def _guardar_checkpoint(self):
+        if not self.ruta_checkpoint:
+            return
+        temporal = self.ruta_checkpoint + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({**self._firma_archivo(), "registros": self.registros, "conteo": self.conteo}, f)
+        os.replace(temporal, self.ruta_checkpoint)  # Reemplazo atómico: nunca queda a medio escribir
+
+    # --- Etapas ---
+
+    def _bloques(self, saltar):
+        """Lee el archivo y produce (primer_numero, columnas, lineas), omitiendo los 'saltar' primeros registros."""
+        entrada = _abrir_entrada(self.ruta)
+        try:
+            columnas, numero = None, 1
+            if self.formato == "csv":
+                registros = _registros_csv(entrada)
+                encabezado = next(registros, None)
+                if encabezado is None:
+                    return
+                columnas = next(csv.reader([encabezado]))
+                numero = 2  # La fila 1 es el encabezado
+            else:
+                registros = iter(entrada)
+            for _ in zip(range(saltar), registros):
+                pass
+            numero += saltar
+            while True:
+                bloque = list(islice(registros, self.tamano_bloque))
+                if not bloque:
+                    return
+                yield numero, columnas, bloque
+                numero += len(bloque)
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+
+    def _validados(self, bloques):
+        """Valida los bloques en paralelo conservando el orden de lectura."""
+        if self.procesos == 0:
+            for primer_numero, columnas, lineas in bloques:
+                yield len(lineas), validar_bloque(self.formato, columnas, primer_numero, lineas)
+            return
+        with ProcessPoolExecutor(max_workers=self.procesos) as pool:
+            en_vuelo = deque()
+            for primer_numero, columnas, lineas in bloques:
+                en_vuelo.append((len(lineas), pool.submit(validar_bloque, self.formato, columnas, primer_numero, lineas)))
+                if len(en_vuelo) >= self.procesos * BLOQUES_EN_VUELO:
+                    cantidad, futuro = en_vuelo.popleft()
+                    yield cantidad, futuro.result()
+            while en_vuelo:
+                cantidad, futuro = en_vuelo.popleft()
+                yield cantidad, futuro.result()
+
+    def _rechazar(self, numero, id_cliente, motivo, texto, estado="invalido"):
+        self.conteo[estado] = self.conteo.get(estado, 0) + 1
+        if self._archivo_rechazos is not None:
+            self._archivo_rechazos.write(json.dumps({"fila": numero, "id": id_cliente, "motivo": motivo,
+                                                     "registro": texto}, ensure_ascii=False) + "\n")
+        if self.al_rechazar is not None:
+            self.al_rechazar(f"fila {numero}", motivo)
+
+    def _escribir(self, numeros, filas):
+        """Única etapa que escribe en SQLite: una transacción por bloque validado."""
+        if self.validar_identidad and filas:
+            from services import validar_identidades_lote  # Solo se carga si se pide la validación
+            validos = validar_identidades_lote([fila[0] for fila in filas])
+            conservar = [validos.get(fila[0], False) for fila in filas]
+            for numero, fila, valido in zip(numeros, filas, conservar):
+                if not valido:
+                    self._rechazar(numero, fila[0], "identidad no validada", dict(zip(COLUMNAS, fila)))
+            numeros = [n for n, valido in zip(numeros, conservar) if valido]
+            filas = [f for f, valido in zip(filas, conservar) if valido]
+        if not filas:
+            return
+        escribir = self.db.upsert_clientes_lote if self.actualizar else self.db.guardar_clientes_lote
+        # Las filas ya se validaron en validar_bloque; los resultados llegan en el orden de entrada
+        for numero, fila, resultado in zip(numeros, filas, escribir(filas, carga_masiva=True, validar=False)):
+            if resultado.estado in ("duplicado", "invalido"):
+                self._rechazar(numero, resultado.id_cliente, resultado.motivo or resultado.estado,
+                               dict(zip(COLUMNAS, fila)), resultado.estado)
+            else:
+                self.conteo[resultado.estado] = self.conteo.get(resultado.estado, 0) + 1
+
+    @medir("ingesta_importar")
+    def importar(self):
+        """
+        Ejecuta la importación completa (o la reanuda desde el checkpoint) y devuelve un resumen
+        {'registros', 'reanudado_desde', 'rechazados', 'ruta_rechazos', 'duracion_s', <estado>: cantidad}.
+        El checkpoint se elimina al terminar sin errores.
+        """
+        inicio = time.perf_counter()
+        reanudado_desde = self.registros = self._leer_checkpoint()
+        if self.ruta_rechazos:
+            # Al reanudar se agregan los nuevos rechazos a los ya registrados
+            self._archivo_rechazos = open(self.ruta_rechazos, "a" if reanudado_desde else "w", encoding="utf-8")
+        try:
+            for cantidad, (numeros, filas, rechazos) in self._validados(self._bloques(reanudado_desde)):
+                for rechazo in rechazos:
+                    self._rechazar(*rechazo)
+                self._escribir(numeros, filas)
+                self.registros += cantidad
+                if self._archivo_rechazos is not None:
+                    self._archivo_rechazos.flush()
+                # Si el proceso se interrumpe entre el commit y esta línea, al reanudar se repite
+                # solo este bloque (sus filas se informarán como duplicadas, o se reescriben con actualizar)
+                self._guardar_checkpoint()
+        except Exception as e:
+            registrar_error(f"Importación de {self.ruta} interrumpida tras {self.registros} registros: {e}",
+                            operacion="importar", filas=self.registros, resultado="error")
+            raise
+        finally:
+            if self._archivo_rechazos is not None:
+                self._archivo_rechazos.close()
+                self._archivo_rechazos = None
+
+        if self.ruta_checkpoint and os.path.exists(self.ruta_checkpoint):
+            os.remove(self.ruta_checkpoint)
+        rechazados = self.conteo.get("duplicado", 0) + self.conteo.get("invalido", 0)
+        if self.ruta_rechazos and not rechazados and not reanudado_desde:
+            os.remove(self.ruta_rechazos)  # Sin rechazos no se deja un archivo vacío
+        duracion = time.perf_counter() - inicio
+        registrar_evento(f"Importación de {self.ruta} completada: {self.registros} registros, {rechazados} rechazados.",
+                         operacion="importar", filas=self.registros, duracion_ms=round(duracion * 1000, 3),
+                         resultado="ok", procesos=self.procesos, **self.conteo)
+        return {**self.conteo, "registros": self.registros, "reanudado_desde": reanudado_desde,
+                "rechazados": rechazados, "ruta_rechazos": self.ruta_rechazos if rechazados else None,
+                "duracion_s": round(duracion, 3)}
+
+def importar_archivo(db, ruta, **opciones):
+    """Atajo de ImportadorClientes(db, ruta, **opciones).importar()."""
+    return ImportadorClientes(db, ruta, **opciones).importar()
@@ -1,25 +1,153 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
 
 # Configuración global del motor de logging para el proyecto GIC.
 # Esto garantiza el cumplimiento del requerimiento técnico de "Registro de actividad" 
 # permitiendo auditar operaciones y fallos en un archivo físico persistente.
-logging.basicConfig(
-    filename='sistema_gic.log',       # Archivo donde se almacenará el historial
-    level=logging.INFO,                # Nivel mínimo de severidad a registrar
-    format='%(asctime)s - %(levelname)s - %(message)s', # Estructura del mensaje: Tiempo - Nivel - Contenido
-    datefmt='%Y-%m-%d %H:%M:%S'        # Formato de fecha y hora legible
-)
+#
+# Las llamadas a registrar_evento / registrar_error solo encolan el registro (QueueHandler):
+# la escritura a disco ocurre en un hilo aparte (QueueListener), de modo que el hilo de la
+# interfaz y los caminos masivos no esperan al sistema de archivos.
 
-def registrar_evento(mensaje):
+# Archivo donde se almacenará el historial (JSON Lines); GIC_LOG permite redirigirlo (pruebas, benchmarks)
+ARCHIVO_LOG = os.environ.get('GIC_LOG', 'sistema_gic.log')
+MAX_BYTES = 10 * 1024 * 1024        # Rotación por tamaño: 10 MB por archivo
+BACKUPS = 5                          # Archivos rotados que se conservan
+EVENTOS_POR_SEGUNDO = 200            # Límite por operación para eventos de alto volumen
+
+_logger = logging.getLogger("gic")
+_logger.setLevel(logging.INFO)       # Nivel mínimo de severidad a registrar
+_logger.propagate = False
+_listener = None
+
+class FormateadorJSON(logging.Formatter):
+    """
+    Serializa cada registro como una línea JSON con marca de tiempo, nivel, mensaje y los
+    campos estructurados recibidos (operacion, id_cliente, duracion_ms, resultado...).
+    """
+
+    def format(self, record):
+        registro = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "nivel": record.levelname,
+            "mensaje": record.getMessage(),
+            "hilo": record.threadName,
+        }
+        campos = getattr(record, "campos", None)
+        if campos:
+            registro.update(campos)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+class LimitadorTasa(logging.Filter):
+    """
+    Limita los eventos informativos a 'eventos_por_segundo' por operación (token bucket).
+    Los descartados se contabilizan y se informan en el siguiente evento admitido de esa
+    operación mediante el campo 'suprimidos'. Advertencias y errores nunca se descartan.
+    """
+
+    def __init__(self, eventos_por_segundo=EVENTOS_POR_SEGUNDO):
+        super().__init__()
+        self.tasa = eventos_por_segundo
+        self._cubetas = {}  # operacion -> [fichas, ultimo_instante, suprimidos]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.tasa:
+            return True
+        campos = getattr(record, "campos", None) or {}
+        operacion = campos.get("operacion")
+        if operacion is None:
+            return True
+
+        ahora = time.monotonic()
+        with self._lock:
+            cubeta = self._cubetas.get(operacion)
+            if cubeta is None:
+                cubeta = self._cubetas[operacion] = [self.tasa, ahora, 0]
+            cubeta[0] = min(self.tasa, cubeta[0] + (ahora - cubeta[1]) * self.tasa)
+            cubeta[1] = ahora
+            if cubeta[0] < 1:
+                cubeta[2] += 1
+                return False
+            cubeta[0] -= 1
+            suprimidos, cubeta[2] = cubeta[2], 0
+        if suprimidos:
+            record.campos = {**campos, "suprimidos": suprimidos}
+        return True
+
+class _Encolador(logging.handlers.QueueHandler):
+    """
+    QueueHandler que encola el registro tal cual: el formateo JSON ocurre en el hilo escritor,
+    no en el hilo que registra. La cola es en memoria, así que no hace falta copiarlo.
+    """
+
+    def prepare(self, record):
+        return record
+
+def configurar_logging(archivo=ARCHIVO_LOG, max_bytes=MAX_BYTES, backups=BACKUPS,
+                       rotar_cada=None, eventos_por_segundo=EVENTOS_POR_SEGUNDO):
+    """
+    (Re)configura el pipeline de logging: cola en memoria + hilo escritor con rotación.
+    Por defecto rota por tamaño; con rotar_cada (ej. 'midnight', 'H') rota por tiempo.
+    """
+    global _listener
+    cerrar_logging()
+
+    if rotar_cada:
+        destino = logging.handlers.TimedRotatingFileHandler(archivo, when=rotar_cada, backupCount=backups,
+                                                            encoding='utf-8')
+    else:
+        destino = logging.handlers.RotatingFileHandler(archivo, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding='utf-8')
+    destino.setFormatter(FormateadorJSON())
+
+    cola = queue.SimpleQueue()
+    encolador = _Encolador(cola)
+    encolador.addFilter(LimitadorTasa(eventos_por_segundo))
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    _logger.addHandler(encolador)
+
+    _listener = logging.handlers.QueueListener(cola, destino)
+    _listener.start()
+
+def cerrar_logging():
+    """Vacía la cola pendiente y cierra el archivo de log."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+configurar_logging()
+atexit.register(cerrar_logging)
+
+def registrar_evento(mensaje, muestreo=None, **campos):
     """
     Registra sucesos informativos o flujos exitosos dentro de la aplicación.
     Se utiliza para el seguimiento de registros, actualizaciones y exportaciones.
+    'campos' agrega datos estructurados (operacion, id_cliente, duracion_ms, resultado...).
+    'muestreo' (0 a 1) registra solo esa fracción de los eventos, para caminos muy frecuentes.
     """
-    logging.info(mensaje)
+    if muestreo is not None and random.random() >= muestreo:
+        return
+    _logger.info(mensaje, extra={"campos": campos} if campos else None)
 
-def registrar_error(mensaje):
+def registrar_error(mensaje, **campos):
     """
     Registra excepciones y fallos críticos en el archivo log.
     Es fundamental para el soporte técnico y la depuración del sistema en producción.
     """
-    logging.error(mensaje)
\ No newline at end of file
+    _logger.error(mensaje, extra={"campos": campos} if campos else None)
+
+def ms_desde(inicio):
+    """Milisegundos transcurridos desde 'inicio' (time.perf_counter), para el campo duracion_ms."""
+    return round((time.perf_counter() - inicio) * 1000, 3)
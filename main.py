@@ -1,24 +1,59 @@
-import tkinter as tk
-from gui import GIC_App
-from database import DatabaseManager
-from logger import registrar_evento, registrar_error
+import os
+import sys
+import time
+from logger import ms_desde, registrar_evento, registrar_error
+
+def _registrar_fase(fase, inicio):
+    registrar_evento(f"Arranque: fase '{fase}' completada", operacion="arranque", fase=fase,
+                     duracion_ms=ms_desde(inicio))
 
 def iniciar_sistema():
     """Función principal para orquestar el arranque del Gestor Inteligente de Clientes."""
     try:
         # Registro de inicio de sesión en el log (Requerimiento de auditoría) 
         registrar_evento("Iniciando el sistema GIC - Solution Tech...")
+        inicio = time.perf_counter()
+
+        # La interfaz se importa solo al abrir la ventana: el modo línea de comandos
+        # funciona en servidores sin entorno gráfico y no paga el costo de tkinter.
+        import tkinter as tk
+        from gui import GIC_App
+        from database import DatabaseManager
+        from metricas import iniciar_servidor_metricas
+        _registrar_fase("importaciones", inicio)
+
+        # Endpoint opcional de métricas en formato Prometheus (GIC_METRICAS_PUERTO=9464)
+        puerto_metricas = os.environ.get("GIC_METRICAS_PUERTO")
+        if puerto_metricas:
+            try:
+                iniciar_servidor_metricas(int(puerto_metricas))
+            except OSError:
+                pass  # Ya registrado en el log; la aplicación funciona sin el endpoint
 
         # Inicialización de persistencia (SQLite)
-        # Se asegura que las tablas existan antes de cargar la interfaz
-        db = DatabaseManager()
+        # Se asegura que las tablas existan antes de cargar la interfaz; la misma
+        # instancia se comparte con la aplicación
+        # Con GIC_SERVIDOR=http://equipo:8765 se trabaja sobre un servidor compartido
+        # (python main.py serve) en lugar del archivo local; GIC_TOKEN lleva el token de acceso
+        fase = time.perf_counter()
+        url_servidor = os.environ.get("GIC_SERVIDOR")
+        if url_servidor:
+            from servidor import ClienteRemoto
+            db = ClienteRemoto(url_servidor)
+        else:
+            db = DatabaseManager()
+        _registrar_fase("base_de_datos", fase)
         
         # Configuración de la ventana principal (GUI)
+        fase = time.perf_counter()
         root = tk.Tk()
         root.geometry("600x500") # Dimensiones sugeridas para visualización fluida
+        _registrar_fase("ventana", fase)
         
         # Carga de la lógica de negocio y componentes visuales
-        app = GIC_App(root)
+        app = GIC_App(root, db=db)
+        # Los datos se cargan en segundo plano: la ventana es interactiva desde aquí
+        _registrar_fase("interactivo", inicio)
         
         registrar_evento("Interfaz gráfica cargada exitosamente. Sistema listo para operar.")
         
@@ -32,4 +67,8 @@ def iniciar_sistema():
         print(error_msg) # Salida por consola para soporte técnico
 
 if __name__ == "__main__":
-    iniciar_sistema()
\ No newline at end of file
+    # Con un subcomando (import, export, query, stats, vacuum, backup, serve...) se ejecuta sin interfaz gráfica
+    if len(sys.argv) > 1:
+        from cli import ejecutar
+        sys.exit(ejecutar(sys.argv[1:]))
+    iniciar_sistema()
@@ -0,0 +1,244 @@
+"""
+Módulo de Métricas - Proyecto GIC
+Registro en proceso de contadores, medidores y histogramas de latencia, con exportación
+en formato de texto de Prometheus (archivo o endpoint HTTP local).
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logger import registrar_evento, registrar_error
+
+# Bandera de código de las funciones generadoras (inspect.CO_GENERATOR); se evita importar
+# inspect para no encarecer el arranque de la línea de comandos
+_CO_GENERADOR = 0x20
+
+# Límites superiores (en segundos) de los buckets de latencia: de 0,1 ms a 10 s
+BUCKETS_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Contador:
+    """Valor que solo aumenta (operaciones realizadas, errores...)."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre, descripcion=""):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def incrementar(self, cantidad=1):
+        with self._lock:
+            self.valor += cantidad
+
+    def prometheus(self):
+        return [f"{self.nombre} {self.valor}"]
+
+class Medidor:
+    """Valor que puede subir o bajar (tareas en curso, tamaño de una cola...)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nombre, descripcion=""):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def fijar(self, valor):
+        self.valor = valor
+
+    def incrementar(self, cantidad=1):
+        with self._lock:
+            self.valor += cantidad
+
+    def prometheus(self):
+        return [f"{self.nombre} {self.valor}"]
+
+class Histograma:
+    """
+    Distribución de latencias en buckets fijos: memoria constante sin importar cuántas
+    observaciones se registren. Los percentiles se estiman interpolando dentro del bucket.
+    """
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, descripcion="", buckets=BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.buckets = tuple(buckets)
+        self.conteos = [0] * (len(self.buckets) + 1)  # El último bucket es +Inf
+        self.suma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            self.conteos[indice] += 1
+            self.suma += valor
+            self.total += 1
+            if valor > self.maximo:
+                self.maximo = valor
+
+    def percentil(self, p):
+        """Estimación del percentil p (0 a 100); None si no hay observaciones."""
+        with self._lock:
+            conteos, total, maximo = list(self.conteos), self.total, self.maximo
+        if not total:
+            return None
+        objetivo = total * p / 100
+        acumulado = 0
+        for indice, cantidad in enumerate(conteos):
+            if cantidad and acumulado + cantidad >= objetivo:
+                inferior = self.buckets[indice - 1] if indice > 0 else 0.0
+                superior = self.buckets[indice] if indice < len(self.buckets) else maximo
+                return inferior + (superior - inferior) * (objetivo - acumulado) / cantidad
+            acumulado += cantidad
+        return maximo
+
+    def resumen(self):
+        return {"total": self.total, "promedio": self.suma / self.total if self.total else None,
+                "p50": self.percentil(50), "p95": self.percentil(95), "p99": self.percentil(99),
+                "maximo": self.maximo}
+
+    def prometheus(self):
+        with self._lock:
+            conteos, suma, total = list(self.conteos), self.suma, self.total
+        lineas, acumulado = [], 0
+        for limite, cantidad in zip(self.buckets, conteos):
+            acumulado += cantidad
+            lineas.append(f'{self.nombre}_bucket{{le="{limite}"}} {acumulado}')
+        lineas.append(f'{self.nombre}_bucket{{le="+Inf"}} {total}')
+        lineas.append(f"{self.nombre}_sum {suma}")
+        lineas.append(f"{self.nombre}_count {total}")
+        return lineas
+
+class RegistroMetricas:
+    """Colección de métricas con nombre único; crea cada métrica la primera vez que se pide."""
+
+    def __init__(self, prefijo="gic_"):
+        self.prefijo = prefijo
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _obtener(self, clase, nombre, descripcion):
+        nombre = self.prefijo + nombre
+        metrica = self._metricas.get(nombre)
+        if metrica is None:
+            with self._lock:
+                metrica = self._metricas.setdefault(nombre, clase(nombre, descripcion))
+        return metrica
+
+    def contador(self, nombre, descripcion=""):
+        return self._obtener(Contador, nombre, descripcion)
+
+    def medidor(self, nombre, descripcion=""):
+        return self._obtener(Medidor, nombre, descripcion)
+
+    def histograma(self, nombre, descripcion=""):
+        return self._obtener(Histograma, nombre, descripcion)
+
+    def instantanea(self):
+        """Valores actuales de todas las métricas: número o resumen de percentiles (histogramas)."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        return {m.nombre: m.resumen() if isinstance(m, Histograma) else m.valor for m in metricas}
+
+    def limpiar(self):
+        with self._lock:
+            self._metricas.clear()
+
+    def prometheus(self):
+        """Todas las métricas en formato de texto de exposición de Prometheus."""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda m: m.nombre)
+        lineas = []
+        for metrica in metricas:
+            if metrica.descripcion:
+                lineas.append(f"# HELP {metrica.nombre} {metrica.descripcion}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.prometheus())
+        return "\n".join(lineas) + "\n"
+
+    def exportar_archivo(self, ruta="metricas_gic.prom"):
+        """Vuelca las métricas a un archivo de texto (compatible con el textfile collector)."""
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        # El reemplazo atómico evita que un lector vea el archivo a medio escribir
+        os.replace(temporal, ruta)
+
+# Registro global de la aplicación
+registro = RegistroMetricas()
+
+@contextmanager
+def cronometro(operacion):
+    """
+    Mide la duración del bloque en el histograma '<operacion>_segundos' y cuenta
+    las ejecuciones y errores en '<operacion>_total' / '<operacion>_errores_total'.
+    """
+    histograma = registro.histograma(f"{operacion}_segundos", f"Latencia de {operacion}")
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registro.contador(f"{operacion}_errores_total", f"Errores en {operacion}").incrementar()
+        raise
+    finally:
+        histograma.observar(time.perf_counter() - inicio)
+        registro.contador(f"{operacion}_total", f"Ejecuciones de {operacion}").incrementar()
+
+def medir(operacion):
+    """
+    Decorador que aplica cronometro(operacion) a cada llamada de la función.
+    En los generadores se mide el recorrido completo, no solo la creación del iterador.
+    """
+    def decorador(funcion):
+        if funcion.__code__.co_flags & _CO_GENERADOR:
+            @functools.wraps(funcion)
+            def envoltura_generador(*args, **kwargs):
+                with cronometro(operacion):
+                    yield from funcion(*args, **kwargs)
+            return envoltura_generador
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with cronometro(operacion):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+def iniciar_servidor_metricas(puerto=9464, host="127.0.0.1"):
+    """Expone GET /metrics en un hilo aparte. Devuelve el servidor (usar .shutdown() para detenerlo)."""
+    # Importación diferida: http.server solo se carga si se pide el endpoint
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ManejadorMetricas(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = registro.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass  # Las peticiones de scraping no se registran en el log del sistema
+
+    try:
+        servidor = ThreadingHTTPServer((host, puerto), ManejadorMetricas)
+    except OSError as e:
+        registrar_error(f"No se pudo iniciar el endpoint de métricas en {host}:{puerto}: {e}")
+        raise
+    threading.Thread(target=servidor.serve_forever, name="gic-metricas", daemon=True).start()
+    registrar_evento(f"Endpoint de métricas disponible en http://{host}:{servidor.server_port}/metrics")
+    return servidor
@@ -1,7 +1,17 @@
 import re
 
+# Validadores precompilados una sola vez: evitan la búsqueda en la caché interna de 're'
+# en cada asignación de email.
+_PATRON_EMAIL = re.compile(r"[^@]+@[^@]+\.[^@]+")
+_PATRON_DESCUENTO = re.compile(r"Descuento:\s*(\d+)%")
+_PREFIJO_EMPRESA = "Empresa: "
+
 class Cliente:
     """Clase base que define la estructura principal de un cliente y sus validaciones."""
+
+    # __slots__ elimina el __dict__ por instancia: objetos más livianos y acceso más rápido.
+    # Los nombres con doble guion bajo se transforman igual que los atributos (_Cliente__email).
+    __slots__ = ("id_cliente", "nombre", "__email", "__telefono")
     
     def __init__(self, id_cliente, nombre, email, telefono):
         self.id_cliente = id_cliente
@@ -18,8 +28,7 @@ class Cliente:
     @email.setter
     def email(self, valor):
         """Valida que el email tenga un formato estándar (usuario@dominio.com)."""
-        patron = r"[^@]+@[^@]+\.[^@]+"
-        if not re.match(patron, valor):
+        if not _PATRON_EMAIL.match(valor):
             raise ValueError(f"Formato de email inválido: {valor}")
         self.__email = valor
 
@@ -31,10 +40,64 @@ class Cliente:
     @telefono.setter
     def telefono(self, valor):
         """Asegura que el teléfono contenga solo números y tenga una longitud mínima."""
-        if not str(valor).isdigit() or len(str(valor)) < 7:
+        texto = str(valor)
+        if not texto.isdigit() or len(texto) < 7:
             raise ValueError(f"Número de teléfono inválido. Debe ser numérico y mayor a 7 dígitos.")
         self.__telefono = valor
 
+    @classmethod
+    def desde_fila(cls, fila, validar=False):
+        """
+        Reconstruye la subclase correcta a partir de una fila de la base de datos
+        (id, nombre, email, telefono, tipo, extra). Las filas leídas de la BD ya fueron
+        validadas al guardarse, por lo que por defecto se omiten los setters (validar=False).
+        """
+        id_cliente, nombre, email, telefono, tipo, extra = fila[:6]
+        clase = TIPOS_CLIENTE.get(tipo, Cliente)
+        if validar:
+            return clase(id_cliente, nombre, email, telefono, *clase._argumentos_extra(extra))
+
+        cliente = object.__new__(clase)
+        cliente.id_cliente = id_cliente
+        cliente.nombre = nombre
+        cliente.__email = email
+        cliente.__telefono = telefono
+        if clase._con_extra:
+            cliente._cargar_extra(extra)
+        return cliente
+
+    @classmethod
+    def desde_registro(cls, registro):
+        """
+        Construye y valida la subclase correcta a partir de un diccionario con las columnas
+        exportadas (id, nombre, email, telefono, tipo y descuento/empresa, o el antiguo 'extra').
+        'tipo' admite el nombre de la clase (ClientePremium) o la categoría (Premium).
+        Lanza ValueError si el registro no cumple las reglas del modelo.
+        """
+        tipo = registro.get("tipo") or "ClienteRegular"
+        clase = TIPOS_CLIENTE.get(tipo) or TIPOS_CLIENTE.get("Cliente" + tipo)
+        if clase is None:
+            raise ValueError(f"Tipo de cliente desconocido: {tipo}")
+        if not registro.get("id"):
+            raise ValueError("ID de cliente vacío.")
+        if "extra" in registro and not registro.get("descuento") and not registro.get("empresa"):
+            extra = clase._argumentos_extra(registro["extra"])
+        elif clase is ClientePremium:
+            extra = (int(registro["descuento"]),) if registro.get("descuento") not in (None, "") else ()
+        elif clase is ClienteCorporativo:
+            extra = (registro.get("empresa") or "",)
+        else:
+            extra = ()
+        return clase(registro["id"], registro.get("nombre"), registro.get("email") or "",
+                     registro.get("telefono") or "", *extra)
+
+    # Las subclases con datos propios reconstruyen sus atributos desde la columna 'extra'
+    _con_extra = False
+
+    @staticmethod
+    def _argumentos_extra(extra):
+        return ()
+
     def obtener_beneficio(self):
         """Método base para polimorfismo: será sobrescrito por las subclases."""
         return "Acceso básico al sistema."
@@ -50,24 +113,71 @@ class Cliente:
 
 # Aplicación de Herencia: Subclases especializadas
 class ClienteRegular(Cliente):
+    __slots__ = ()
+
     def obtener_beneficio(self):
         return "Cliente Regular: Sin descuentos especiales."
 
 class ClientePremium(Cliente):
+    __slots__ = ("__descuento",)
+    _con_extra = True
+
     def __init__(self, id_cliente, nombre, email, telefono, descuento=15):
         # Llama al constructor de la clase padre
         super().__init__(id_cliente, nombre, email, telefono)
         self.descuento = descuento
 
+    @property
+    def descuento(self):
+        return self.__descuento
+
+    @descuento.setter
+    def descuento(self, valor):
+        """Valida que el descuento sea un porcentaje entero entre 0 y 100."""
+        valor = int(valor)
+        if not 0 <= valor <= 100:
+            raise ValueError(f"Descuento inválido: {valor}. Debe estar entre 0 y 100.")
+        self.__descuento = valor
+
+    @staticmethod
+    def _argumentos_extra(extra):
+        coincidencia = _PATRON_DESCUENTO.match(extra or "")
+        return (int(coincidencia.group(1)),) if coincidencia else (15,)
+
+    def _cargar_extra(self, extra):
+        # Datos leídos de la BD: ya validados al guardarse
+        self.__descuento, = self._argumentos_extra(extra)
+
     def obtener_beneficio(self):
         """Implementación polimórfica del beneficio Premium."""
         return f"Cliente Premium: Posee un {self.descuento}% de descuento."
 
 class ClienteCorporativo(Cliente):
+    __slots__ = ("empresa",)
+    _con_extra = True
+
     def __init__(self, id_cliente, nombre, email, telefono, empresa):
         super().__init__(id_cliente, nombre, email, telefono)
         self.empresa = empresa
 
+    @staticmethod
+    def _argumentos_extra(extra):
+        extra = extra or ""
+        return (extra[len(_PREFIJO_EMPRESA):] if extra.startswith(_PREFIJO_EMPRESA) else extra,)
+
+    def _cargar_extra(self, extra):
+        self.empresa, = self._argumentos_extra(extra)
+
     def obtener_beneficio(self):
         """Implementación polimórfica que resalta la asociación corporativa."""
-        return f"Cliente Corporativo: Facturación directa para {self.empresa}."
\ No newline at end of file
+        return f"Cliente Corporativo: Facturación directa para {self.empresa}."
+
+# Registro de subclases por nombre, tal como se guarda en la columna 'tipo'
+TIPOS_CLIENTE = {clase.__name__: clase for clase in (Cliente, ClienteRegular, ClientePremium, ClienteCorporativo)}
+
+def hidratar_filas(filas, validar=False):
+    """
+    Convierte filas de la base de datos en objetos Cliente de forma perezosa:
+    cada objeto se construye recién cuando el consumidor lo pide.
+    """
+    return (Cliente.desde_fila(fila, validar) for fila in filas)
@@ -0,0 +1,108 @@
+"""
+Módulo de Notificaciones - Proyecto GIC
+Despachador en segundo plano del outbox de notificaciones: envía los mensajes pendientes
+en lotes, reintenta con espera exponencial y marca como 'muerto' lo que agota sus intentos.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+from logger import registrar_evento, registrar_error
+from services import enviar_notificacion_bienvenida
+
+class EmisorLocal:
+    """
+    Emisor de prueba que no sale de la máquina: registra los destinatarios recibidos.
+    Con fallar=True simula un proveedor caído (todos los envíos fallan).
+    """
+
+    def __init__(self, fallar=False):
+        self.fallar = fallar
+        self.enviados = []
+
+    def __call__(self, destinatario):
+        if self.fallar:
+            return False
+        self.enviados.append(destinatario)
+        return True
+
+class DespachadorNotificaciones:
+    """
+    Vacía el outbox de notificaciones de un DatabaseManager en un hilo propio.
+    'emisor' recibe un objeto con id_cliente, nombre y email y devuelve True si el envío fue exitoso.
+    'envios_por_segundo' limita la tasa de envío (None = sin límite).
+    'escritor', si se indica, recibe (funcion, *args), ejecuta esa escritura y devuelve su resultado
+    (p. ej. a través de la cola del escritor único de ServidorGIC); por defecto se ejecuta en el acto.
+    """
+
+    def __init__(self, db, emisor=enviar_notificacion_bienvenida, tamano_lote=50, max_intentos=5,
+                 espera_base=1.0, espera_maxima=300.0, intervalo=1.0, envios_por_segundo=None, escritor=None):
+        self.db = db
+        self._escritor = escritor or (lambda funcion, *args: funcion(*args))
+        self.emisor = emisor
+        self.tamano_lote = tamano_lote
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.intervalo = intervalo
+        self.envios_por_segundo = envios_por_segundo
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def procesar_lote(self):
+        """Envía un lote de notificaciones vencidas y registra el resultado. Devuelve cuántas procesó."""
+        pendientes = self.db.obtener_notificaciones_pendientes(self.tamano_lote)
+        if not pendientes:
+            return 0
+
+        pausa = 1.0 / self.envios_por_segundo if self.envios_por_segundo else 0
+        enviadas, fallidas = [], []
+        for id_, id_cliente, tipo, payload, intentos in pendientes:
+            try:
+                exito = self.emisor(SimpleNamespace(**payload))
+                error = None if exito else "El proveedor rechazó el envío."
+            except Exception as e:
+                exito, error = False, str(e)
+
+            if exito:
+                enviadas.append(id_)
+            else:
+                intentos += 1
+                if intentos >= self.max_intentos:
+                    registrar_error(f"Notificación {id_} ({tipo}) para {id_cliente} descartada tras {intentos} intentos: {error}")
+                    fallidas.append((id_, intentos, None, error, "muerto"))
+                else:
+                    # Espera exponencial: base, 2*base, 4*base... acotada por espera_maxima
+                    espera = min(self.espera_maxima, self.espera_base * 2 ** (intentos - 1))
+                    fallidas.append((id_, intentos, time.time() + espera, error, "pendiente"))
+            if pausa:
+                time.sleep(pausa)
+
+        self._escritor(self.db.registrar_resultado_notificaciones, enviadas, fallidas)
+        registrar_evento(f"Outbox: {len(enviadas)} notificaciones enviadas, {len(fallidas)} con fallo.")
+        return len(pendientes)
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            try:
+                procesadas = self.procesar_lote()
+            except Exception as e:
+                registrar_error(f"Error en el despachador de notificaciones: {e}")
+                procesadas = 0
+            # Si el lote vino completo se sigue drenando sin esperar
+            if procesadas < self.tamano_lote:
+                self._detener.wait(self.intervalo)
+
+    def iniciar(self):
+        """Arranca el hilo despachador (idempotente)."""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ejecutar, name="gic-outbox", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout=5.0):
+        """Solicita la detención y espera a que termine el lote en curso."""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
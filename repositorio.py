@@ -0,0 +1,141 @@
+"""
+Módulo de Repositorio - Proyecto GIC
+Acceso a clientes individuales sobre DatabaseManager con un mapa de identidad: cada cliente
+leído se guarda hidratado en una caché LRU acotada, de modo que las consultas repetidas
+(edición, verificación de duplicados) no vuelven a la base de datos.
+"""
+
+import threading
+from collections import OrderedDict
+from metricas import medir, registro
+from models import Cliente
+
+# Marca de "el ID no existe" (resultado negativo cacheado)
+_AUSENTE = object()
+
+class ClienteRepository:
+    """
+    Repositorio de clientes con mapa de identidad LRU.
+    La caché se mantiene coherente con la base escuchando los eventos de DatabaseManager:
+    las altas y ediciones reemplazan la entrada del ID afectado, las bajas la marcan como
+    ausente (en los lotes, solo para los IDs ya cacheados) y las cargas masivas vacían la
+    caché completa.
+    """
+
+    def __init__(self, db, capacidad=10000):
+        self.db = db
+        self.capacidad = capacidad
+        self._datos = OrderedDict()  # id -> Cliente o _AUSENTE
+        self._lock = threading.Lock()
+        # Cambia con cada invalidación: una lectura que se cruza con una escritura no se cachea
+        self._version = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+        db.suscribir(self._al_cambiar_db)
+
+    def cerrar(self):
+        """Deja de escuchar los cambios de la base y vacía la caché."""
+        self.db.desuscribir(self._al_cambiar_db)
+        self.limpiar()
+
+    def _al_cambiar_db(self, evento, fila):
+        with self._lock:
+            self._version += 1
+            self.invalidaciones += 1
+            if evento == "masivo":
+                self._datos.clear()
+            elif evento == "eliminado":
+                self._guardar(fila[0], _AUSENTE)
+            elif evento in ("insertado", "actualizado"):
+                # La fila del evento ya es el estado confirmado: se hidrata sin volver a la base
+                self._guardar(fila[0], Cliente.desde_fila(fila))
+            elif evento == "eliminado_lote":
+                # Solo se tocan los IDs ya cacheados, para no desalojar entradas útiles
+                for id_cliente in fila:
+                    if id_cliente in self._datos:
+                        self._datos[id_cliente] = _AUSENTE
+            elif evento == "actualizado_lote":
+                for fila_cliente in fila:
+                    if fila_cliente[0] in self._datos:
+                        self._datos[fila_cliente[0]] = Cliente.desde_fila(fila_cliente)
+            else:
+                self._datos.clear()
+
+    def _guardar(self, id_cliente, valor):
+        """Debe llamarse con el lock tomado."""
+        self._datos[id_cliente] = valor
+        self._datos.move_to_end(id_cliente)
+        while len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+            self.desalojos += 1
+
+    def _buscar_en_cache(self, id_cliente):
+        """Devuelve (True, cliente o None) si el ID está en caché; (False, None) si no."""
+        with self._lock:
+            valor = self._datos.get(id_cliente)
+            if valor is None:
+                self.fallos += 1
+                registro.contador("repositorio_fallos_total", "Consultas del repositorio que fueron a la base").incrementar()
+                return False, None
+            self._datos.move_to_end(id_cliente)
+            self.aciertos += 1
+            registro.contador("repositorio_aciertos_total", "Consultas del repositorio resueltas en caché").incrementar()
+            return True, None if valor is _AUSENTE else valor
+
+    @medir("repositorio_obtener_por_id")
+    def obtener_por_id(self, id_cliente):
+        """Devuelve el Cliente con ese ID (la misma instancia mientras siga en caché) o None si no existe."""
+        encontrado, cliente = self._buscar_en_cache(id_cliente)
+        if encontrado:
+            return cliente
+        version = self._version
+        fila = self.db.obtener_por_id(id_cliente)
+        cliente = Cliente.desde_fila(fila) if fila is not None else None
+        with self._lock:
+            if version == self._version:
+                self._guardar(id_cliente, _AUSENTE if cliente is None else cliente)
+        return cliente
+
+    @medir("repositorio_obtener_muchos")
+    def obtener_muchos(self, ids):
+        """
+        Devuelve {id: Cliente} con los IDs que existen. Los ausentes en caché se leen
+        con una única consulta por bloque.
+        """
+        resultado, faltantes = {}, []
+        for id_cliente in dict.fromkeys(ids):
+            encontrado, cliente = self._buscar_en_cache(id_cliente)
+            if not encontrado:
+                faltantes.append(id_cliente)
+            elif cliente is not None:
+                resultado[id_cliente] = cliente
+        if faltantes:
+            version = self._version
+            leidos = {fila[0]: Cliente.desde_fila(fila) for fila in self.db.obtener_por_ids(faltantes)}
+            resultado.update(leidos)
+            with self._lock:
+                if version == self._version:
+                    for id_cliente in faltantes:
+                        self._guardar(id_cliente, leidos.get(id_cliente, _AUSENTE))
+        return resultado
+
+    def existe(self, id_cliente):
+        """Indica si el ID está registrado (los IDs inexistentes también quedan en caché)."""
+        return self.obtener_por_id(id_cliente) is not None
+
+    def limpiar(self):
+        """Vacía la caché y reinicia los contadores."""
+        with self._lock:
+            self._version += 1
+            self._datos.clear()
+            self.aciertos = self.fallos = self.desalojos = self.invalidaciones = 0
+
+    def estadisticas(self):
+        """Contadores de uso de la caché, incluida la tasa de aciertos (0 a 1)."""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "desalojos": self.desalojos,
+                    "invalidaciones": self.invalidaciones, "tamano": len(self._datos),
+                    "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None}
@@ -0,0 +1,248 @@
+"""
+Módulo de Respaldos - Proyecto GIC
+Respaldos completos e incrementales de la base de clientes:
+
+* snapshot(): copia consistente de la base completa con la API de backup de SQLite. En modo WAL
+  la copia se lee dentro de una transacción de lectura, por lo que no bloquea a los escritores.
+* exportar_incremental(): escribe solo los clientes que cambiaron (altas, ediciones y bajas)
+  desde un checkpoint, a partir del historial 'clientes_cambios' que alimentan los triggers.
+* restaurar(): reconstruye una base aplicando el último snapshot y, en orden, sus deltas.
+
+Los archivos y el manifiesto que los encadena se guardan en un directorio de respaldos.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import time
+from database import DatabaseManager
+from logger import ms_desde, registrar_evento, registrar_error
+from metricas import medir
+
+DIRECTORIO = "respaldos"
+MANIFIESTO = "manifiesto.json"
+TAMANO_BLOQUE = 1000  # Filas leídas por fetchmany al exportar y aplicadas por executemany al restaurar
+COLUMNAS = ("id", "nombre", "email", "telefono", "tipo", "descuento", "empresa", "created_at", "updated_at")
+
+# Reaplica el estado exportado conservando las marcas de tiempo originales
+SQL_RESTAURAR = f"""INSERT INTO clientes ({", ".join(COLUMNAS)}) VALUES ({", ".join("?" * len(COLUMNAS))})
+                    ON CONFLICT(id) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in COLUMNAS[1:])}"""
+SQL_CAMBIOS = f"""SELECT h.id, {", ".join(f"c.{columna}" for columna in COLUMNAS[1:])}, c.id IS NOT NULL
+                  FROM (SELECT DISTINCT id FROM clientes_cambios WHERE seq > ? AND seq <= ?) h
+                  LEFT JOIN clientes c ON c.id = h.id"""
+
+def _ultimo_seq(conn):
+    """Último número de cambio asignado (sqlite_sequence lo conserva aunque el historial se purgue)."""
+    fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'clientes_cambios'").fetchone()
+    return fila[0] if fila else 0
+
+def _abrir_delta(ruta, modo):
+    if ruta.endswith(".gz"):
+        return gzip.open(ruta, modo + "t", encoding="utf-8")
+    return open(ruta, modo, encoding="utf-8")
+
+class GestorRespaldos:
+    """
+    Respaldos de un DatabaseManager en 'directorio'. El manifiesto registra el snapshot vigente
+    (con el número de cambio que incluye) y la cadena de deltas que lo continúan.
+    """
+
+    def __init__(self, db, directorio=DIRECTORIO):
+        self.db = db
+        self.directorio = directorio
+
+    # --- Manifiesto ---
+
+    def manifiesto(self):
+        """Contenido del manifiesto: {'snapshot': {...} o None, 'deltas': [...]}."""
+        ruta = os.path.join(self.directorio, MANIFIESTO)
+        if not os.path.exists(ruta):
+            return {"snapshot": None, "deltas": []}
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _guardar_manifiesto(self, manifiesto):
+        ruta = os.path.join(self.directorio, MANIFIESTO)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+        os.replace(ruta + ".tmp", ruta)  # Reemplazo atómico: nunca queda a medio escribir
+
+    def _conectar_origen(self):
+        # Conexión propia: la del hilo puede estar dentro de una transacción de escritura
+        return sqlite3.connect(self.db.db_name, timeout=self.db.timeout, isolation_level=None)
+
+    # --- Snapshot completo ---
+
+    @medir("respaldo_snapshot")
+    def snapshot(self, purgar_historial=True):
+        """
+        Copia la base completa a '<directorio>/snapshot_<seq>.db' y la registra como punto de
+        partida de los deltas siguientes. Con purgar_historial=True se eliminan del historial los
+        cambios ya incluidos en la copia. Devuelve {'ruta', 'seq', 'bytes'} o None si falló.
+        """
+        inicio = time.perf_counter()
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = os.path.join(self.directorio, "snapshot.tmp")
+        try:
+            origen = self._conectar_origen()
+            destino = sqlite3.connect(temporal)
+            try:
+                # Un solo paso: la copia entera sale de la misma transacción de lectura (consistente).
+                # Por pasos, cada escritura ajena reiniciaría la copia y podría no terminar nunca.
+                origen.backup(destino)
+                seq = _ultimo_seq(destino)
+            finally:
+                destino.close()
+                origen.close()
+            nombre = f"snapshot_{seq:012d}.db"
+            os.replace(temporal, os.path.join(self.directorio, nombre))
+            if purgar_historial:
+                with self.db.transaccion() as conn:
+                    conn.execute("DELETE FROM clientes_cambios WHERE seq <= ?", (seq,))
+            self._guardar_manifiesto({"snapshot": {"ruta": nombre, "seq": seq, "creado": time.time()}, "deltas": []})
+            resumen = {"ruta": os.path.join(self.directorio, nombre), "seq": seq,
+                       "bytes": os.path.getsize(os.path.join(self.directorio, nombre))}
+            registrar_evento(f"Snapshot {nombre} generado ({resumen['bytes']} bytes).", operacion="snapshot",
+                             duracion_ms=ms_desde(inicio), resultado="ok", seq=seq)
+            return resumen
+        except (sqlite3.Error, OSError) as e:
+            registrar_error(f"Error al generar el snapshot: {e}", operacion="snapshot", resultado="error")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return None
+
+    # --- Deltas ---
+
+    @medir("respaldo_exportar_incremental")
+    def exportar_incremental(self, desde_checkpoint=None, comprimir=False):
+        """
+        Escribe en JSON Lines los clientes modificados desde 'desde_checkpoint' (por defecto, el
+        final de la cadena del manifiesto): una línea {'op': 'upsert', 'cliente': {...}} con el
+        estado actual de cada alta o edición y {'op': 'delete', 'id': ...} por cada baja.
+        Devuelve {'ruta', 'desde', 'hasta', 'filas'}; 'hasta' es el checkpoint de la próxima
+        exportación. Sin cambios no se crea archivo (ruta None). Devuelve None si la lectura falló.
+        """
+        inicio = time.perf_counter()
+        manifiesto = self.manifiesto()
+        snapshot = manifiesto["snapshot"]
+        fin_cadena = manifiesto["deltas"][-1]["hasta"] if manifiesto["deltas"] else snapshot and snapshot["seq"]
+        desde = fin_cadena if desde_checkpoint is None else desde_checkpoint
+        if desde is None:
+            raise ValueError("No hay snapshot de partida: genere primero un respaldo completo.")
+        if snapshot and desde < snapshot["seq"]:
+            raise ValueError(f"El historial anterior al snapshot ({snapshot['seq']}) fue purgado.")
+
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = os.path.join(self.directorio, "delta.tmp")
+        origen = self._conectar_origen()
+        try:
+            # Checkpoint y filas se leen en la misma transacción: el delta es un estado consistente
+            origen.execute("BEGIN")
+            hasta = _ultimo_seq(origen)
+            filas = 0
+            if hasta > desde:
+                cursor = origen.execute(SQL_CAMBIOS, (desde, hasta))
+                with _abrir_delta(temporal + (".gz" if comprimir else ""), "w") as salida:
+                    salida.write(json.dumps({"formato": "gic-delta", "desde": desde, "hasta": hasta}) + "\n")
+                    while True:
+                        bloque = cursor.fetchmany(TAMANO_BLOQUE)
+                        if not bloque:
+                            break
+                        for *valores, existe in bloque:
+                            registro = ({"op": "upsert", "cliente": dict(zip(COLUMNAS, valores))} if existe
+                                        else {"op": "delete", "id": valores[0]})
+                            salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                        filas += len(bloque)
+            origen.execute("COMMIT")
+        except (sqlite3.Error, OSError) as e:
+            registrar_error(f"Error en el respaldo incremental: {e}", operacion="exportar_incremental",
+                            resultado="error")
+            for ruta in (temporal, temporal + ".gz"):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            return None
+        finally:
+            origen.close()
+
+        ruta = None
+        if filas:
+            nombre = f"delta_{desde:012d}_{hasta:012d}.jsonl" + (".gz" if comprimir else "")
+            ruta = os.path.join(self.directorio, nombre)
+            os.replace(temporal + (".gz" if comprimir else ""), ruta)
+            if desde == fin_cadena:  # Solo los deltas que continúan la cadena sirven para restaurar
+                manifiesto["deltas"].append({"ruta": nombre, "desde": desde, "hasta": hasta, "filas": filas})
+                self._guardar_manifiesto(manifiesto)
+        registrar_evento(f"Respaldo incremental {desde} -> {hasta}: {filas} clientes.", operacion="exportar_incremental",
+                         filas=filas, duracion_ms=ms_desde(inicio), resultado="ok")
+        return {"ruta": ruta, "desde": desde, "hasta": hasta, "filas": filas}
+
+    # --- Restauración ---
+
+    @medir("respaldo_restaurar")
+    def restaurar(self, destino, hasta=None):
+        """
+        Crea la base 'destino' (no debe existir) con el snapshot del manifiesto y le aplica en
+        orden sus deltas, hasta el checkpoint 'hasta' si se indica. Lanza ValueError si falta el
+        snapshot o la cadena de deltas tiene huecos. Devuelve {'seq', 'deltas'}.
+        La base restaurada lleva su propio historial: conviene tomarle un snapshot nuevo.
+        """
+        if os.path.exists(destino):
+            raise ValueError(f"La base de destino {destino} ya existe.")
+        manifiesto = self.manifiesto()
+        if manifiesto["snapshot"] is None:
+            raise ValueError(f"No hay snapshot en {self.directorio}.")
+        inicio = time.perf_counter()
+        seq = manifiesto["snapshot"]["seq"]
+        temporal = destino + ".restaurando"
+        origen = sqlite3.connect(os.path.join(self.directorio, manifiesto["snapshot"]["ruta"]))
+        copia = sqlite3.connect(temporal)
+        try:
+            origen.backup(copia)
+        finally:
+            copia.close()
+            origen.close()
+
+        aplicados = 0
+        db = DatabaseManager(temporal)
+        try:
+            for delta in manifiesto["deltas"]:
+                if hasta is not None and delta["hasta"] > hasta:
+                    break
+                if delta["desde"] != seq:
+                    raise ValueError(f"Falta el respaldo incremental de los cambios {seq} a {delta['desde']}.")
+                self._aplicar_delta(db, os.path.join(self.directorio, delta["ruta"]))
+                seq = delta["hasta"]
+                aplicados += 1
+        except Exception:
+            db.close()
+            for ruta in (temporal, temporal + "-wal", temporal + "-shm"):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            raise
+        db.close()
+        os.replace(temporal, destino)
+        registrar_evento(f"Base {destino} restaurada hasta el cambio {seq} ({aplicados} deltas).", operacion="restaurar",
+                         duracion_ms=ms_desde(inicio), resultado="ok", seq=seq)
+        return {"seq": seq, "deltas": aplicados}
+
+    @staticmethod
+    def _aplicar_delta(db, ruta):
+        """Aplica un delta en una sola transacción: o se aplica completo o no se aplica."""
+        with _abrir_delta(ruta, "r") as entrada, db.transaccion() as conn:
+            encabezado = json.loads(next(entrada))
+            if encabezado.get("formato") != "gic-delta":
+                raise ValueError(f"{ruta} no es un respaldo incremental.")
+            upserts, bajas = [], []
+            for linea in entrada:
+                registro = json.loads(linea)
+                if registro["op"] == "upsert":
+                    upserts.append(tuple(registro["cliente"][c] for c in COLUMNAS))
+                else:
+                    bajas.append((registro["id"],))
+                if len(upserts) + len(bajas) >= TAMANO_BLOQUE:
+                    conn.executemany(SQL_RESTAURAR, upserts)
+                    conn.executemany(db.SQL_ELIMINAR, bajas)
+                    upserts, bajas = [], []
+            conn.executemany(SQL_RESTAURAR, upserts)
+            conn.executemany(db.SQL_ELIMINAR, bajas)
@@ -3,8 +3,16 @@ Módulo de Servicios Externos - Proyecto GIC
 Este módulo cumple con la integración de APIs para validación y notificaciones.
 """
 
+import threading
 import time
-from logger import registrar_evento, registrar_error
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logger import ms_desde, registrar_evento, registrar_error
+from metricas import medir, registro
+
+# Latencias simuladas de los servicios externos (en segundos)
+LATENCIA_IDENTIDAD = 0.5
+LATENCIA_NOTIFICACION = 0.3
 
 class ServicioExternoError(Exception):
     """
@@ -13,34 +21,153 @@ class ServicioExternoError(Exception):
     """
     pass
 
+class CacheTTL:
+    """
+    Caché LRU acotada con expiración por entrada, segura entre hilos.
+    Los resultados negativos se guardan con un TTL propio (normalmente más corto)
+    para no repetir consultas fallidas sin fijarlas durante demasiado tiempo.
+    """
+
+    def __init__(self, capacidad=10000, ttl=300.0, ttl_negativo=60.0, reloj=time.monotonic):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._reloj = reloj
+        self._datos = OrderedDict()  # clave -> (valor, vence)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expiraciones = 0
+
+    def obtener(self, clave):
+        """Devuelve (True, valor) si la clave está vigente en caché, o (False, None) si no."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, vence = entrada
+                if vence > self._reloj():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+                self.expiraciones += 1
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor):
+        """Almacena un resultado; si se supera la capacidad se desaloja el menos usado."""
+        ttl = self.ttl if valor else self.ttl_negativo
+        with self._lock:
+            self._datos[clave] = (valor, self._reloj() + ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def limpiar(self):
+        """Vacía la caché y reinicia los contadores."""
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = self.fallos = self.desalojos = self.expiraciones = 0
+
+    def estadisticas(self):
+        """Contadores de uso de la caché."""
+        with self._lock:
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "desalojos": self.desalojos,
+                    "expiraciones": self.expiraciones, "tamano": len(self._datos)}
+
+# Caché compartida de resultados de la API de identidad
+cache_identidad = CacheTTL()
+
+def _consultar_api_identidad(ids):
+    """
+    Simula una petición a la API de identidad que valida varios IDs en un solo viaje de red.
+    Devuelve un diccionario {id: es_valido}.
+    """
+    # Simulación de latencia de red (tiempo de respuesta del servidor externo)
+    time.sleep(LATENCIA_IDENTIDAD)
+    # Simulación de la respuesta lógica del servidor (suponemos éxito para este caso)
+    return {id_cliente: True for id_cliente in ids}
+
+@medir("servicio_identidad")
 def validar_identidad_api(id_cliente):
     """
     Simula la integración con una API de validación de identidad oficial.
     Este paso es un requisito de seguridad antes de persistir cualquier dato.
+    Los resultados se reutilizan desde la caché mientras sigan vigentes.
     """
     try:
-        # Registro en log del inicio de la petición externa
-        registrar_evento(f"Consultando API de identidad para ID: {id_cliente}...")
-        
-        # Simulación de latencia de red (tiempo de respuesta del servidor externo)
-        time.sleep(0.5) 
-        
         # Validación de integridad de los parámetros de entrada
         if not id_cliente:
             raise ServicioExternoError("ID de cliente vacío o nulo.")
 
-        # Simulación de la respuesta lógica del servidor (suponemos éxito para este caso)
-        es_valido = True 
+        encontrado, es_valido = cache_identidad.obtener(id_cliente)
+        registro.contador("identidad_cache_aciertos_total" if encontrado else "identidad_cache_fallos_total",
+                          "Consultas de identidad resueltas desde caché" if encontrado
+                          else "Consultas de identidad que requirieron la API").incrementar()
+        if encontrado:
+            registrar_evento(f"Identidad de ID {id_cliente} obtenida de caché: {'Válido' if es_valido else 'Inválido'}",
+                             operacion="validar_identidad", id_cliente=id_cliente, resultado="cache")
+            return es_valido
+
+        # Registro en log del inicio de la petición externa
+        registrar_evento(f"Consultando API de identidad para ID: {id_cliente}...")
+        inicio = time.perf_counter()
+        es_valido = _consultar_api_identidad([id_cliente])[id_cliente]
+        cache_identidad.guardar(id_cliente, es_valido)
         
         # Trazabilidad del resultado obtenido de la API
-        registrar_evento(f"Resultado API Identidad: {'Válido' if es_valido else 'Inválido'}")
+        registrar_evento(f"Resultado API Identidad: {'Válido' if es_valido else 'Inválido'}",
+                         operacion="validar_identidad", id_cliente=id_cliente,
+                         duracion_ms=ms_desde(inicio),
+                         resultado="valido" if es_valido else "invalido")
         return es_valido
 
     except Exception as e:
         # En caso de fallo de conexión o timeout, se registra el error y se escala la excepción
-        registrar_error(f"Fallo en conexión con API de Identidad: {e}")
+        registrar_error(f"Fallo en conexión con API de Identidad: {e}", operacion="validar_identidad",
+                        id_cliente=id_cliente, resultado="error")
         raise ServicioExternoError(f"No se pudo validar la identidad: {e}")
 
+@medir("servicio_identidades_lote")
+def validar_identidades_lote(ids, tamano_lote=100, max_concurrencia=8):
+    """
+    Valida muchos IDs agrupándolos en peticiones de 'tamano_lote' IDs, con como máximo
+    'max_concurrencia' peticiones simultáneas. Solo se consultan los IDs ausentes en caché.
+    Los IDs vacíos se informan como inválidos sin consultar la API.
+    Devuelve un diccionario {id: es_valido}.
+    """
+    resultados = {}
+    pendientes = []
+    for id_cliente in dict.fromkeys(ids):  # Elimina repetidos conservando el orden
+        if not id_cliente:
+            resultados[id_cliente] = False
+            continue
+        encontrado, es_valido = cache_identidad.obtener(id_cliente)
+        if encontrado:
+            resultados[id_cliente] = es_valido
+        else:
+            pendientes.append(id_cliente)
+
+    lotes = [pendientes[i:i + tamano_lote] for i in range(0, len(pendientes), tamano_lote)]
+    if lotes:
+        try:
+            with ThreadPoolExecutor(max_workers=min(max_concurrencia, len(lotes))) as pool:
+                for respuesta in pool.map(_consultar_api_identidad, lotes):
+                    for id_cliente, es_valido in respuesta.items():
+                        cache_identidad.guardar(id_cliente, es_valido)
+                        resultados[id_cliente] = es_valido
+        except Exception as e:
+            registrar_error(f"Fallo en validación masiva de identidades: {e}")
+            raise ServicioExternoError(f"No se pudo validar el lote de identidades: {e}")
+
+    registrar_evento(f"Validación masiva: {len(resultados)} IDs, {len(pendientes)} consultados a la API "
+                     f"en {len(lotes)} peticiones, {len(resultados) - len(pendientes)} resueltos sin consulta.",
+                     operacion="validar_identidades_lote", filas=len(resultados), resultado="ok")
+    return resultados
+
+@medir("servicio_notificacion_bienvenida")
 def enviar_notificacion_bienvenida(cliente):
     """
     Simula el envío automatizado de correos electrónicos tras un registro exitoso.
@@ -54,15 +181,19 @@ def enviar_notificacion_bienvenida(cliente):
         registrar_evento(f"Intentando enviar email de bienvenida a: {cliente.email}")
         
         # Simulación de respuesta de una API REST de mensajería (ej. SendGrid o Mailchimp)
-        time.sleep(0.3)
+        time.sleep(LATENCIA_NOTIFICACION)
         
         # Registro del éxito de la operación con datos del objeto cliente
         log_exito = f"API NOTIFICACIÓN: Email enviado exitosamente a {cliente.nombre} ({cliente.email})"
-        registrar_evento(log_exito)
+        registrar_evento(log_exito, operacion="notificacion_bienvenida",
+                         id_cliente=getattr(cliente, 'id_cliente', None), resultado="ok")
         
         return True
 
     except Exception as e:
         # El fallo en notificaciones se registra pero no detiene el flujo principal del programa
-        registrar_error(f"Error en servicio de notificaciones: {e}")
-        return False
\ No newline at end of file
+        registro.contador("servicio_notificacion_bienvenida_fallos_total",
+                          "Notificaciones de bienvenida no entregadas").incrementar()
+        registrar_error(f"Error en servicio de notificaciones: {e}", operacion="notificacion_bienvenida",
+                        id_cliente=getattr(cliente, 'id_cliente', None), resultado="error")
+        return False
@@ -0,0 +1,719 @@
+"""
+Módulo de Servidor - Proyecto GIC
+Servicio HTTP/JSON local (solo biblioteca estándar, asyncio) que es el único dueño del archivo
+SQLite, para que varios puestos trabajen sobre la misma base sin errores "database is locked":
+
+* Las lecturas corren en un pool de hilos, cada uno con su conexión (lectores concurrentes en WAL).
+* Las escrituras pasan por una única cola: el escritor toma todas las pendientes y las confirma
+  juntas en una sola transacción (group commit), cada una en su SAVEPOINT para que el fallo de
+  una no afecte a las demás. Las respuestas se envían recién tras el commit.
+* Los cambios confirmados se publican en /eventos (long polling) para refrescar a los clientes.
+
+ClienteRemoto ofrece la misma interfaz que DatabaseManager sobre HTTP, de modo que GIC_App
+puede usar el servidor en lugar del archivo:
+
+    GIC_TOKEN=secreto python main.py serve --puerto 8765
+    GIC_SERVIDOR=http://127.0.0.1:8765 GIC_TOKEN=secreto python main.py
+"""
+
+import asyncio
+import hmac
+import http.client
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+from database import ResultadoFila
+from duplicados import DetectorDuplicados
+from logger import registrar_evento, registrar_error
+from metricas import cronometro, medir, registro
+from models import Cliente
+from notificaciones import DespachadorNotificaciones
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+LECTORES = 8                # Hilos del pool de lecturas
+MAX_GRUPO = 256             # Escrituras confirmadas como máximo en un mismo commit
+MAX_COLA_ESCRITURA = 10000  # Con la cola llena se responde 503 en lugar de acumular memoria
+MAX_CUERPO = 64 * 1024 * 1024
+MAX_EVENTOS = 5000          # Eventos recientes que se conservan para los clientes de /eventos
+ESPERA_EVENTOS = 5.0        # Segundos que /eventos retiene la petición si no hay novedades
+DIRECTORIO_EXPORTACION = "exportaciones"  # Destino de /exportar en el equipo del servidor
+RUTAS_PUBLICAS = ("/salud", "/metricas")  # Únicas rutas que no exigen el token (sin datos de clientes)
+
+ESTADOS_HTTP = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+                500: "Internal Server Error", 503: "Service Unavailable"}
+
+class ErrorRemoto(Exception):
+    """Fallo del servidor (5xx) o de la comunicación con él."""
+
+def cliente_a_registro(cliente):
+    """Diccionario con las columnas de Cliente.desde_registro para enviar un cliente por la red."""
+    return {"id": cliente.id_cliente, "nombre": cliente.nombre, "email": cliente.email,
+            "telefono": cliente.telefono, "tipo": type(cliente).__name__,
+            "descuento": getattr(cliente, "descuento", None), "empresa": getattr(cliente, "empresa", None)}
+
+class ServidorGIC:
+    """
+    Servidor HTTP/JSON sobre un DatabaseManager. Con notificaciones=True despacha el outbox
+    y con duplicados=True verifica los duplicados de cada alta, como haría GIC_App en local.
+    Las exportaciones se escriben siempre en 'directorio_exportacion': los clientes no eligen rutas.
+    Toda petición que modifica (POST, PUT, DELETE) debe enviar JSON y el token compartido en la
+    cabecera Authorization ("Bearer <token>"); sin token se genera uno aleatorio al crear el servidor.
+    """
+
+    def __init__(self, db, host=HOST, puerto=PUERTO, lectores=LECTORES, max_grupo=MAX_GRUPO,
+                 notificaciones=True, duplicados=True, directorio_exportacion=DIRECTORIO_EXPORTACION, token=None):
+        self.db = db
+        self.token = token or secrets.token_urlsafe(24)
+        self.host = host
+        self.puerto = puerto
+        self.max_grupo = max_grupo
+        self.directorio_exportacion = directorio_exportacion
+        self._lectores = ThreadPoolExecutor(max_workers=lectores, thread_name_prefix="gic-lector")
+        # Un solo hilo escritor: todas las escrituras usan la misma conexión, una tras otra
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gic-escritor")
+        # La verificación de duplicados y el outbox también escriben a través de la cola
+        self.detector = DetectorDuplicados(db, escritor=self._encargar_escritura) if duplicados else None
+        self.despachador = (DespachadorNotificaciones(db, escritor=self._escribir_desde_hilo)
+                            if notificaciones else None)
+        self._eventos = deque(maxlen=MAX_EVENTOS)
+        self._ultimo_evento = 0
+        self._loop = None
+        self._servidor = None
+        self._listo = threading.Event()
+        self._rutas = [(metodo, re.compile(patron), getattr(self, nombre)) for metodo, patron, nombre in (
+            ("GET", r"/salud$", "_salud"),
+            ("GET", r"/clientes$", "_pagina"),
+            ("POST", r"/clientes$", "_crear"),
+            ("POST", r"/clientes/lote$", "_lote"),
+            ("POST", r"/clientes/consulta$", "_por_ids"),
+            ("POST", r"/clientes/eliminar$", "_eliminar_lote"),
+            ("POST", r"/clientes/tipo$", "_cambiar_tipo_lote"),
+            ("GET", r"/clientes/(?P<id_cliente>[^/]+)$", "_obtener"),
+            ("PUT", r"/clientes/(?P<id_cliente>[^/]+)$", "_actualizar"),
+            ("DELETE", r"/clientes/(?P<id_cliente>[^/]+)$", "_eliminar"),
+            ("GET", r"/buscar$", "_buscar"),
+            ("GET", r"/estadisticas$", "_estadisticas"),
+            ("POST", r"/estadisticas/verificar$", "_verificar_estadisticas"),
+            ("POST", r"/exportar$", "_exportar"),
+            ("GET", r"/eventos$", "_eventos_desde"),
+            ("GET", r"/duplicados$", "_duplicados"),
+            ("POST", r"/duplicados/analizar$", "_analizar_duplicados"),
+            ("POST", r"/duplicados/resolver$", "_resolver_duplicado"),
+            ("GET", r"/metricas$", "_metricas"),
+        )]
+
+    # --- Ciclo de vida ---
+
+    async def _servir(self):
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue(MAX_COLA_ESCRITURA)
+        self._hay_eventos = asyncio.Event()
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]  # Puerto real si se pidió el 0
+        self.db.suscribir(self._al_cambiar_db)
+        if self.detector is not None:
+            self.detector.iniciar_incremental()
+        if self.despachador is not None:
+            self.despachador.iniciar()
+        escritor = asyncio.create_task(self._escribir_grupos())
+        registrar_evento(f"Servidor GIC escuchando en http://{self.host}:{self.puerto}", operacion="servidor",
+                         resultado="iniciado")
+        self._listo.set()
+        try:
+            async with self._servidor:
+                await self._servidor.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # El despachador se detiene mientras el escritor sigue activo: su último lote pasa por la cola
+            if self.despachador is not None:
+                await self._loop.run_in_executor(None, self.despachador.detener)
+            # Las escrituras ya encoladas se confirman antes de cerrar
+            await self._cola.put(None)
+            await escritor
+            self.db.desuscribir(self._al_cambiar_db)
+            if self.detector is not None:
+                self.detector.detener_incremental()
+            self._lectores.shutdown(wait=False, cancel_futures=True)
+            self._escritor.shutdown(wait=True)
+            registrar_evento("Servidor GIC detenido.", operacion="servidor", resultado="detenido")
+
+    def ejecutar(self):
+        """Atiende peticiones en el hilo actual hasta detener() o Ctrl+C."""
+        try:
+            asyncio.run(self._servir())
+        except KeyboardInterrupt:
+            pass
+
+    def iniciar_en_segundo_plano(self, espera=10.0):
+        """Atiende peticiones en un hilo aparte; vuelve cuando el servidor ya acepta conexiones."""
+        hilo = threading.Thread(target=self.ejecutar, name="gic-servidor", daemon=True)
+        hilo.start()
+        if not self._listo.wait(espera):
+            raise ErrorRemoto(f"El servidor no pudo iniciarse en {self.host}:{self.puerto}.")
+        return hilo
+
+    def detener(self):
+        """Deja de aceptar peticiones (se puede llamar desde cualquier hilo)."""
+        if self._loop is not None and self._servidor is not None:
+            self._loop.call_soon_threadsafe(self._servidor.close)
+
+    # --- HTTP ---
+
+    async def _atender(self, reader, writer):
+        """Atiende una conexión; con HTTP/1.1 la conexión se reutiliza para varias peticiones."""
+        try:
+            while True:
+                try:
+                    cabecera = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lineas = cabecera.decode("latin-1").split("\r\n")
+                try:
+                    metodo, objetivo, version = lineas[0].split(" ", 2)
+                except ValueError:
+                    return
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    nombre, _, valor = linea.partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                # Las peticiones rechazadas se responden y se cierran sin leer su cuerpo; sin una
+                # longitud válida tampoco se sabe dónde termina
+                rechazo = self._rechazo(metodo, objetivo, cabeceras)
+                if rechazo is not None:
+                    await self._responder(writer, *rechazo, False)
+                    return
+                longitud = cabeceras.get("content-length") or "0"
+                if not (longitud.isascii() and longitud.isdigit()):
+                    await self._responder(writer, 400, {"error": "Content-Length inválido."}, False)
+                    return
+                longitud = int(longitud)
+                if longitud > MAX_CUERPO:
+                    await self._responder(writer, 413, {"error": "Cuerpo demasiado grande."}, False)
+                    return
+                cuerpo = await reader.readexactly(longitud) if longitud else b""
+                with cronometro("servidor_peticion"):
+                    estado, datos = await self._despachar(metodo, objetivo, cuerpo)
+                mantener = version == "HTTP/1.1" and cabeceras.get("connection", "").lower() != "close"
+                await self._responder(writer, estado, datos, mantener)
+                if not mantener:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # Cliente desconectado, o conexión abierta (p. ej. en /eventos) al detener el servidor
+        finally:
+            writer.close()
+
+    def _rechazo(self, metodo, objetivo, cabeceras):
+        """
+        Todas las rutas salvo RUTAS_PUBLICAS exigen el token compartido (los datos de los clientes no
+        se leen sin él) y las que modifican, además, cuerpo JSON: (estado, datos) o None.
+        """
+        if metodo == "GET" and urlsplit(objetivo).path in RUTAS_PUBLICAS:
+            return None
+        esquema, _, token = cabeceras.get("authorization", "").partition(" ")
+        if esquema.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            return 401, {"error": "Token ausente o inválido."}
+        if metodo != "GET" and cabeceras.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            return 415, {"error": "Se requiere Content-Type: application/json."}
+        return None
+
+    @staticmethod
+    async def _responder(writer, estado, datos, mantener):
+        if isinstance(datos, str):
+            contenido, tipo = datos.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            contenido, tipo = json.dumps(datos, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        writer.write(f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}\r\nContent-Type: {tipo}\r\n"
+                     f"Content-Length: {len(contenido)}\r\nConnection: {'keep-alive' if mantener else 'close'}\r\n\r\n"
+                     .encode("latin-1") + contenido)
+        await writer.drain()
+
+    async def _despachar(self, metodo, objetivo, cuerpo):
+        """Busca la ruta y traduce las excepciones a códigos HTTP: (estado, datos)."""
+        partes = urlsplit(objetivo)
+        parametros = dict(parse_qsl(partes.query))
+        metodo_valido = False
+        for metodo_ruta, patron, manejador in self._rutas:
+            coincidencia = patron.match(partes.path)
+            if not coincidencia:
+                continue
+            if metodo_ruta != metodo:
+                metodo_valido = True
+                continue
+            try:
+                datos = json.loads(cuerpo) if cuerpo else {}
+                argumentos = {k: unquote(v) for k, v in coincidencia.groupdict().items()}
+                return await manejador(parametros, datos, **argumentos)
+            except (ValueError, KeyError, TypeError) as e:
+                # Datos inválidos (incluidas las validaciones de models.py) o el ID ya registrado
+                return 400, {"error": str(e)}
+            except sqlite3.Error as e:
+                return 503, {"error": f"Error de base de datos: {e}"}
+            except Exception as e:
+                registrar_error(f"Error en {metodo} {partes.path}: {e}", operacion="servidor", resultado="error")
+                return 500, {"error": str(e)}
+        if metodo_valido:
+            return 405, {"error": f"Método {metodo} no permitido en {partes.path}."}
+        return 404, {"error": f"Ruta inexistente: {partes.path}"}
+
+    # --- Lecturas y escrituras ---
+
+    def _leer(self, funcion, *args, **kwargs):
+        return self._loop.run_in_executor(self._lectores, partial(funcion, *args, **kwargs))
+
+    async def _escribir(self, funcion, *args, **kwargs):
+        """Encola una escritura y espera a que su grupo se confirme."""
+        futuro = self._loop.create_future()
+        try:
+            self._cola.put_nowait((partial(funcion, *args, **kwargs), futuro))
+        except asyncio.QueueFull:
+            raise sqlite3.OperationalError("Cola de escritura llena, reintente en unos instantes.")
+        return await futuro
+
+    def _escribir_desde_hilo(self, funcion, *args):
+        """Escritura desde otro hilo (p. ej. el despachador): pasa por la cola y espera su commit."""
+        return asyncio.run_coroutine_threadsafe(self._escribir(funcion, *args), self._loop).result()
+
+    def _encargar_escritura(self, funcion, *args):
+        """
+        Encola una escritura sin esperarla. Se usa desde los observadores de cambios, que corren
+        en el propio hilo escritor: esperar ahí bloquearía la cola.
+        """
+        self._loop.call_soon_threadsafe(self._encolar_encargo, partial(funcion, *args))
+
+    def _encolar_encargo(self, funcion):
+        futuro = self._loop.create_future()
+        try:
+            self._cola.put_nowait((funcion, futuro))
+        except asyncio.QueueFull:
+            registrar_error("Cola de escritura llena: se descartó una escritura auxiliar.", operacion="servidor",
+                            resultado="descartado")
+            return
+        futuro.add_done_callback(self._al_terminar_encargo)
+
+    @staticmethod
+    def _al_terminar_encargo(futuro):
+        if not futuro.cancelled() and futuro.exception() is not None:
+            registrar_error(f"Falló una escritura auxiliar: {futuro.exception()}", operacion="servidor",
+                            resultado="error")
+
+    async def _escribir_grupos(self):
+        """Tarea del escritor: agrupa las escrituras pendientes y las confirma en un solo commit."""
+        while True:
+            primera = await self._cola.get()
+            if primera is None:
+                return
+            grupo = [primera]
+            while len(grupo) < self.max_grupo and not self._cola.empty():
+                siguiente = self._cola.get_nowait()
+                if siguiente is None:
+                    self._cola.put_nowait(None)  # Se procesa el grupo actual y luego se termina
+                    break
+                grupo.append(siguiente)
+            resultados = await self._loop.run_in_executor(self._escritor, self._aplicar_grupo, grupo)
+            for futuro, resultado, error in resultados:
+                if futuro.cancelled():
+                    continue
+                if error is None:
+                    futuro.set_result(resultado)
+                else:
+                    futuro.set_exception(error)
+
+    def _aplicar_grupo(self, grupo):
+        """Se ejecuta en el hilo escritor: cada operación en su SAVEPOINT dentro de una única transacción."""
+        resultados = []
+        try:
+            with self.db.transaccion():
+                for funcion, futuro in grupo:
+                    try:
+                        resultados.append((futuro, funcion(), None))
+                    except Exception as e:
+                        resultados.append((futuro, None, e))
+        except sqlite3.Error as e:
+            registrar_error(f"Falló el commit de un grupo de {len(grupo)} escrituras: {e}", operacion="servidor",
+                            filas=len(grupo), resultado="error")
+            return [(futuro, None, e) for _, futuro in grupo]
+        # Escrituras por commit = servidor_escrituras_total / servidor_commits_total
+        registro.contador("servidor_commits_total", "Transacciones del escritor del servidor").incrementar()
+        registro.contador("servidor_escrituras_total", "Escrituras confirmadas por el servidor").incrementar(len(grupo))
+        return resultados
+
+    # --- Eventos de cambio ---
+
+    def _al_cambiar_db(self, evento, fila):
+        # Se invoca en el hilo que confirmó la escritura: el evento se publica desde el bucle
+        self._loop.call_soon_threadsafe(self._publicar_evento, evento, fila)
+
+    def _publicar_evento(self, evento, fila):
+        self._ultimo_evento += 1
+        self._eventos.append((self._ultimo_evento, evento, fila))
+        self._hay_eventos.set()
+        self._hay_eventos = asyncio.Event()
+
+    async def _eventos_desde(self, parametros, datos):
+        """
+        Eventos posteriores a 'desde'. Sin novedades retiene la petición hasta 'espera' segundos.
+        Con desde=-1 solo informa el último número, para empezar a escuchar desde ahí.
+        """
+        desde = int(parametros.get("desde", -1))
+        if desde >= 0 and desde == self._ultimo_evento:
+            try:
+                await asyncio.wait_for(self._hay_eventos.wait(), min(float(parametros.get("espera", 0)), ESPERA_EVENTOS * 2))
+            except asyncio.TimeoutError:
+                pass
+        if desde < 0:
+            return 200, {"ultimo": self._ultimo_evento, "eventos": []}
+        if desde > self._ultimo_evento or (self._eventos and desde < self._eventos[0][0] - 1):
+            # El cliente se atrasó más que el búfer (o el servidor se reinició): debe resincronizar todo
+            return 200, {"ultimo": self._ultimo_evento, "eventos": [[self._ultimo_evento, "masivo", None]]}
+        return 200, {"ultimo": self._ultimo_evento, "eventos": [list(e) for e in self._eventos if e[0] > desde]}
+
+    # --- Rutas ---
+
+    async def _salud(self, parametros, datos):
+        return 200, {"ok": True, "base": self.db.db_name}
+
+    async def _pagina(self, parametros, datos):
+        filas = await self._leer(self.db.obtener_pagina, parametros.get("after_id"),
+                                 int(parametros.get("limit", 100)), parametros.get("orden", "asc"))
+        return 200, filas
+
+    async def _obtener(self, parametros, datos, id_cliente):
+        fila = await self._leer(self.db.obtener_por_id, id_cliente)
+        return (404, {"error": f"El cliente {id_cliente} no existe."}) if fila is None else (200, fila)
+
+    async def _por_ids(self, parametros, datos):
+        return 200, await self._leer(self.db.obtener_por_ids, datos["ids"])
+
+    async def _buscar(self, parametros, datos):
+        return 200, await self._leer(self.db.buscar, parametros.get("texto", ""), parametros.get("tipo"),
+                                     int(parametros.get("limit", 50)))
+
+    async def _estadisticas(self, parametros, datos):
+        estadisticas = await self._leer(self.db.estadisticas, int(parametros.get("empresas", 10)))
+        if estadisticas is None:
+            return 503, {"error": "No se pudieron leer las estadísticas; revise el log del servidor."}
+        return 200, {**estadisticas, "notificaciones": await self._leer(self.db.contar_notificaciones)}
+
+    async def _verificar_estadisticas(self, parametros, datos):
+        verificacion = await self._escribir(self.db.verificar_estadisticas, bool(datos.get("reconstruir")))
+        if verificacion is None:
+            return 503, {"error": "La verificación falló; revise el log del servidor."}
+        return 200, verificacion
+
+    async def _crear(self, parametros, datos):
+        cliente = Cliente.desde_registro(datos["cliente"])
+        await self._escribir(self.db.guardar_cliente, cliente, notificar=bool(datos.get("notificar")))
+        return 201, {"id": cliente.id_cliente}
+
+    async def _actualizar(self, parametros, datos, id_cliente):
+        cliente = Cliente.desde_registro({**datos["cliente"], "id": id_cliente})
+        return 200, {"actualizado": bool(await self._escribir(self.db.actualizar_cliente, cliente))}
+
+    async def _eliminar(self, parametros, datos, id_cliente):
+        if not await self._escribir(self.db.eliminar_cliente_db, id_cliente):
+            return 404, {"error": f"El cliente {id_cliente} no existe."}
+        return 200, {"eliminado": True}
+
+    async def _lote(self, parametros, datos):
+        """Valida cada registro con models.py; los inválidos se informan sin llegar a la base, en su posición."""
+        validos, invalidos = [], {}
+        for posicion, registro_cliente in enumerate(datos["clientes"]):
+            try:
+                validos.append(Cliente.desde_registro(registro_cliente))
+            except (ValueError, TypeError, AttributeError) as e:
+                id_cliente = registro_cliente.get("id") if isinstance(registro_cliente, dict) else None
+                invalidos[posicion] = ResultadoFila(id_cliente, "invalido", str(e))
+        escribir = self.db.upsert_clientes_lote if datos.get("actualizar") else self.db.guardar_clientes_lote
+        escritos = iter(await self._escribir(escribir, validos) if validos else ())
+        return 200, [list(invalidos[i] if i in invalidos else next(escritos)) for i in range(len(datos["clientes"]))]
+
+    async def _eliminar_lote(self, parametros, datos):
+        return 200, {"eliminados": await self._escribir(self.db.eliminar_clientes_lote, datos["ids"])}
+
+    async def _cambiar_tipo_lote(self, parametros, datos):
+        actualizados = await self._escribir(self.db.actualizar_tipo_lote, datos["ids"], datos["tipo"],
+                                            datos.get("descuento"), datos.get("empresa"))
+        return 200, {"actualizados": actualizados}
+
+    async def _exportar(self, parametros, datos):
+        """Exporta a los archivos fijos del directorio de exportación; solo se admite la opción 'comprimir'."""
+        os.makedirs(self.directorio_exportacion, exist_ok=True)
+        ruta_json = os.path.join(self.directorio_exportacion, "clientes_backup.jsonl")
+        ruta_csv = os.path.join(self.directorio_exportacion, "clientes_backup.csv")
+        total = await self._leer(self.db.exportar_datos, ruta_json, ruta_csv, bool(datos.get("comprimir")))
+        if total is None:
+            return 503, {"error": "La exportación falló; revise el log del servidor."}
+        return 200, {"total": total}
+
+    async def _duplicados(self, parametros, datos):
+        return 200, await self._leer(self.detector.pendientes, int(parametros.get("limite", 200)))
+
+    async def _analizar_duplicados(self, parametros, datos):
+        # Las claves se mantienen al día con cada cambio: la comparación corre como lectura y solo
+        # la grabación de los pares pasa por el escritor
+        pares = await self._leer(self.detector.calcular_pares)
+        await self._escribir(self.detector.guardar_pares, pares)
+        return 200, {"pares": len(pares)}
+
+    async def _resolver_duplicado(self, parametros, datos):
+        await self._escribir(self.detector.resolver, datos["id_a"], datos["id_b"], datos["estado"])
+        return 200, {"ok": True}
+
+    async def _metricas(self, parametros, datos):
+        return 200, registro.prometheus()
+
+def _fila_evento(evento, fila):
+    """Devuelve la fila de un evento recibido por JSON a las tuplas que emite DatabaseManager."""
+    if fila is None:
+        return None
+    if evento == "actualizado_lote":
+        return tuple(tuple(f) for f in fila)
+    return tuple(fila)
+
+class ClienteRemoto:
+    """
+    Acceso a un ServidorGIC con la misma interfaz que DatabaseManager (la que usan GIC_App,
+    ClienteRepository y la línea de comandos). Cada hilo mantiene su propia conexión HTTP
+    persistente. Los errores de validación del servidor se lanzan como ValueError, igual que
+    en local; las lecturas fallidas devuelven vacío y quedan en el log. El token del servidor se
+    toma de 'token' o, si no se indica, de la variable de entorno GIC_TOKEN.
+    """
+
+    remoto = True
+
+    def __init__(self, url=f"http://{HOST}:{PUERTO}", timeout=30.0, token=None):
+        partes = urlsplit(url)
+        self.db_name = url
+        self._cabeceras = {"Content-Type": "application/json",
+                           "Authorization": f"Bearer {token or os.environ.get('GIC_TOKEN', '')}"}
+        self.host, self.puerto = partes.hostname, partes.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+        self._suscriptores = []
+        self._escuchando = None
+        self._detenido = threading.Event()
+
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+        return conn
+
+    def _pedir(self, metodo, ruta, datos=None):
+        """Realiza una petición JSON. Un 404 se devuelve como None."""
+        cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+        # Solo las lecturas se reintentan: una escritura pudo aplicarse aunque se perdiera la respuesta
+        for intento in range(2 if metodo == "GET" else 1):
+            conn = self._conexion()
+            try:
+                conn.request(metodo, ruta, body=cuerpo, headers=self._cabeceras)
+                respuesta = conn.getresponse()
+                contenido = respuesta.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._local.conn = None
+                if intento == 1 or metodo != "GET":
+                    raise ErrorRemoto(f"Sin conexión con el servidor {self.db_name}: {e}") from e
+        if not respuesta.getheader("Content-Type", "").startswith("application/json"):
+            return contenido.decode("utf-8")  # /metricas responde en texto (formato Prometheus)
+        resultado = json.loads(contenido) if contenido else None
+        if respuesta.status == 404:
+            return None
+        if respuesta.status >= 500:
+            raise ErrorRemoto(resultado.get("error") if isinstance(resultado, dict) else respuesta.reason)
+        if respuesta.status >= 400:
+            raise ValueError(resultado.get("error") if isinstance(resultado, dict) else respuesta.reason)
+        return resultado
+
+    def _leer_filas(self, operacion, metodo, ruta, datos=None):
+        try:
+            return [tuple(f) for f in self._pedir(metodo, ruta, datos) or []]
+        except ErrorRemoto as e:
+            registrar_error(f"Error remoto en {operacion}: {e}", operacion=operacion, resultado="error")
+            return []
+
+    def close(self):
+        self._detenido.set()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Lecturas ---
+
+    @medir("remoto_obtener_pagina")
+    def obtener_pagina(self, after_id=None, limit=100, orden="asc"):
+        parametros = f"limit={int(limit)}&orden={quote(orden)}"
+        if after_id is not None:
+            parametros += f"&after_id={quote(str(after_id), safe='')}"
+        return self._leer_filas("obtener_pagina", "GET", f"/clientes?{parametros}")
+
+    def obtener_todos(self):
+        filas, ultimo = [], None
+        while True:
+            pagina = self.obtener_pagina(ultimo, 1000)
+            if not pagina:
+                return filas
+            filas.extend(pagina)
+            ultimo = pagina[-1][0]
+
+    @medir("remoto_obtener_por_id")
+    def obtener_por_id(self, id_cliente):
+        fila = self._pedir("GET", f"/clientes/{quote(str(id_cliente), safe='')}")
+        return tuple(fila) if fila is not None else None
+
+    def obtener_por_ids(self, ids, tamano_lote=None):
+        return self._leer_filas("obtener_por_ids", "POST", "/clientes/consulta", {"ids": list(ids)})
+
+    @medir("remoto_buscar")
+    def buscar(self, texto, tipo=None, limit=50):
+        parametros = f"texto={quote(texto or '')}&limit={int(limit)}" + (f"&tipo={quote(tipo)}" if tipo else "")
+        return self._leer_filas("buscar", "GET", f"/buscar?{parametros}")
+
+    def contar_clientes(self):
+        return self._pedir("GET", "/estadisticas")["por_tipo"]
+
+    def estadisticas(self, top_empresas=10):
+        try:
+            estadisticas = self._pedir("GET", f"/estadisticas?empresas={int(top_empresas)}")
+        except ErrorRemoto as e:
+            registrar_error(f"Error remoto al leer las estadísticas: {e}", operacion="estadisticas", resultado="error")
+            return None
+        estadisticas["top_empresas"] = [tuple(e) for e in estadisticas["top_empresas"]]
+        return estadisticas
+
+    def verificar_estadisticas(self, reconstruir=False):
+        try:
+            verificacion = self._pedir("POST", "/estadisticas/verificar", {"reconstruir": reconstruir})
+        except ErrorRemoto as e:
+            registrar_error(f"Error remoto al verificar las estadísticas: {e}", operacion="verificar_estadisticas",
+                            resultado="error")
+            return None
+        verificacion["diferencias"] = [tuple(d) for d in verificacion["diferencias"]]
+        return verificacion
+
+    def contar_notificaciones(self):
+        return self._pedir("GET", "/estadisticas")["notificaciones"]
+
+    def exportar_datos(self, ruta_json=None, ruta_csv=None, comprimir=False, **_):
+        """
+        Exporta en el directorio de exportación del servidor (las rutas locales se ignoran);
+        devuelve el total de filas o None si falló.
+        """
+        try:
+            return self._pedir("POST", "/exportar", {"comprimir": comprimir})["total"]
+        except ErrorRemoto as e:
+            registrar_error(f"Fallo en la exportación remota: {e}", operacion="exportar_datos", resultado="error")
+            return None
+
+    # --- Escrituras ---
+
+    @medir("remoto_guardar_cliente")
+    def guardar_cliente(self, cliente, notificar=False):
+        self._pedir("POST", "/clientes", {"cliente": cliente_a_registro(cliente), "notificar": notificar})
+
+    @medir("remoto_actualizar_cliente")
+    def actualizar_cliente(self, cliente):
+        ruta = f"/clientes/{quote(str(cliente.id_cliente), safe='')}"
+        return bool(self._pedir("PUT", ruta, {"cliente": cliente_a_registro(cliente)}))
+
+    @medir("remoto_eliminar_cliente_db")
+    def eliminar_cliente_db(self, id_cliente):
+        try:
+            return self._pedir("DELETE", f"/clientes/{quote(str(id_cliente), safe='')}") is not None
+        except ErrorRemoto as e:
+            registrar_error(f"Error remoto al eliminar: {e}", operacion="eliminar_cliente", id_cliente=id_cliente,
+                            resultado="error")
+            return False
+
+    def eliminar_clientes_lote(self, ids, **_):
+        return self._pedir("POST", "/clientes/eliminar", {"ids": list(ids)})["eliminados"]
+
+    def actualizar_tipo_lote(self, ids, tipo, descuento=None, empresa=None, **_):
+        return self._pedir("POST", "/clientes/tipo", {"ids": list(ids), "tipo": tipo, "descuento": descuento,
+                                                      "empresa": empresa})["actualizados"]
+
+    def _lote(self, registros, actualizar):
+        clientes = [cliente_a_registro(r) if hasattr(r, "id_cliente") else r for r in registros]
+        return [ResultadoFila(*r) for r in self._pedir("POST", "/clientes/lote",
+                                                       {"clientes": clientes, "actualizar": actualizar})]
+
+    def guardar_clientes_lote(self, registros, **_):
+        return self._lote(registros, False)
+
+    def upsert_clientes_lote(self, registros, **_):
+        return self._lote(registros, True)
+
+    # --- Eventos ---
+
+    def suscribir(self, callback):
+        """
+        Registra un observador de cambios. Los eventos llegan por long polling a /eventos y se
+        entregan desde un hilo propio, igual que en local llegan desde el hilo que escribió.
+        """
+        self._suscriptores.append(callback)
+        if self._escuchando is None:
+            # El punto de partida se fija antes de volver: no se pierden cambios posteriores
+            ultimo = self._pedir("GET", "/eventos?desde=-1")["ultimo"]
+            self._escuchando = threading.Thread(target=self._escuchar, args=(ultimo,), name="gic-eventos", daemon=True)
+            self._escuchando.start()
+
+    def desuscribir(self, callback):
+        if callback in self._suscriptores:
+            self._suscriptores.remove(callback)
+
+    def _escuchar(self, ultimo):
+        while not self._detenido.is_set():
+            try:
+                respuesta = self._pedir("GET", f"/eventos?desde={ultimo}&espera={ESPERA_EVENTOS}")
+            except (ErrorRemoto, ValueError) as e:
+                registrar_error(f"Sin eventos del servidor: {e}", operacion="eventos_remotos", resultado="error")
+                self._detenido.wait(ESPERA_EVENTOS)
+                continue
+            for _, evento, fila in respuesta["eventos"]:
+                for callback in list(self._suscriptores):
+                    try:
+                        callback(evento, _fila_evento(evento, fila))
+                    except Exception as e:
+                        registrar_error(f"Error en observador de cambios ({evento}): {e}")
+            ultimo = respuesta["ultimo"]
+
+    def metricas(self):
+        """Métricas del servidor en formato de texto de Prometheus."""
+        return self._pedir("GET", "/metricas")
+
+    def detector_duplicados(self):
+        """Revisión de duplicados del servidor con la interfaz que usa PanelDuplicados."""
+        return DetectorRemoto(self)
+
+class DetectorRemoto:
+    """pendientes / resolver / analizar de DetectorDuplicados, ejecutados en el servidor."""
+
+    def __init__(self, remoto):
+        self.remoto = remoto
+
+    def pendientes(self, limite=200):
+        return [tuple(p) for p in self.remoto._pedir("GET", f"/duplicados?limite={int(limite)}")]
+
+    def resolver(self, id_a, id_b, estado):
+        self.remoto._pedir("POST", "/duplicados/resolver", {"id_a": id_a, "id_b": id_b, "estado": estado})
+
+    def analizar(self):
+        return self.remoto._pedir("POST", "/duplicados/analizar", {})["pares"]
@@ -1,8 +1,36 @@
 import unittest
 import os
 import gc
-from models import Cliente, ClientePremium, ClienteRegular
-from database import DatabaseManager
+import csv
+import gzip
+import http.client
+import json
+import sqlite3
+import tempfile
+import time
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+# El log de las pruebas va a un archivo temporal, no al directorio de trabajo
+os.environ.setdefault("GIC_LOG", os.path.join(tempfile.gettempdir(), "gic_pruebas.log"))
+
+from models import Cliente, ClientePremium, ClienteRegular, ClienteCorporativo
+from database import DatabaseManager, ResultadoFila
+import services
+from services import CacheTTL, ServicioExternoError
+from notificaciones import DespachadorNotificaciones, EmisorLocal
+import logger
+import metricas
+import cli
+import ingesta
+from respaldo import GestorRespaldos
+from repositorio import ClienteRepository
+import duplicados
+from duplicados import DetectorDuplicados
+import servidor
+from servidor import ClienteRemoto, ServidorGIC
 
 class TestSistemaGIC(unittest.TestCase):
     """
@@ -25,14 +53,17 @@ class TestSistemaGIC(unittest.TestCase):
         Limpieza post-ejecución. 
         Libera recursos y elimina el archivo de base de datos temporal.
         """
+        self.manager.close()
         self.manager = None 
         gc.collect() # Fuerza la recolección de basura para liberar el archivo DB en Windows
         
-        if os.path.exists(self.db_test):
-            try:
-                os.remove(self.db_test)
-            except (PermissionError, OSError):
-                pass
+        # En modo WAL SQLite crea los archivos auxiliares -wal y -shm junto a la base
+        for ruta in (self.db_test, self.db_test + "-wal", self.db_test + "-shm"):
+            if os.path.exists(ruta):
+                try:
+                    os.remove(ruta)
+                except (PermissionError, OSError):
+                    pass
 
     def test_validaciones_avanzadas(self):
         """Valida que los setters de la clase Cliente disparen excepciones ante datos inválidos."""
@@ -86,6 +117,318 @@ class TestSistemaGIC(unittest.TestCase):
         registro_db = next(row for row in todos if row[0] == id_test)
         self.assertEqual(registro_db[1], nuevo_nombre)
 
+    def test_conexion_persistente(self):
+        """Verifica que el gestor reutilice una única conexión ajustada en modo WAL."""
+        conn = self.manager.conexion()
+        self.assertIs(conn, self.manager.conexion())
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_transaccion_revierte_ante_error(self):
+        """Un fallo dentro de transaccion() debe deshacer todas las operaciones del bloque."""
+        with self.assertRaises(ValueError):
+            with self.manager.transaccion():
+                self.manager.guardar_cliente(ClienteRegular("TX-01", "Uno", self.email_valido, self.tel_valido))
+                self.manager.guardar_cliente(ClienteRegular("TX-01", "Repetido", self.email_valido, self.tel_valido))
+        self.assertEqual(self.manager.obtener_todos(), [])
+
+    def test_operaciones_masivas(self):
+        """Valida la clasificación por fila de la inserción masiva y del upsert."""
+        self.manager.guardar_cliente(ClienteRegular("L-1", "Existente", self.email_valido, self.tel_valido))
+        lote = [
+            ClientePremium("L-2", "Nuevo", self.email_valido, self.tel_valido),
+            ("L-1", "Repetido", self.email_valido, self.tel_valido, "ClienteRegular", ""),
+            ("L-3", "Crudo", self.email_valido, self.tel_valido, "ClienteRegular", ""),
+            ("L-3", "Repetido en lote", self.email_valido, self.tel_valido, "ClienteRegular", ""),
+            ("incompleto",),
+            ("L-5", "Tras inválido", self.email_valido, self.tel_valido, "ClienteRegular", ""),
+        ]
+        estados = [r.estado for r in self.manager.guardar_clientes_lote(lote, tamano_lote=3)]
+        self.assertEqual(estados, ["insertado", "duplicado", "insertado", "duplicado", "invalido", "insertado"])
+
+        resultados = self.manager.upsert_clientes_lote(
+            [("L-1", "Actualizado", self.email_valido, self.tel_valido, "ClienteRegular", ""),
+             ("L-4", "Otro", self.email_valido, self.tel_valido, "ClienteRegular", "")])
+        self.assertEqual(resultados, [ResultadoFila("L-1", "actualizado", None), ResultadoFila("L-4", "insertado", None)])
+        nombres = {row[0]: row[1] for row in self.manager.obtener_todos()}
+        self.assertEqual(nombres["L-1"], "Actualizado")
+        self.assertEqual(len(nombres), 5)
+
+    def test_lote_valida_tuplas_crudas(self):
+        """Las tuplas crudas pasan por las mismas validaciones del modelo que los objetos."""
+        resultados = self.manager.guardar_clientes_lote([
+            ("X1", "Ana", self.email_valido, self.tel_valido, "Foo", None, None),
+            ("X2", "Bo", self.email_valido, self.tel_valido, "ClientePremium", 500, None),
+            ("X3", "Eva", "x", self.tel_valido, "ClienteRegular", None, None),
+            ("X4", "Ok", self.email_valido, self.tel_valido, "ClientePremium", 20, None),
+        ])
+        self.assertEqual([(r.id_cliente, r.estado) for r in resultados],
+                         [("X1", "invalido"), ("X2", "invalido"), ("X3", "invalido"), ("X4", "insertado")])
+        self.assertIn("desconocido", resultados[0].motivo)
+        self.assertIn("Descuento inválido", resultados[1].motivo)
+        self.assertIn("email", resultados[2].motivo)
+        self.assertEqual(self.manager.estadisticas()["descuento_promedio"], {"ClientePremium": 20.0})
+        # Una tupla con campos de menos también informa su ID
+        self.assertEqual(self.manager.guardar_clientes_lote([("X9", "Ana", self.email_valido, self.tel_valido,
+                                                              "ClienteRegular")])[0].id_cliente, "X9")
+
+    def test_edicion_y_baja_en_lote(self):
+        """Cambio de categoría y baja de varios clientes: una transacción y un evento por lote."""
+        self.manager.guardar_clientes_lote([ClienteCorporativo(f"G-{i}", f"Gil {i}", self.email_valido, self.tel_valido, "Acme")
+                                            for i in range(4)])
+        repo = ClienteRepository(self.manager)
+        repo.obtener_por_id("G-0")
+        eventos = []
+        self.manager.suscribir(lambda evento, fila: eventos.append((evento, len(fila))))
+
+        self.assertEqual(self.manager.actualizar_tipo_lote(["G-0", "G-1", "G-9"], "Premium", descuento=25), 2)
+        self.assertEqual(self.manager.obtener_por_id("G-1")[4:], ("ClientePremium", "Descuento: 25%"))
+        self.assertEqual(repo.obtener_por_id("G-0").descuento, 25)  # La caché se actualiza con el evento
+        with self.assertRaises(ValueError):
+            self.manager.actualizar_tipo_lote(["G-2"], "Platino")
+
+        self.assertEqual(self.manager.eliminar_clientes_lote(["G-0", "G-2", "G-9"]), ["G-0", "G-2"])
+        self.assertIsNone(repo.obtener_por_id("G-0"))
+        self.assertEqual(eventos, [("actualizado_lote", 2), ("eliminado_lote", 2)])
+        self.assertEqual(self.manager.contar_clientes(), {"ClientePremium": 1, "ClienteCorporativo": 1})
+
+        # Un fallo de la base se relanza, igual que en actualizar_tipo_lote, sin dejar bajas a medias
+        self.manager.conexion().execute("""CREATE TRIGGER bloquear_bajas BEFORE DELETE ON clientes
+                                           BEGIN SELECT RAISE(ABORT, 'bajas bloqueadas'); END""")
+        with self.assertRaises(sqlite3.Error):
+            self.manager.eliminar_clientes_lote(["G-1", "G-3"])
+        self.assertEqual(self.manager.contar_clientes(), {"ClientePremium": 1, "ClienteCorporativo": 1})
+
+    def test_exportacion_por_bloques(self):
+        """La exportación debe recorrer la tabla en bloques y generar JSON Lines y CSV equivalentes."""
+        self.manager.guardar_clientes_lote(
+            ClienteRegular(f"E-{i}", f"Cliente {i}", self.email_valido, self.tel_valido) for i in range(25))
+        avances = []
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta_json, ruta_csv = os.path.join(tmp, "c.jsonl"), os.path.join(tmp, "c.csv")
+            total = self.manager.exportar_datos(ruta_json, ruta_csv, comprimir=True,
+                                                tamano_bloque=10, progreso=avances.append)
+            with gzip.open(ruta_json + ".gz", "rt", encoding="utf-8") as f:
+                registros = [json.loads(linea) for linea in f]
+            with gzip.open(ruta_csv + ".gz", "rt", encoding="utf-8", newline="") as f:
+                filas_csv = list(csv.DictReader(f))
+
+        self.assertEqual(total, 25)
+        self.assertEqual(avances, [10, 20, 25])
+        self.assertEqual(len(registros), 25)
+        self.assertEqual([r["id"] for r in registros], [r["id"] for r in filas_csv])
+
+    def test_paginacion_por_clave(self):
+        """La paginación keyset debe recorrer la tabla en ambos sentidos sin saltos ni repeticiones."""
+        self.manager.guardar_clientes_lote(
+            ("P-%02d" % i, "Cliente", self.email_valido, self.tel_valido, "ClienteRegular", "") for i in range(7))
+        primera = self.manager.obtener_pagina(limit=3)
+        segunda = self.manager.obtener_pagina(primera[-1][0], 3)
+        self.assertEqual([f[0] for f in primera + segunda], ["P-%02d" % i for i in range(6)])
+
+        anterior = self.manager.obtener_pagina(segunda[0][0], 2, orden="desc")
+        self.assertEqual([f[0] for f in anterior], ["P-02", "P-01"])
+
+        with self.assertRaises(ValueError):
+            self.manager.obtener_pagina(orden="aleatorio")
+
+    def test_notificacion_de_cambios(self):
+        """Los observadores reciben un evento por cambio confirmado y ninguno por cambios revertidos."""
+        eventos = []
+        self.manager.suscribir(lambda evento, fila: eventos.append((evento, fila[0] if fila else None)))
+
+        cliente = ClienteRegular("N-1", "Nora", self.email_valido, self.tel_valido)
+        self.manager.guardar_cliente(cliente)
+        cliente.nombre = "Nora Editada"
+        self.manager.actualizar_cliente(cliente)
+        with self.assertRaises(ValueError):
+            self.manager.guardar_cliente(cliente)
+        self.manager.eliminar_cliente_db("N-1")
+        self.manager.guardar_clientes_lote([cliente])
+
+        self.assertEqual(eventos, [("insertado", "N-1"), ("actualizado", "N-1"),
+                                   ("eliminado", "N-1"), ("masivo", None)])
+
+    def test_busqueda_texto_completo(self):
+        """La búsqueda debe encontrar por prefijo de nombre, email o teléfono y respetar el filtro de tipo."""
+        self.manager.guardar_cliente(ClienteRegular("B-1", "José Martínez", "jose@acme.com", "5551234"))
+        self.manager.guardar_cliente(ClientePremium("B-2", "Josefina Ruiz", "jruiz@correo.com", "7778888"))
+        self.manager.guardar_cliente(ClienteCorporativo("B-3", "Pedro Gil", "pgil@acme.com", "5559999", "Acme SA"))
+
+        def ids(resultado):
+            return sorted(fila[0] for fila in resultado)
+
+        self.assertEqual(ids(self.manager.buscar("jose")), ["B-1", "B-2"])
+        self.assertEqual(ids(self.manager.buscar("martinez")), ["B-1"])
+        self.assertEqual(ids(self.manager.buscar("acme")), ["B-1", "B-3"])
+        self.assertEqual(ids(self.manager.buscar("555")), ["B-1", "B-3"])
+        self.assertEqual(ids(self.manager.buscar("jos", tipo="ClientePremium")), ["B-2"])
+
+        # Las ediciones mantienen el índice sincronizado mediante triggers
+        self.manager.eliminar_cliente_db("B-1")
+        self.assertEqual(ids(self.manager.buscar("jose")), ["B-2"])
+
+    def test_outbox_de_notificaciones(self):
+        """El registro encola la notificación en la misma transacción y el despachador la envía."""
+        cliente = ClienteRegular("O-1", "Olga", self.email_valido, self.tel_valido)
+        self.manager.guardar_cliente(cliente, notificar=True)
+        with self.assertRaises(ValueError):
+            self.manager.guardar_cliente(cliente, notificar=True)  # El duplicado no deja notificación
+        self.assertEqual(self.manager.contar_notificaciones(), {"pendiente": 1})
+
+        emisor = EmisorLocal()
+        DespachadorNotificaciones(self.manager, emisor=emisor).procesar_lote()
+        self.assertEqual([d.email for d in emisor.enviados], [self.email_valido])
+        self.assertEqual(self.manager.contar_notificaciones(), {"enviado": 1})
+
+    def test_outbox_reintentos_y_descarte(self):
+        """Los envíos fallidos se reintentan y pasan a 'muerto' al agotar los intentos."""
+        self.manager.guardar_cliente(ClienteRegular("O-2", "Omar", self.email_valido, self.tel_valido), notificar=True)
+        despachador = DespachadorNotificaciones(self.manager, emisor=EmisorLocal(fallar=True),
+                                                max_intentos=2, espera_base=0)
+        despachador.procesar_lote()
+        self.assertEqual(self.manager.contar_notificaciones(), {"pendiente": 1})
+        despachador.procesar_lote()
+        self.assertEqual(self.manager.contar_notificaciones(), {"muerto": 1})
+
+    def test_hidratacion_desde_fila(self):
+        """Las filas guardadas se reconstruyen como la subclase original con sus datos específicos."""
+        self.manager.guardar_cliente(ClientePremium("H-1", "Hugo", self.email_valido, self.tel_valido, descuento=30))
+        self.manager.guardar_cliente(ClienteCorporativo("H-2", "Hilda", self.email_valido, self.tel_valido, "Acme SA"))
+        premium, corporativo = self.manager.iterar_clientes(tamano_bloque=1)
+
+        self.assertIsInstance(premium, ClientePremium)
+        self.assertEqual(premium.descuento, 30)
+        self.assertEqual(premium.email, self.email_valido)
+        self.assertIsInstance(corporativo, ClienteCorporativo)
+        self.assertEqual(corporativo.empresa, "Acme SA")
+        # Las clases usan __slots__: no hay __dict__ por instancia
+        self.assertFalse(hasattr(corporativo, "__dict__"))
+
+        with self.assertRaises(ValueError):
+            Cliente.desde_fila(("H-3", "Malo", "sin-arroba", self.tel_valido, "ClienteRegular", ""), validar=True)
+
+    def test_migracion_columnas_tipadas(self):
+        """Una base con el esquema anterior se migra una sola vez, interpretando la columna 'extra'."""
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, "legado.db")
+            with sqlite3.connect(ruta) as conn:
+                conn.execute("CREATE TABLE clientes (id TEXT PRIMARY KEY, nombre TEXT, email TEXT, tipo TEXT, extra TEXT, "
+                             "telefono TEXT DEFAULT 'Sin Teléfono')")
+                conn.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?, ?)", [
+                    ("M-1", "Mara", self.email_valido, "ClientePremium", "Descuento: 25%", self.tel_valido),
+                    ("M-2", "Mario", self.email_valido, "ClienteCorporativo", "Empresa: Globex", self.tel_valido),
+                    ("M-3", "Marta", self.email_valido, "ClienteRegular", "", self.tel_valido)])
+            conn.close()
+
+            with DatabaseManager(ruta) as db:
+                conn = db.conexion()
+                self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], len(DatabaseManager.MIGRACIONES))
+                tipados = conn.execute("SELECT id, descuento, empresa FROM clientes ORDER BY id").fetchall()
+                self.assertEqual(tipados, [("M-1", 25, None), ("M-2", None, "Globex"), ("M-3", None, None)])
+                # La vista de la aplicación conserva el texto de detalle y la búsqueda indexa la empresa
+                self.assertEqual([f[5] for f in db.obtener_todos()], ["Descuento: 25%", "Empresa: Globex", ""])
+                self.assertEqual([f[0] for f in db.buscar("globex")], ["M-2"])
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM clientes WHERE descuento > 20").fetchone()[0], 1)
+
+    def test_estadisticas_incrementales(self):
+        """Las tablas de resumen siguen cada cambio, también en cargas masivas, y se pueden reconstruir."""
+        self.manager.guardar_cliente(ClientePremium("E1", "Eva", self.email_valido, self.tel_valido, 10))
+        self.manager.guardar_cliente(ClienteCorporativo("E2", "Eloy", self.email_valido, self.tel_valido, "Acme"))
+        self.manager.actualizar_cliente(ClientePremium("E2", "Eloy", self.email_valido, self.tel_valido, 30))
+        # Un ID repetido en la misma carga masiva cuenta una sola vez, con su valor final
+        self.manager.upsert_clientes_lote([ClienteCorporativo("E3", "Ema", self.email_valido, self.tel_valido, "Acme"),
+                                           ClienteCorporativo("E3", "Ema", self.email_valido, self.tel_valido, "Initech"),
+                                           ClienteRegular("E4", "Elio", self.email_valido, self.tel_valido)],
+                                          carga_masiva=True)
+        self.manager.eliminar_cliente_db("E4")
+        estadisticas = self.manager.estadisticas()
+        self.assertEqual(estadisticas["por_tipo"], {"ClientePremium": 2, "ClienteCorporativo": 1})
+        self.assertEqual(estadisticas["descuento_promedio"], {"ClientePremium": 20.0})
+        self.assertEqual((estadisticas["empresas"], estadisticas["top_empresas"]), (1, [("Initech", 1)]))
+        self.assertTrue(self.manager.verificar_estadisticas()["consistente"])
+
+        self.manager.conexion().execute("UPDATE resumen_tipos SET clientes = 99")
+        verificacion = self.manager.verificar_estadisticas(reconstruir=True)
+        self.assertEqual((len(verificacion["diferencias"]), verificacion["reconstruido"]), (2, True))
+        self.assertEqual(self.manager.contar_clientes(), {"ClientePremium": 2, "ClienteCorporativo": 1})
+
+    def test_repositorio_mapa_de_identidad(self):
+        """Las lecturas repetidas salen de caché y las escrituras la invalidan con precisión."""
+        repo = ClienteRepository(self.manager)
+        self.manager.guardar_cliente(ClientePremium("R1", "Rosa", self.email_valido, self.tel_valido, 30))
+        self.assertFalse(repo.existe("R2"))
+        self.assertFalse(repo.existe("R2"))  # Resultado negativo cacheado
+
+        cliente = repo.obtener_por_id("R1")
+        self.assertIs(repo.obtener_por_id("R1"), cliente)
+        self.assertEqual(cliente.descuento, 30)
+        self.assertEqual(self.manager.obtener_por_id("R1")[0], "R1")
+
+        # La edición reemplaza la entrada y el alta anula el negativo
+        self.manager.actualizar_cliente(ClienteCorporativo("R1", "Rosa", self.email_valido, self.tel_valido, "ACME"))
+        self.manager.guardar_cliente(ClienteRegular("R2", "Raúl", self.email_valido, self.tel_valido))
+        self.assertEqual(repo.obtener_por_id("R1").empresa, "ACME")
+        self.assertTrue(repo.existe("R2"))
+
+        self.manager.eliminar_cliente_db("R1")
+        self.assertIsNone(repo.obtener_por_id("R1"))
+        self.assertEqual(sorted(repo.obtener_muchos(["R1", "R2", "R3"])), ["R2"])
+
+        estadisticas = repo.estadisticas()
+        # Solo R2 (inicial) y R3 fueron a la base: las altas y ediciones ya dejan la fila en caché
+        self.assertEqual((estadisticas["aciertos"], estadisticas["fallos"]), (8, 2))
+        self.manager.guardar_clientes_lote([ClienteRegular("R3", "Rita", self.email_valido, self.tel_valido)])
+        self.assertEqual(repo.estadisticas()["tamano"], 0)  # Las operaciones masivas vacían la caché
+        repo.cerrar()
+
+    def test_normalizacion_de_duplicados(self):
+        """Nombre, email y teléfono se normalizan antes de comparar."""
+        self.assertEqual(duplicados.clave_nombre("  PÉREZ, José "), duplicados.clave_nombre("Jose Perez"))
+        self.assertEqual(duplicados.normalizar_email("J.Perez+ofertas@GMAIL.com"), "jperez@gmail.com")
+        self.assertEqual(duplicados.normalizar_email("j.perez+x@empresa.cl"), "j.perez@empresa.cl")
+        self.assertEqual(duplicados.normalizar_telefono("+56 9 1234-5678"), duplicados.normalizar_telefono("912345678"))
+
+    def test_deteccion_de_duplicados(self):
+        """El análisis completo y la verificación incremental proponen los pares y conservan la revisión."""
+        self.manager.guardar_clientes_lote([
+            ClienteRegular("D1", "José Pérez", "jose.perez@gmail.com", "56912345678"),
+            ClienteRegular("D2", "Perez Jose", "jose.perez+web@gmail.com", "912345678"),
+            ClienteRegular("D3", "Ana Soto", "ana.soto84@correo.cl", "87654321"),
+            ClienteRegular("D4", "Ana Soto", "ana.soto85@correo.cl", "11223344"),
+        ])
+        detector = DetectorDuplicados(self.manager)
+        self.assertEqual(detector.analizar(), 1)  # Homónimas con emails distintos no son duplicado
+        (par,) = detector.pendientes()
+        self.assertEqual((par[0], par[4], par[9]), ("D1", "D2", "nombre,email,telefono"))
+
+        detector.resolver("D2", "D1", "descartado")
+        self.assertEqual(detector.analizar(), 1)
+        self.assertEqual(detector.pendientes(), [])  # La decisión tomada se conserva
+        with self.assertRaises(ValueError):
+            detector.resolver("D1", "D2", "quizas")
+
+        detector.iniciar_incremental()
+        self.manager.guardar_cliente(ClienteRegular("D5", "ANA SOTO", "Ana.Soto84@correo.cl", "99887766"))
+        self.assertEqual([(p[0], p[4]) for p in detector.pendientes()], [("D3", "D5")])
+        self.manager.eliminar_cliente_db("D5")  # La baja retira sus claves y sus pares
+        self.assertEqual(detector.pendientes(), [])
+        # Una carga masiva no informa filas: sus clientes se verifican por las claves que les faltan
+        self.manager.guardar_clientes_lote([ClienteRegular("D6", "Soto Ana", "ana.soto84@correo.cl", "55554444")],
+                                           carga_masiva=True)
+        self.assertEqual([(p[0], p[4]) for p in detector.pendientes()], [("D3", "D6")])
+        detector.detener_incremental()
+
+    def test_claves_completadas_al_iniciar_incremental(self):
+        """Los clientes cargados antes de activar el detector reciben sus claves al iniciarlo."""
+        self.manager.guardar_clientes_lote([ClienteRegular(f"K{i}", f"Cliente {i}", f"k{i}@mail.com", "12345678")
+                                            for i in range(5)])
+        conn = self.manager.conexion()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM clientes_claves").fetchone()[0], 0)
+        detector = DetectorDuplicados(self.manager)
+        detector.iniciar_incremental()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM clientes_claves").fetchone()[0], 5)
+        detector.detener_incremental()
+
     def test_metodo_especial_eq(self):
         """Valida la sobrescritura del método __eq__ para comparar objetos por identidad de negocio."""
         c1 = ClienteRegular("ID_123", "Jose", self.email_valido, self.tel_valido)
@@ -93,5 +436,475 @@ class TestSistemaGIC(unittest.TestCase):
         # Deben ser considerados iguales por tener el mismo ID, a pesar de tener nombres distintos
         self.assertEqual(c1, c2)
 
+class TestServiciosExternos(unittest.TestCase):
+    """Pruebas de la validación de identidad con caché y procesamiento por lotes."""
+
+    def setUp(self):
+        # Se anula la latencia simulada para que las pruebas sean instantáneas
+        self.latencia_original = services.LATENCIA_IDENTIDAD
+        services.LATENCIA_IDENTIDAD = 0
+        services.cache_identidad.limpiar()
+
+    def tearDown(self):
+        services.LATENCIA_IDENTIDAD = self.latencia_original
+        services.cache_identidad.limpiar()
+
+    def test_validacion_lote_usa_cache(self):
+        """El lote consulta solo los IDs ausentes en caché y elimina repetidos."""
+        self.assertTrue(services.validar_identidad_api("C-1"))
+        resultado = services.validar_identidades_lote(["C-1", "C-2", "C-2", "C-3", ""], tamano_lote=1)
+        self.assertEqual(resultado, {"C-1": True, "C-2": True, "C-3": True, "": False})
+        estadisticas = services.cache_identidad.estadisticas()
+        self.assertEqual(estadisticas["aciertos"], 1)
+        self.assertEqual(estadisticas["tamano"], 3)
+
+        with self.assertRaises(ServicioExternoError):
+            services.validar_identidad_api("")
+
+    def test_cache_ttl_y_lru(self):
+        """La caché expira entradas según su TTL (negativo incluido) y desaloja la menos usada."""
+        ahora = [0.0]
+        cache = CacheTTL(capacidad=2, ttl=10, ttl_negativo=1, reloj=lambda: ahora[0])
+        cache.guardar("a", True)
+        cache.guardar("b", False)
+        self.assertEqual(cache.obtener("a"), (True, True))
+        cache.guardar("c", True)  # Desaloja "b", la menos usada
+        self.assertEqual(cache.obtener("b"), (False, None))
+
+        cache.guardar("d", False)
+        ahora[0] = 5.0
+        self.assertEqual(cache.obtener("d"), (False, None))  # El resultado negativo ya expiró
+        self.assertEqual(cache.obtener("c"), (True, True))
+        self.assertEqual(cache.estadisticas()["desalojos"], 2)
+        self.assertEqual(cache.estadisticas()["expiraciones"], 1)
+
+class TestRegistroActividad(unittest.TestCase):
+    """Pruebas del logging estructurado en JSON Lines con cola y limitación de tasa."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.tmp.name, "gic.log")
+
+    def tearDown(self):
+        logger.configurar_logging()  # Restablece el archivo de log por defecto
+        self.tmp.cleanup()
+
+    def _leer(self):
+        logger.cerrar_logging()  # Vacía la cola antes de leer
+        with open(self.ruta, encoding="utf-8") as f:
+            return [json.loads(linea) for linea in f]
+
+    def test_registros_json_estructurados(self):
+        """Cada evento es una línea JSON con sus campos estructurados."""
+        logger.configurar_logging(self.ruta)
+        logger.registrar_evento("Cliente guardado", operacion="guardar_cliente", id_cliente="J-1",
+                                duracion_ms=1.5, resultado="ok")
+        logger.registrar_error("Fallo simulado")
+        evento, error = self._leer()
+        self.assertEqual(evento["operacion"], "guardar_cliente")
+        self.assertEqual(evento["id_cliente"], "J-1")
+        self.assertEqual(evento["nivel"], "INFO")
+        self.assertEqual(error["nivel"], "ERROR")
+
+    def test_limitador_y_muestreo(self):
+        """Los eventos de alto volumen se limitan por operación; los errores nunca se descartan."""
+        logger.configurar_logging(self.ruta, eventos_por_segundo=5)
+        for i in range(50):
+            logger.registrar_evento("Alta masiva", operacion="carga", id_cliente=i)
+            logger.registrar_evento("Nunca registrado", muestreo=0)
+        logger.registrar_error("Error de carga", operacion="carga")
+        registros = self._leer()
+        self.assertLess(len([r for r in registros if r["mensaje"] == "Alta masiva"]), 50)
+        self.assertFalse([r for r in registros if r["mensaje"] == "Nunca registrado"])
+        self.assertEqual(registros[-1]["nivel"], "ERROR")
+
+class TestMetricas(unittest.TestCase):
+    """Pruebas del registro de métricas y su instrumentación."""
+
+    def test_histograma_percentiles(self):
+        """Los percentiles se estiman dentro del bucket correcto."""
+        histograma = metricas.Histograma("latencia")
+        for _ in range(90):
+            histograma.observar(0.002)
+        for _ in range(10):
+            histograma.observar(0.2)
+        resumen = histograma.resumen()
+        self.assertEqual(resumen["total"], 100)
+        self.assertTrue(0.001 < resumen["p50"] <= 0.0025)
+        self.assertTrue(0.1 < resumen["p99"] <= 0.25)
+        self.assertIsNone(metricas.Histograma("vacio").percentil(50))
+
+    def test_instrumentacion_y_formato_prometheus(self):
+        """Los métodos de DatabaseManager quedan medidos y se exportan en formato Prometheus."""
+        metricas.registro.limpiar()
+        with tempfile.TemporaryDirectory() as tmp:
+            with DatabaseManager(os.path.join(tmp, "metricas.db")) as db:
+                db.guardar_cliente(ClienteRegular("M-1", "Ana", "ana@mail.com", "12345678"))
+                db.obtener_todos()
+                list(db.iterar_clientes())
+            resumen = metricas.registro.instantanea()
+            self.assertEqual(resumen["gic_db_guardar_cliente_segundos"]["total"], 1)
+            self.assertEqual(resumen["gic_db_iterar_clientes_total"], 1)
+            ruta = os.path.join(tmp, "metricas.prom")
+            metricas.registro.exportar_archivo(ruta)
+            with open(ruta, encoding="utf-8") as f:
+                texto = f.read()
+        self.assertIn("# TYPE gic_db_obtener_todos_segundos histogram", texto)
+        self.assertIn('gic_db_obtener_todos_segundos_bucket{le="+Inf"} 1', texto)
+
+class TestLineaDeComandos(unittest.TestCase):
+    """Pruebas del modo por lotes sin interfaz gráfica."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "cli.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _ejecutar(self, *argumentos):
+        salida, errores = StringIO(), StringIO()
+        with redirect_stdout(salida), redirect_stderr(errores):
+            codigo = cli.ejecutar(["--db", self.db, *argumentos])
+        return codigo, salida.getvalue(), errores.getvalue()
+
+    def test_importar_consultar_y_exportar(self):
+        """La importación informa las filas rechazadas con código 1 y las consultas leen lo importado."""
+        entrada = os.path.join(self.tmp.name, "entrada.csv")
+        with open(entrada, "w", encoding="utf-8", newline="") as f:
+            f.write("id,nombre,email,telefono,tipo,descuento,empresa\n"
+                    "1,Ana,ana@mail.com,12345678,Premium,20,\n"
+                    "2,Beto,sin-arroba,12345678,Regular,,\n"
+                    "3,Carla,carla@acme.com,87654321,ClienteCorporativo,,ACME\n")
+        codigo, salida, errores = self._ejecutar("import", entrada)
+        self.assertEqual(codigo, cli.SALIDA_PARCIAL)
+        self.assertIn("insertado: 2", salida)
+        self.assertIn("fila 3", errores)
+
+        codigo, salida, _ = self._ejecutar("query", "acme", "--formato", "jsonl")
+        self.assertEqual(codigo, cli.SALIDA_OK)
+        self.assertEqual(json.loads(salida)["extra"], "Empresa: ACME")
+        self.assertEqual(self._ejecutar("query", "inexistente")[0], cli.SALIDA_PARCIAL)
+        codigo, salida, _ = self._ejecutar("query", "--tipo", "Premium")
+        self.assertEqual([linea.split("\t")[0] for linea in salida.splitlines()], ["1"])
+        codigo, salida, _ = self._ejecutar("stats", "--json", "--verificar")
+        self.assertEqual(codigo, cli.SALIDA_OK)
+        self.assertEqual(json.loads(salida)["top_empresas"], [["ACME", 1]])
+
+        ruta_json = os.path.join(self.tmp.name, "backup.jsonl")
+        codigo, _, _ = self._ejecutar("export", "--json", ruta_json, "--csv", os.path.join(self.tmp.name, "b.csv"))
+        self.assertEqual(codigo, cli.SALIDA_OK)
+        # El backup exportado se puede volver a importar actualizando los registros
+        codigo, salida, _ = self._ejecutar("import", ruta_json, "--actualizar")
+        self.assertEqual((codigo, salida.strip()), (cli.SALIDA_OK, "actualizado: 2"))
+
+    def test_vacuum_conserva_busqueda_y_argumentos_invalidos(self):
+        """Tras compactar, el índice de texto sigue apuntando a las filas correctas."""
+        with DatabaseManager(self.db) as db:
+            db.guardar_clientes_lote([ClienteRegular(f"V{i}", f"Nombre{i}", f"v{i}@mail.com", "12345678")
+                                      for i in range(20)])
+            for i in range(0, 20, 2):
+                db.eliminar_cliente_db(f"V{i}")
+        self.assertEqual(self._ejecutar("vacuum")[0], cli.SALIDA_OK)
+        codigo, salida, _ = self._ejecutar("query", "Nombre7")
+        self.assertEqual(salida.split("\t")[0], "V7")
+        self.assertEqual(self._ejecutar("comando-inexistente")[0], cli.SALIDA_ERROR)
+
+class TestIngesta(unittest.TestCase):
+    """Pruebas de la importación por etapas con rechazos y checkpoint."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "ingesta.db"))
+        self.entrada = os.path.join(self.tmp.name, "clientes.csv")
+        with open(self.entrada, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(ingesta.COLUMNAS)
+            escritor.writerow(["I1", "Ana", "ana@mail.com", "12345678", "Premium", "15", ""])
+            escritor.writerow(["I2", "Beto", "sin-arroba", "12345678", "Regular", "", ""])
+            escritor.writerow(["I3", "Carla", "carla@acme.com", "87654321", "Corporativo", "", "ACME,\nSur"])
+            escritor.writerow(["I4", "Dora", "dora@mail.com", "11223344", "Regular", "", ""])
+            escritor.writerow(["I1", "Ana", "ana@mail.com", "12345678", "Premium", "15", ""])
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def test_rechazos_y_reanudacion(self):
+        """Una importación interrumpida se reanuda desde el último bloque confirmado."""
+        self.manager.guardar_clientes_lote = unittest.mock.Mock(
+            side_effect=[DatabaseManager.guardar_clientes_lote(self.manager, [("I1", "Ana", "ana@mail.com", "12345678",
+                                                                               "ClientePremium", 15, None)]),
+                         sqlite3.OperationalError("disk I/O error")])
+        with self.assertRaises(sqlite3.OperationalError):
+            ingesta.importar_archivo(self.manager, self.entrada, procesos=0, tamano_bloque=2)
+        self.assertTrue(os.path.exists(self.entrada + ".checkpoint"))
+        del self.manager.guardar_clientes_lote
+
+        resumen = ingesta.importar_archivo(self.manager, self.entrada, procesos=0, tamano_bloque=2)
+        self.assertEqual(resumen["reanudado_desde"], 2)
+        self.assertEqual((resumen["insertado"], resumen["invalido"], resumen["duplicado"]), (3, 1, 1))
+        self.assertFalse(os.path.exists(self.entrada + ".checkpoint"))
+        self.assertEqual(self.manager.obtener_por_id("I3")[5], "Empresa: ACME,\nSur")
+        # El índice de texto, completado al final de cada bloque, incluye las filas importadas
+        self.assertEqual([f[0] for f in self.manager.buscar("acme")], ["I3"])
+        self.assertEqual([f[0] for f in self.manager.buscar("dora")], ["I4"])
+        with open(resumen["ruta_rechazos"], encoding="utf-8") as f:
+            rechazos = [json.loads(linea) for linea in f]
+        self.assertEqual([(r["fila"], r["id"]) for r in rechazos], [(3, "I2"), (6, "I1")])
+
+    def test_validacion_en_procesos_e_importa_backup(self):
+        """Los procesos de validación producen el mismo resultado y los backups exportados se reimportan."""
+        resumen = ingesta.importar_archivo(self.manager, self.entrada, procesos=2, tamano_bloque=2)
+        self.assertEqual((resumen["registros"], resumen["insertado"], resumen["rechazados"]), (5, 3, 2))
+        ruta_json = os.path.join(self.tmp.name, "backup.jsonl")
+        self.manager.exportar_datos(ruta_json, os.path.join(self.tmp.name, "backup.csv"), comprimir=True)
+        resumen = ingesta.importar_archivo(self.manager, ruta_json + ".gz", actualizar=True, procesos=0)
+        self.assertEqual((resumen["actualizado"], resumen["rechazados"]), (3, 0))
+
+    def test_comillas_sueltas_y_registros_mal_formados(self):
+        """Una comilla suelta no une registros y un registro que csv no puede leer se rechaza solo."""
+        with open(self.entrada, "w", encoding="utf-8", newline="") as f:
+            f.write(",".join(ingesta.COLUMNAS) + "\n")
+            f.write('J1,Juan O"Brien,juan@mail.com,12345678,Regular,,\n')
+            f.write(f'J2,{"x" * (csv.field_size_limit() + 1)},largo@mail.com,12345678,Regular,,\n')
+            f.write('J3,Eva,eva@mail.com,12345678,Regular,,\n')
+        resumen = ingesta.importar_archivo(self.manager, self.entrada, procesos=0)
+        self.assertEqual((resumen["insertado"], resumen["invalido"]), (2, 1))
+        self.assertEqual(self.manager.obtener_por_id("J1")[1], 'Juan O"Brien')
+        with open(resumen["ruta_rechazos"], encoding="utf-8") as f:
+            (rechazo,) = [json.loads(linea) for linea in f]
+        self.assertEqual(rechazo["fila"], 3)
+        self.assertIn("CSV inválido", rechazo["motivo"])
+
+class TestRespaldos(unittest.TestCase):
+    """Pruebas del snapshot, los respaldos incrementales y la restauración."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "origen.db"))
+        self.directorio = os.path.join(self.tmp.name, "respaldos")
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def test_snapshot_deltas_y_restauracion(self):
+        """Restaurar snapshot + deltas reproduce el estado, incluidas las bajas."""
+        gestor = GestorRespaldos(self.manager, self.directorio)
+        with self.assertRaises(ValueError):
+            gestor.exportar_incremental()  # Sin snapshot no hay punto de partida
+        # La carga masiva anota su historial con una sola sentencia al final de la transacción
+        self.manager.guardar_clientes_lote([ClienteRegular(f"B{i}", f"Nombre{i}", f"b{i}@mail.com", "12345678")
+                                            for i in range(5)], carga_masiva=True)
+        snapshot = gestor.snapshot()
+        self.assertEqual(snapshot["seq"], 5)
+        self.assertEqual(self.manager.conexion().execute("SELECT COUNT(*) FROM clientes_cambios").fetchone()[0], 0)
+
+        self.manager.guardar_cliente(ClientePremium("B9", "Nueve", "b9@mail.com", "12345678", 10))
+        self.manager.actualizar_cliente(ClienteRegular("B1", "Uno Editado", "b1@mail.com", "12345678"))
+        self.manager.eliminar_cliente_db("B2")
+        delta = gestor.exportar_incremental()
+        self.assertEqual((delta["desde"], delta["hasta"], delta["filas"]), (5, 8, 3))
+        self.assertIsNone(gestor.exportar_incremental()["ruta"])  # Sin cambios no se escribe nada
+
+        self.manager.eliminar_cliente_db("B9")
+        gestor.exportar_incremental(comprimir=True)
+
+        destino = os.path.join(self.tmp.name, "restaurada.db")
+        self.assertEqual(gestor.restaurar(destino), {"seq": 9, "deltas": 2})
+        with DatabaseManager(destino) as restaurada:
+            self.assertEqual(restaurada.obtener_todos(), self.manager.obtener_todos())
+            self.assertEqual([f[0] for f in restaurada.buscar("editado")], ["B1"])
+        with self.assertRaises(ValueError):
+            gestor.restaurar(destino)  # Nunca sobrescribe una base existente
+
+        # Restauración a un punto intermedio: B9 todavía existe
+        intermedia = os.path.join(self.tmp.name, "intermedia.db")
+        gestor.restaurar(intermedia, hasta=8)
+        with DatabaseManager(intermedia) as restaurada:
+            self.assertIsNotNone(restaurada.obtener_por_id("B9"))
+
+class TestServidor(unittest.TestCase):
+    """Pruebas del modo servidor: ClienteRemoto contra un ServidorGIC en un puerto libre."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "servidor.db"))
+        self.exportaciones = os.path.join(self.tmp.name, "exportaciones")
+        self.servidor = ServidorGIC(self.manager, puerto=0, notificaciones=False, duplicados=False,
+                                    directorio_exportacion=self.exportaciones, token="secreto")
+        self.hilo = self.servidor.iniciar_en_segundo_plano()
+        self.remoto = ClienteRemoto(f"http://127.0.0.1:{self.servidor.puerto}", token="secreto")
+
+    def tearDown(self):
+        self.remoto.close()
+        self.servidor.detener()
+        self.hilo.join(10)
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def test_operaciones_remotas(self):
+        """La interfaz remota se comporta como DatabaseManager, errores de validación incluidos."""
+        eventos = []
+        self.remoto.suscribir(lambda evento, fila: eventos.append((evento, fila[0] if fila else None)))
+        self.remoto.guardar_cliente(ClientePremium("S1", "Ana Remota", "ana@mail.com", "12345678", 15))
+        self.assertEqual(self.remoto.obtener_por_id("S1"), self.manager.obtener_por_id("S1"))
+        with self.assertRaises(ValueError):
+            self.remoto.guardar_cliente(ClienteRegular("S1", "Otra", "otra@mail.com", "12345678"))
+        self.assertTrue(self.remoto.actualizar_cliente(ClienteRegular("S1", "Ana Editada", "ana@mail.com", "12345678")))
+        self.assertEqual([f[0] for f in self.remoto.buscar("editada")], ["S1"])
+
+        resultados = self.remoto.guardar_clientes_lote([
+            ClienteRegular("S2", "Dos", "dos@mail.com", "12345678"),
+            {"id": "S3", "nombre": "Tres", "email": "sin-arroba", "telefono": "12345678", "tipo": "ClienteRegular"},
+            ClienteRegular("S1", "Repetido", "rep@mail.com", "12345678")])
+        self.assertEqual([(r.id_cliente, r.estado) for r in resultados],
+                         [("S2", "insertado"), ("S3", "invalido"), ("S1", "duplicado")])
+        self.assertEqual(self.remoto.actualizar_tipo_lote(["S1", "S2"], "Corporativo", empresa="Acme"), 2)
+        self.assertTrue(self.remoto.eliminar_cliente_db("S2"))
+        self.assertFalse(self.remoto.eliminar_cliente_db("S2"))
+        self.assertIsNone(self.remoto.obtener_por_id("S2"))
+        self.assertEqual(self.remoto.contar_clientes(), {"ClienteCorporativo": 1})
+
+        # Los cambios confirmados llegan a los suscriptores por long polling
+        for _ in range(100):
+            if ("eliminado", "S2") in eventos:
+                break
+            time.sleep(0.05)
+        self.assertIn(("insertado", "S1"), eventos)
+        self.assertIn(("eliminado", "S2"), eventos)
+
+    def test_peticiones_exigen_token_y_json(self):
+        """Sin el token compartido se responde 401 (también a las lecturas) y con otro tipo de contenido 415."""
+        intruso = ClienteRemoto(f"http://127.0.0.1:{self.servidor.puerto}", token="otro")
+        with self.assertRaisesRegex(ValueError, "Token"):
+            intruso.guardar_cliente(ClienteRegular("T1", "Intruso", "intruso@mail.com", "12345678"))
+        intruso.close()
+        self.assertIsNone(self.remoto.obtener_por_id("T1"))
+
+        conn = http.client.HTTPConnection("127.0.0.1", self.servidor.puerto, timeout=10)
+        conn.request("GET", "/clientes")
+        self.assertEqual(conn.getresponse().status, 401)
+        conn.close()
+        conn = http.client.HTTPConnection("127.0.0.1", self.servidor.puerto, timeout=10)
+        conn.request("GET", "/salud")
+        self.assertEqual(conn.getresponse().status, 200)
+        conn.close()
+
+        conn = http.client.HTTPConnection("127.0.0.1", self.servidor.puerto, timeout=10)
+        conn.request("POST", "/clientes", body=b"id=T1", headers={"Authorization": "Bearer secreto",
+                                                                 "Content-Type": "application/x-www-form-urlencoded"})
+        self.assertEqual(conn.getresponse().status, 415)
+        conn.close()
+
+    def test_content_length_invalido(self):
+        """Un Content-Length no numérico o negativo se responde con 400, y uno excesivo con 413."""
+        for longitud, estado in (("abc", 400), ("-5", 400), (str(servidor.MAX_CUERPO + 1), 413)):
+            conn = http.client.HTTPConnection("127.0.0.1", self.servidor.puerto, timeout=10)
+            conn.putrequest("POST", "/clientes")
+            conn.putheader("Authorization", "Bearer secreto")
+            conn.putheader("Content-Type", "application/json")
+            conn.putheader("Content-Length", longitud)
+            conn.endheaders()
+            self.assertEqual(conn.getresponse().status, estado)
+            conn.close()
+        self.assertEqual(self.remoto._pedir("GET", "/salud")["ok"], True)
+
+    def test_rechazo_sin_leer_el_cuerpo(self):
+        """Sin token se responde 401 y se cierra la conexión sin esperar el cuerpo anunciado."""
+        conn = http.client.HTTPConnection("127.0.0.1", self.servidor.puerto, timeout=5)
+        conn.putrequest("POST", "/clientes/lote")
+        conn.putheader("Content-Type", "application/json")
+        conn.putheader("Content-Length", str(servidor.MAX_CUERPO))
+        conn.endheaders()
+        respuesta = conn.getresponse()
+        self.assertEqual(respuesta.status, 401)
+        self.assertEqual(respuesta.getheader("Connection"), "close")
+        conn.close()
+
+    def test_exportacion_remota_en_directorio_del_servidor(self):
+        """Las rutas que envía el cliente se ignoran: se exporta solo en el directorio configurado."""
+        self.remoto.guardar_cliente(ClienteRegular("E1", "Exporta", "exporta@mail.com", "12345678"))
+        self.assertEqual(self.remoto.exportar_datos("../fuera.jsonl", os.path.join(self.tmp.name, "fuera.csv")), 1)
+        self.assertEqual(sorted(os.listdir(self.exportaciones)), ["clientes_backup.csv", "clientes_backup.jsonl"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "fuera.csv")))
+
+    def test_duplicados_por_la_cola_del_escritor(self):
+        """La verificación incremental y el análisis del servidor escriben a través de la cola del escritor."""
+        base = DatabaseManager(os.path.join(self.tmp.name, "duplicados.db"))
+        servidor_dup = ServidorGIC(base, puerto=0, notificaciones=False, token="secreto")
+        hilo = servidor_dup.iniciar_en_segundo_plano()
+        remoto = ClienteRemoto(f"http://127.0.0.1:{servidor_dup.puerto}", token="secreto")
+        try:
+            remoto.guardar_cliente(ClienteRegular("V1", "José Pérez", "jose.perez@gmail.com", "56912345678"))
+            remoto.guardar_cliente(ClienteRegular("V2", "Perez Jose", "jose.perez+web@gmail.com", "912345678"))
+            detector = remoto.detector_duplicados()
+            for _ in range(100):
+                if detector.pendientes():
+                    break
+                time.sleep(0.05)
+            self.assertEqual([(p[0], p[4]) for p in detector.pendientes()], [("V1", "V2")])
+            self.assertEqual(detector.analizar(), 1)
+        finally:
+            remoto.close()
+            servidor_dup.detener()
+            hilo.join(10)
+            base.close()
+
+    def test_escrituras_concurrentes_agrupadas(self):
+        """Muchos puestos escribiendo a la vez: ningún error de bloqueo y todas las filas confirmadas."""
+        def puesto(n):
+            for i in range(10):
+                self.remoto.guardar_cliente(ClienteRegular(f"P{n}-{i}", f"Puesto {n}", f"p{n}.{i}@mail.com", "12345678"))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(puesto, range(8)))
+        self.assertEqual(self.manager.contar_clientes(), {"ClienteRegular": 80})
+
+class TestBenchmarks(unittest.TestCase):
+    """Pruebas de la comparación contra la línea base de la suite de benchmarks."""
+
+    def test_datos_sinteticos_reproducibles(self):
+        """La misma semilla genera siempre los mismos clientes, todos válidos para el modelo."""
+        from benchmarks.suite import generar_clientes, construir_cliente
+        primera = list(generar_clientes(50, semilla=7))
+        self.assertEqual(primera, list(generar_clientes(50, semilla=7)))
+        self.assertNotEqual(primera, list(generar_clientes(50, semilla=8)))
+        self.assertEqual(len({construir_cliente(f).id_cliente for f in primera}), 50)
+
+    def test_bench_conexion_sobre_el_esquema_actual(self):
+        """Los dos patrones de bench_conexion insertan y leen con las columnas tipadas del esquema vigente."""
+        from benchmarks.bench_conexion import _clientes, medir_conexion_por_llamada, medir_conexion_persistente
+        clientes = _clientes(20)
+        with tempfile.TemporaryDirectory() as tmp:
+            for medir_patron, nombre in ((medir_conexion_por_llamada, "por_llamada.db"),
+                                         (medir_conexion_persistente, "persistente.db")):
+                ruta = os.path.join(tmp, nombre)
+                self.assertGreater(medir_patron(ruta, clientes), 0)
+                with DatabaseManager(ruta) as db:
+                    self.assertEqual(db.contar_clientes(), {"ClienteRegular": 20})
+
+    def test_sin_linea_base_falla(self):
+        """Sin línea base la suite termina con código 2 antes de medir, en lugar de pasar en silencio."""
+        from benchmarks.suite import main
+        with tempfile.TemporaryDirectory() as tmp, redirect_stderr(StringIO()) as errores:
+            codigo = main(["--baseline", os.path.join(tmp, "no_existe.json"), "--datos", tmp,
+                           "--salida", os.path.join(tmp, "resultados.json")])
+            self.assertEqual(codigo, 2)
+            self.assertFalse(os.path.exists(os.path.join(tmp, "resultados.json")))
+        self.assertIn("línea base", errores.getvalue())
+
+    def test_comparar_detecta_regresiones(self):
+        """Solo se informan los empeoramientos que superan el umbral de cada criterio."""
+        from benchmarks.suite import comparar
+        base = {"op@1000": {"p95_ms": 10.0, "ops_por_segundo": 100.0, "rss_pico_kb": 1000},
+                "otra@1000": {"p95_ms": 1.0, "ops_por_segundo": 10.0, "rss_pico_kb": 100}}
+        actual = {"op@1000": {"p95_ms": 11.0, "ops_por_segundo": 70.0, "rss_pico_kb": 1300},
+                  "otra@1000": {"omitido": "sin servidor gráfico"},
+                  "nueva@1000": {"p95_ms": 99.0, "ops_por_segundo": 1.0, "rss_pico_kb": 1}}
+        regresiones = comparar(actual, base, umbral=0.20, umbral_memoria=0.25)
+        self.assertEqual(sorted(r.campo for r in regresiones), ["ops_por_segundo", "rss_pico_kb"])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file